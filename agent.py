@@ -1,109 +1,328 @@
-import os
+import json
 import logging
 import asyncio
-from dotenv import load_dotenv
-import google.generativeai as genai
-from typing import List, Dict, Any
-from context import UserSessionContext
-
-load_dotenv()
+from functools import partial
+from typing import List, Dict, Any, Tuple, Optional, AsyncGenerator
+from context import UserSessionContext, as_list
+from openai_agents import Step
+from routing import Router, RoutingDecision
+from utils.response_cache import ResponseCache, get_response_cache, make_cache_key
+from utils.single_flight import async_flight
+from utils.model_gateway import INTERACTIVE, ModelGateway, get_model_gateway
+from utils.llm_backend import LLMBackend, get_default_backend
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-try:
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY is missing in your .env file")
-
-    genai.configure(api_key=api_key)
-    gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-    logger.info("✅ Gemini Free Model Initialized (gemini-1.5-flash)")
-
-except Exception as e:
-    logger.error(f"🚨 Initialization Error: {str(e)}")
-    raise
-
-
 #  Base Agent class
 class Agent:
-    def __init__(self, name: str, tools: List[Any] = None, handoffs: Dict[str, Any] = None, hooks=None):
+    def __init__(self, name: str, tools: List[Any] = None, handoffs: Dict[str, Any] = None, hooks=None,
+                 concurrent: bool = True, tool_timeout: float = 10.0,
+                 cache: Optional[ResponseCache] = None, use_cache: bool = True,
+                 gateway: Optional[ModelGateway] = None, priority: int = INTERACTIVE,
+                 model: Optional[LLMBackend] = None):
         self.name = name
         self.tools = tools or []
         self.handoffs = handoffs or {}
         self.hooks = hooks
-        self.model = gemini_model  # Assign globally initialized model
+        self.concurrent = concurrent  # Run matched tools/handoffs together instead of one by one
+        self.tool_timeout = tool_timeout  # Seconds each tool or handoff may take
+        self.cache = (cache or get_response_cache()) if use_cache else None  # Shared with the dashboard by default
+        self.gateway = gateway or get_model_gateway()  # Shared rate limit / retry / circuit breaker
+        self.priority = priority  # Gateway lane; batch jobs pass BATCH so chat stays responsive
+        self.model = model or get_default_backend()  # Gemini, or the offline stand-in when LLM_BACKEND=fake
+        self.router = Router.for_agent(self.tools, self.handoffs)  # Compiled once per agent
 
     async def process_input(self, input_text: str, context: UserSessionContext) -> Dict[str, Any]:
+        # Non-streaming callers only need the final merged result
+        result = {}
+        async for step in self.process_input_stream(input_text, context):
+            if step.type == "final":
+                result = step.data
+        return result
+
+    async def process_input_stream(self, input_text: str, context: UserSessionContext) -> AsyncGenerator[Step, None]:
         if self.hooks and hasattr(self.hooks, "on_agent_start"):
             self.hooks.on_agent_start(self.name, context)
 
+        # One routing pass decides escalation, tools and handoffs
+        decision = self.route(input_text, context)
+        yield Step("routing", decision.explain())
+
         # Escalation handoff
-        if any(word in input_text.lower() for word in ["real trainer", "talk to someone", "escalate"]):
-            return await self.handoff("escalation", input_text, context)
+        if decision.escalate:
+            result = await self.handoff("escalation", input_text, context)
+            yield Step("handoff", result, name="escalation")
+            yield Step("final", result)
+            return
 
-        # Run tools
-        result = await self.run_tools(input_text, context)
+        # Profile part of the prompt is fixed before any tool can touch the context
+        profile = profile_fields(context)
+        jobs = self.plan_jobs(input_text, context, decision)
+        events: asyncio.Queue = asyncio.Queue()
 
-        # AI-generated advice
-        try:
-            prompt = f"""
-You are a certified health and wellness expert.
-User Profile:
-- Name: {context.name}
-- Diet Preferences: {', '.join(context.diet_preferences) if context.diet_preferences else 'None'}
-- Health Conditions: {', '.join(context.health_conditions) if context.health_conditions else 'None'}
+        async def run(job):
+            label, is_handoff, factory = job
+            ok, data = await self._run_job(label, factory)
+            events.put_nowait(Step(("handoff" if is_handoff else "tool") if ok else "tool_error", data, name=label))
+            return ok, data
 
-User Question:
-{input_text}
+        async def drive():
+            if not self.concurrent:
+                outcomes = [await run(job) for job in jobs]
+                tool_data = format_tool_data(self.merge_results(list(zip(jobs, outcomes))))
+                return outcomes, await self._stream_advice(profile, input_text, tool_data, events)
 
-Respond with a detailed paragraph followed by bullet points. The paragraph should summarize the advice in a friendly tone. The bullet points should provide specific tips, warnings (if any), and motivational suggestions.
-"""
-            response = await self.model.generate_content_async(prompt)
-            result["agent_advice"] = response.text.strip()  # ✅ renamed key
-        except Exception as e:
-            result["error"] = f"⚠️ Gemini failed: {str(e)}"
+            # The advice call starts on the profile-only prompt while the tools run; their
+            # plan data goes into a follow-up part that streams right after the first one
+            tasks = [asyncio.create_task(run(job)) for job in jobs]
+            plan_events: asyncio.Queue = asyncio.Queue()
+
+            async def plan_part():
+                try:
+                    outcomes = await asyncio.gather(*tasks)
+                    tool_data = format_tool_data(self.merge_results(list(zip(jobs, outcomes))))
+                    part = await self._stream_advice(profile, input_text, tool_data, plan_events, plan=True) if tool_data else {}
+                    return outcomes, part
+                finally:
+                    plan_events.put_nowait(None)
+
+            planned = asyncio.create_task(plan_part())
+            try:
+                advice = await self._stream_advice(profile, input_text, "", events)
+                # Follow-up tokens buffered while the first part streamed go out first, the rest as they come
+                separator = "\n\n" if advice.get("agent_advice") else ""
+                while (step := await plan_events.get()) is not None:
+                    if step.type == "token" and separator:
+                        step, separator = Step("token", separator + step.data), ""
+                    events.put_nowait(step)
+                outcomes, part = await planned
+            except BaseException:
+                planned.cancel()
+                for task in tasks:
+                    task.cancel()
+                raise
+            return outcomes, join_advice(advice, part)
+
+        # Tool, handoff and token events are yielded as they happen; None marks the end
+        driver = asyncio.create_task(drive())
+        driver.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while (step := await events.get()) is not None:
+                yield step
+            outcomes, advice = await driver
+        finally:
+            driver.cancel()  # Consumer went away early; no-op once finished
+
+        result = self.merge_results(list(zip(jobs, outcomes)))
+        result.update(advice)
 
         if self.hooks and hasattr(self.hooks, "on_agent_end"):
             self.hooks.on_agent_end(self.name, context)
 
-        return result
+        yield Step("final", result)
+
+    async def _stream_advice(self, profile: Dict[str, Any], input_text: str, tool_data: str,
+                             events: asyncio.Queue, plan: bool = False) -> Dict[str, Any]:
+        # Same profile, question and tool data means the same prompt, so a cached answer can be reused
+        kind = "agent_plan_advice" if plan else "agent_advice"
+        cache_key = make_cache_key(kind, **profile, question=input_text, tool_data=tool_data)
+        if self.cache:
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                events.put_nowait(Step("token", cached))
+                return {"agent_advice": cached}
+
+        async def generate():
+            # AI-generated advice, pushed out chunk by chunk as Gemini produces it
+            chunks = []
+            prompt = (build_plan_prompt if plan else build_advice_prompt)(profile, input_text, tool_data)
+            # The gateway rate-limits, retries 429/5xx on open and holds a concurrency slot while streaming
+            async for chunk in self.gateway.stream(lambda: self.model.generate_content_async(prompt, stream=True),
+                                                   priority=self.priority):
+                if chunk.text:
+                    chunks.append(chunk.text)
+                    yield chunk.text
+            advice = "".join(chunks).strip()
+            if self.cache and advice:
+                await asyncio.to_thread(self.cache.set, cache_key, advice)
+
+        # Identical prompts already in flight share one Gemini call and its chunks
+        chunks = []
+        try:
+            async for text in async_flight.stream(cache_key, generate):
+                chunks.append(text)
+                events.put_nowait(Step("token", text))
+            return {"agent_advice": "".join(chunks).strip()}  # ✅ renamed key
+        except Exception as e:
+            error = f"⚠️ Gemini failed: {str(e)}"
+            events.put_nowait(Step("error", error))
+            return {"error": error}
 
     async def run_tools(self, input_text: str, context: UserSessionContext) -> Dict[str, Any]:
-        combined_result = {}
+        jobs = self.plan_jobs(input_text, context)
+
+        if self.concurrent:
+            # Cancelling the caller cancels every pending job via gather
+            outcomes = await asyncio.gather(*(self._run_job(label, factory) for label, _, factory in jobs))
+        else:
+            outcomes = [await self._run_job(label, factory) for label, _, factory in jobs]
 
-        # Run each matching tool
+        return self.merge_results(list(zip(jobs, outcomes)))
+
+    def route(self, input_text: str, context: UserSessionContext) -> RoutingDecision:
+        """Matched tools and handoffs for a message; explain() shows why."""
+        return self.router.route(input_text, context)
+
+    def plan_jobs(self, input_text: str, context: UserSessionContext,
+                  decision: Optional[RoutingDecision] = None) -> List[Tuple[str, bool, Any]]:
+        # Collect every matching tool and handoff first; results are merged in
+        # this order no matter which one finishes first
+        decision = decision or self.route(input_text, context)
+        jobs = []
         for tool in self.tools:
-            if tool.should_trigger(input_text, context):
-                tool_result = await tool.execute(input_text, context)
-                combined_result.update(tool_result)
-
-        # Auto-Handoff: Injury Support
-        if "knee" in input_text.lower() or "joint" in input_text.lower():
-            if "injury_support" in self.handoffs:
-                injury_result = self.handoffs["injury_support"].run_tools(input_text, context)
-                if asyncio.iscoroutine(injury_result):
-                    injury_result = await injury_result
-                combined_result["injury_support"] = injury_result
-
-        # Auto-Handoff: Nutrition Expert
-        if "diabetic" in input_text.lower() or "diabetes" in input_text.lower():
-            if "nutrition_expert" in self.handoffs:
-                nutrition_result = self.handoffs["nutrition_expert"].run_tools(input_text, context)
-                if asyncio.iscoroutine(nutrition_result):
-                    nutrition_result = await nutrition_result
-                combined_result["nutrition_expert"] = nutrition_result
+            if tool_name(tool) in decision.tools:
+                jobs.append((tool_name(tool), False, partial(tool.execute, input_text, context)))
+
+        # Auto-Handoffs (Injury Support, Nutrition Expert, ...)
+        for name in decision.handoffs:
+            agent = self.handoffs[name]
+            jobs.append((name, True, partial(self._call_handoff, agent, input_text, context, decision.keywords_for(name))))
+
+        return jobs
 
+    @staticmethod
+    def merge_results(finished: List[Tuple[Tuple[str, bool, Any], Tuple[bool, Any]]]) -> Dict[str, Any]:
+        combined_result = {}
+        for (label, is_handoff, _), (ok, result) in finished:
+            if not ok:
+                combined_result.setdefault("tool_errors", {})[label] = result
+            elif is_handoff:
+                combined_result[label] = result
+            else:
+                combined_result.update(result)
         return combined_result
 
+    async def _run_job(self, label: str, factory) -> Tuple[bool, Any]:
+        # Run one tool/handoff under the per-tool timeout without letting its
+        # failure cancel the others
+        try:
+            return True, await asyncio.wait_for(factory(), timeout=self.tool_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱️ {label} timed out after {self.tool_timeout}s")
+            return False, f"⚠️ {label} timed out after {self.tool_timeout}s"
+        except Exception as e:
+            logger.error(f"🚨 {label} failed: {str(e)}")
+            return False, f"⚠️ {label} failed: {str(e)}"
+
+    async def _call_handoff(self, agent: Any, input_text: str, context: UserSessionContext,
+                            matched: Optional[List[str]] = None) -> Dict[str, Any]:
+        # Agents with a trigger vocabulary take the router's matches instead of re-scanning
+        if matched is not None and hasattr(agent, "trigger_keywords"):
+            result = agent.run_tools(input_text, context, matched=matched)
+        else:
+            result = agent.run_tools(input_text, context)
+        if asyncio.iscoroutine(result):
+            result = await result
+        return result
+
     async def handoff(self, target_agent_name: str, input_text: str, context: UserSessionContext) -> Dict[str, Any]:
         agent = self.handoffs.get(target_agent_name)
         if not agent:
             return {"error": f"No agent found for handoff: {target_agent_name}"}
-        result = agent.run_tools(input_text, context)
-        if asyncio.iscoroutine(result):
-            result = await result
-        return result
+        return await self._call_handoff(agent, input_text, context)
+
+
+def tool_name(tool: Any) -> str:
+    return getattr(tool, "name", type(tool).__name__)
+
+
+def profile_fields(context: UserSessionContext) -> Dict[str, Any]:
+    """Context fields that make up the profile part of the advice prompt."""
+    return {
+        "name": context.name,
+        "diet_preferences": as_list(context.diet_preferences),
+        "health_conditions": as_list(context.health_conditions),
+        "goal": context.goal,
+        "meal_plan": context.meal_plan,
+        "workout_plan": context.workout_plan,
+    }
+
+
+def build_profile_prompt(profile: Dict[str, Any]) -> str:
+    lines = [
+        "User Profile:",
+        f"- Name: {profile['name']}",
+        f"- Diet Preferences: {', '.join(profile['diet_preferences']) if profile['diet_preferences'] else 'None'}",
+        f"- Health Conditions: {', '.join(profile['health_conditions']) if profile['health_conditions'] else 'None'}",
+    ]
+    if profile["goal"]:
+        lines.append(f"- Current Goal: {profile['goal']}")
+    if profile["meal_plan"]:
+        lines.append(f"- Current Meal Plan: {json.dumps(profile['meal_plan'])}")
+    if profile["workout_plan"]:
+        lines.append(f"- Current Workout Plan: {json.dumps(profile['workout_plan'])}")
+    return "\n".join(lines)
+
+
+def format_tool_data(result: Dict[str, Any]) -> str:
+    """Render the plan data produced by tools and handoffs for the prompt."""
+    lines = []
+    if "goal" in result:
+        lines.append(f"- Goal: {json.dumps(result['goal'])}")
+    if result.get("type") == "meal_plan":
+        lines.append(f"- Meal Plan: {json.dumps(result['data'])}")
+    if "workout_plan" in result:
+        lines.append(f"- Workout Plan: {json.dumps(result['workout_plan'])}")
+    if "schedule" in result:
+        lines.append(f"- Check-ins: {json.dumps(result['schedule'])}")
+    for key, plan_key, label in (("injury_support", "injury_support_plan", "Injury Support"),
+                                 ("nutrition_expert", "nutrition_plan", "Nutrition Expert")):
+        plan = result.get(key, {}).get(plan_key)
+        if plan:
+            lines.append(f"- {label}: {plan['recommendation']}")
+    return "\n".join(lines)
+
+
+def build_advice_prompt(profile: Dict[str, Any], input_text: str, tool_data: str) -> str:
+    tool_section = f"\nPlan Data From Tools:\n{tool_data}\n" if tool_data else ""
+    return f"""
+You are a certified health and wellness expert.
+{build_profile_prompt(profile)}
+{tool_section}
+User Question:
+{input_text}
+
+Respond with a detailed paragraph followed by bullet points. The paragraph should summarize the advice in a friendly tone. The bullet points should provide specific tips, warnings (if any), and motivational suggestions.{' Base the advice on the plan data above.' if tool_data else ''}
+"""
+
+
+def build_plan_prompt(profile: Dict[str, Any], input_text: str, tool_data: str) -> str:
+    """Follow-up to the profile-only advice once the tools have produced plan data."""
+    return f"""
+You are a certified health and wellness expert.
+{build_profile_prompt(profile)}
+
+User Question:
+{input_text}
+
+General advice for this question has already been given. The planning tools have since produced:
+{tool_data}
+
+Add a short follow-up that walks the user through this plan data as bullet points: what it means for them, how to follow it and any warnings for their profile. Do not repeat general advice.
+"""
+
+
+def join_advice(advice: Dict[str, Any], plan_part: Dict[str, Any]) -> Dict[str, Any]:
+    """The first advice part and its plan follow-up as one result; an error from either is kept."""
+    texts = [part["agent_advice"] for part in (advice, plan_part) if part.get("agent_advice")]
+    joined = {"agent_advice": "\n\n".join(texts)} if texts else {}
+    error = advice.get("error") or plan_part.get("error")
+    if error:
+        joined["error"] = error
+    return joined
+
+
 class HealthWellnessAgent(Agent):
-    def __init__(self, tools=None, handoffs=None, hooks=None):
-        super().__init__("HealthWellnessAgent", tools, handoffs, hooks)
+    def __init__(self, tools=None, handoffs=None, hooks=None, **options):
+        super().__init__("HealthWellnessAgent", tools, handoffs, hooks, **options)
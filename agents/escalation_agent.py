@@ -1,27 +1,50 @@
+import logging
 from datetime import datetime
+from utils.escalation_queue import get_escalation_queue
+
+logger = logging.getLogger(__name__)
 
 class EscalationAgent:
-    def run_tools(self, input_data, context):
+    trigger_keywords = ["real trainer", "talk to someone", "escalate"]
+
+    def __init__(self, db_path: str = "health_wellness.db"):
+        self.db_path = db_path
+
+    async def run_tools(self, input_data, context, matched=None):
         # Get user ID from context, if available
         if isinstance(context, dict):
-            user_id = context.get("user_id", "unknown")
+            user_id = context.get("user_id")
+            conditions = context.get("health_conditions", [])
         else:
-            user_id = "unknown"
+            user_id = getattr(context, "uid", None)
+            conditions = getattr(context, "health_conditions", [])
+
+        # Recorded for the expert queue; a repeat within the dedup window returns the open ticket
+        try:
+            ticket = await get_escalation_queue(self.db_path).enqueue_async(user_id, input_data, conditions)
+        except Exception as e:
+            logger.error(f"🚨 Escalation for user {user_id} could not be queued: {e}")
+            ticket = {"escalation_id": None, "priority": None, "deduplicated": False,
+                      "error": "Escalation could not be recorded; please try again shortly."}
 
         # Message to inform user that escalation is needed
         message = (
             "⚠️ Your request may require review by a qualified health expert.\n"
-            f"User ID: {user_id}\n"
+            f"User ID: {user_id if user_id is not None else 'unknown'}\n"
             "Please consult a licensed professional for detailed advice."
         )
 
         # Prepare the response with escalation details
         response = {
             "message": "Request escalated to human expert.",
-            "escalation_id": str(datetime.now().timestamp()),
+            "escalation_id": ticket["escalation_id"],
+            "priority": ticket["priority"],
+            "deduplicated": ticket["deduplicated"],
             "input": input_data,
             "timestamp": datetime.now().isoformat(),
             "details": message
         }
+        if "error" in ticket:
+            response["error"] = ticket["error"]
 
         return response
@@ -1,7 +1,12 @@
 from datetime import datetime
 
 class InjurySupportAgent:
-    def run_tools(self, input_text, context):
+    trigger_keywords = ["knee", "joint"]
+
+    def run_tools(self, input_text, context, matched=None):
+        # The main agent's router passes the keywords it already found
+        if matched is None:
+            matched = [word for word in self.trigger_keywords if word in input_text.lower()]
         conditions = context.health_conditions if hasattr(context, 'health_conditions') else []
         goal = context.goal if hasattr(context, 'goal') else input_text
 
@@ -9,7 +14,7 @@ class InjurySupportAgent:
         recommendation += "- Prioritize rest and avoid strain.\n"
         recommendation += "- Consult a physiotherapist for a personalized plan.\n"
 
-        if "knee" in input_text.lower() or "joint" in input_text.lower() or "joint issues" in [c.lower() for c in conditions]:
+        if matched or "joint issues" in [c.lower() for c in conditions]:
             recommendation += "- Try low-impact workouts like swimming or cycling.\n"
             recommendation += "- Do strengthening exercises for your legs (quads/hamstrings).\n"
             recommendation += "- Avoid jumping or high-intensity squats.\n"
@@ -1,7 +1,12 @@
 from datetime import datetime
 
 class NutritionExpertAgent:
-    def run_tools(self, input_text, context):
+    trigger_keywords = ["diabetic", "diabetes"]
+
+    def run_tools(self, input_text, context, matched=None):
+        # The main agent's router passes the keywords it already found
+        if matched is None:
+            matched = [word for word in self.trigger_keywords if word in input_text.lower()]
         preferences = context.diet_preferences if hasattr(context, 'diet_preferences') else []
         health_conditions = context.health_conditions if hasattr(context, 'health_conditions') else []
 
@@ -10,7 +15,7 @@ class NutritionExpertAgent:
         if "vegetarian" in [p.lower() for p in preferences]:
             recommendation += "- Include protein-rich plant foods: lentils, tofu, chickpeas, quinoa.\n"
 
-        if "diabetes" in [c.lower() for c in health_conditions] or "diabetic" in input_text.lower():
+        if "diabetes" in [c.lower() for c in health_conditions] or matched:
             recommendation += "- Prioritize low-glycemic foods: oats, non-starchy vegetables, whole grains.\n"
             recommendation += "- Avoid sugary drinks and processed carbs.\n"
 
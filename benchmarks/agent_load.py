@@ -0,0 +1,226 @@
+"""Concurrent-session load test for the agent pipeline.
+
+Replays a weighted mix of chat messages across N simulated sessions, each
+with its own UserSessionContext and agent (as Chainlit does), against the
+offline FakeBackend. Reports throughput, per-stage latency percentiles and
+the memory each session keeps (a tracemalloc snapshot diff across the run)
+as JSON so runs can be compared. Reminders, escalations and cached advice
+go to a scratch database that is deleted after the run; with --cache all
+sessions share one response cache, as they do in a real process.
+
+    python -m benchmarks.agent_load --sessions 50 --messages 10 --output run.json
+    python -m benchmarks.agent_load --sessions 50 --compare run.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import tempfile
+import argparse
+import platform
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import HealthWellnessAgent
+from context import UserSessionContext
+from hooks import CustomRunHooks
+from tools.goal_analyzer import GoalAnalyzerTool
+from tools.meal_planner import MealPlannerTool
+from tools.workout_recommender import WorkoutRecommenderTool
+from tools.scheduler import CheckinSchedulerTool
+from tools.tracker import ProgressTrackerTool
+from agents.escalation_agent import EscalationAgent
+from agents.nutrition_expert_agent import NutritionExpertAgent
+from agents.injury_support_agent import InjurySupportAgent
+from utils.llm_backend import FakeBackend
+from utils.model_gateway import ModelGateway
+from utils.response_cache import ResponseCache
+
+# (category, weight, messages)
+MESSAGE_MIX = [
+    ("goal", 0.25, ["I want to lose 5kg in 2 months", "Help me gain 3 kg in 6 weeks", "how do I lose 10 lbs in 3 months"]),
+    ("meal", 0.2, ["Give me a vegetarian meal plan", "What food should I eat for dinner?", "Plan my diet for this week"]),
+    ("injury", 0.15, ["My knee hurts after running, what workout can I do?", "I have joint pain, any safe exercises?"]),
+    ("nutrition", 0.1, ["What should I eat for diabetes?", "I am diabetic, which snacks are ok?"]),
+    ("progress", 0.15, ["Update my progress: ran 5km today", "Schedule my workout and update progress"]),
+    ("escalation", 0.05, ["I want to talk to someone real", "Please escalate this to a real trainer"]),
+    ("general", 0.1, ["How much water should I drink?", "Any tips for better sleep?"]),
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Nearest-rank percentile
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+def build_agent(backend: FakeBackend, gateway: ModelGateway, cache: Optional[ResponseCache], db_path: str) -> HealthWellnessAgent:
+    # Everything that writes (reminders, escalations) goes to the run's scratch database
+    tools = [GoalAnalyzerTool(), MealPlannerTool(), WorkoutRecommenderTool(), CheckinSchedulerTool(db_path), ProgressTrackerTool()]
+    handoffs = {"escalation": EscalationAgent(db_path), "nutrition_expert": NutritionExpertAgent(),
+                "injury_support": InjurySupportAgent()}
+    return HealthWellnessAgent(tools=tools, handoffs=handoffs, hooks=CustomRunHooks(), model=backend, gateway=gateway,
+                               cache=cache, use_cache=cache is not None)
+
+
+def pick_message(rng: random.Random):
+    category, _, messages = rng.choices(MESSAGE_MIX, weights=[w for _, w, _ in MESSAGE_MIX])[0]
+    return category, rng.choice(messages)
+
+
+async def run_session(index: int, args, backend, gateway, cache, db_path: str, samples: Dict[str, List[float]],
+                      by_category: Dict[str, List[float]], errors: List[str]):
+    rng = random.Random(args.seed * 100003 + index)
+    context = UserSessionContext(
+        name=f"User{index}", uid=index, handoff_logs=[], progress_logs=[],
+        diet_preferences=rng.choice([["Vegetarian"], ["Vegan"], []]),
+        health_conditions=rng.choice([["Joint Issues"], ["Diabetes"], []]),
+    )
+    agent = build_agent(backend, gateway, cache, db_path)
+
+    for _ in range(args.messages):
+        category, text = pick_message(rng)
+        started = time.perf_counter()
+        routed = first_token = last_token = None
+        result: Dict[str, Any] = {}
+        async for step in agent.process_input_stream(text, context):
+            now = time.perf_counter() - started
+            if step.type == "routing":
+                routed = now
+                samples["routing"].append(now)
+            elif step.type == "token":
+                first_token = now if first_token is None else first_token
+                last_token = now
+            elif step.type in ("tool", "handoff", "tool_error"):
+                # Every job starts right after routing, so this is how long the job itself took
+                samples.setdefault(f"{step.type}:{step.name}", []).append(now - routed)
+            elif step.type == "final":
+                result = step.data
+        total = time.perf_counter() - started
+
+        samples["total"].append(total)
+        by_category.setdefault(category, []).append(total)
+        if first_token is not None:
+            samples["time_to_first_token"].append(first_token)
+            samples["llm_stream"].append(last_token - first_token)
+        # Tool-level errors (e.g. no goal for a workout) still come with advice
+        if "error" in result and "agent_advice" not in result:
+            errors.append(result["error"])
+        if args.think_time:
+            await asyncio.sleep(rng.uniform(0, args.think_time))
+
+    # Handed back so the session's state is still alive for the closing memory snapshot
+    return context, agent
+
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    backend = FakeBackend(latency=args.latency, chunk_latency=args.chunk_latency, chunk_words=args.chunk_words,
+                          error_rate=args.error_rate, seed=args.seed)
+    gateway = ModelGateway(requests_per_minute=args.rpm, burst=max(1, args.rpm / 60), max_concurrency=args.max_concurrency,
+                           base_delay=0.05)
+    samples: Dict[str, List[float]] = {"total": [], "routing": [], "time_to_first_token": [], "llm_stream": []}
+    by_category: Dict[str, List[float]] = {}
+    errors: List[str] = []
+
+    with tempfile.TemporaryDirectory(prefix="agent_load_") as scratch:
+        db_path = os.path.join(scratch, "benchmark.db")
+        # One cache per run: every session reads and fills the same in-memory tier
+        cache = ResponseCache(db_path) if args.cache else None
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        started = time.perf_counter()
+        sessions = await asyncio.gather(*(run_session(i, args, backend, gateway, cache, db_path, samples, by_category, errors)
+                                          for i in range(args.sessions)))
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        retained = tracemalloc.take_snapshot().compare_to(before, "filename")
+        tracemalloc.stop()
+        del sessions
+        retained_bytes = sum(stat.size_diff for stat in retained)
+
+    messages = len(samples["total"])
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "elapsed_s": elapsed,
+        "messages": messages,
+        "throughput_msgs_per_s": messages / elapsed if elapsed else 0.0,
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:10],
+        "stages": {stage: summarize(values) for stage, values in sorted(samples.items())},
+        "by_category": {category: summarize(values) for category, values in sorted(by_category.items())},
+        "memory": {
+            # Still allocated at the end of the run, while every session's context and agent are alive
+            "retained_bytes": retained_bytes,
+            "retained_bytes_per_session": retained_bytes / args.sessions if args.sessions else 0,
+            "top_retained": [{"file": stat.traceback[0].filename, "bytes": stat.size_diff} for stat in retained[:5]],
+            "traced_peak_bytes": peak,
+            "traced_peak_bytes_per_session": peak / args.sessions if args.sessions else 0,
+        },
+        "gateway": gateway.stats(),
+        "cache": cache.stats() if cache else None,
+        "backend_calls": backend.calls,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]):
+    print(f"{'stage':40} {'p50 base':>10} {'p50 now':>10} {'p95 base':>10} {'p95 now':>10}")
+    for stage, stats in current["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base:
+            continue
+        print(f"{stage:40} {base['p50']:10.3f} {stats['p50']:10.3f} {base['p95']:10.3f} {stats['p95']:10.3f}")
+    print(f"throughput: {baseline['throughput_msgs_per_s']:.2f} -> {current['throughput_msgs_per_s']:.2f} msgs/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the agent pipeline with simulated concurrent sessions")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=5, help="messages per session")
+    parser.add_argument("--think-time", type=float, default=0.0, help="max random pause between messages (s)")
+    parser.add_argument("--latency", default="lognormal:0.8:0.4", help="FakeBackend first-token latency")
+    parser.add_argument("--chunk-latency", default="fixed:0.03")
+    parser.add_argument("--chunk-words", type=int, default=4)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=float, default=100000, help="gateway rate limit")
+    parser.add_argument("--max-concurrency", type=int, default=64, help="gateway concurrency cap")
+    parser.add_argument("--cache", action="store_true", help="enable the shared response cache")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    elif not args.compare:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
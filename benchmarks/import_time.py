@@ -0,0 +1,99 @@
+"""Cold-start import profile for the app's entry modules.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter per
+target and reports wall time plus the modules with the largest cumulative
+import cost, so regressions from new top-level imports show up quickly.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --modules agent routing --top 15 --output imports.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import importlib.util
+import subprocess
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULES = ["agent", "routing", "utils.llm_backend", "utils.workout_history", "dashboard"]
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Parse '-X importtime' lines: 'import time: self [us] | cumulative | imported package'."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            rows.append({"module": name.strip(), "depth": (len(name) - len(name.lstrip())) // 2,
+                         "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+        except ValueError:
+            continue
+    return rows
+
+
+def profile_module(module: str, repeat: int) -> Dict[str, Any]:
+    runs, rows = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=ROOT, capture_output=True, text=True)
+        runs.append(time.perf_counter() - started)
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "unknown error"
+            return {"module": module, "error": error}
+        rows = parse_importtime(proc.stderr)
+    own = next((row for row in reversed(rows) if row["module"] == module), None)
+    return {
+        "module": module,
+        "wall_s": min(runs),
+        "import_us": own["cumulative_us"] if own else None,
+        "modules_loaded": len(rows),
+        "rows": rows,
+    }
+
+
+def top_modules(rows: List[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+    # Top-level packages only, so a heavy dependency is not counted once per submodule
+    roots = [row for row in rows if row["depth"] <= 1]
+    return sorted(roots, key=lambda row: row["cumulative_us"], reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the app modules")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per module; the fastest is reported")
+    parser.add_argument("--top", type=int, default=10, help="heaviest imports to list per module")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    report = []
+    for module in args.modules:
+        if module == "dashboard" and importlib.util.find_spec("streamlit") is None:
+            print("⚠️ Skipping dashboard: streamlit is not installed")
+            continue
+        result = profile_module(module, args.repeat)
+        if "error" in result:
+            print(f"❌ {module}: {result['error']}")
+            report.append(result)
+            continue
+        heaviest = top_modules(result.pop("rows"), args.top)
+        result["top"] = heaviest
+        report.append(result)
+
+        import_ms = result["import_us"] / 1000 if result["import_us"] is not None else float("nan")
+        print(f"📦 {module}: {import_ms:.1f} ms import, {result['wall_s'] * 1000:.0f} ms wall, "
+              f"{result['modules_loaded']} modules")
+        for row in heaviest:
+            print(f"    {row['cumulative_us'] / 1000:8.1f} ms  {row['module']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
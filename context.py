@@ -1,6 +1,12 @@
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 
+def as_list(value: Any) -> List[str]:
+    # Profile updates from the dashboard can store preferences as "a, b"
+    if isinstance(value, str):
+        return [part.strip() for part in value.split(",") if part.strip()]
+    return list(value or [])
+
 class UserSessionContext(BaseModel):
     name: str
     uid: int
@@ -14,6 +20,9 @@ class UserSessionContext(BaseModel):
     workout_plan: Optional[Dict[str, Any]] = None
     injury_notes: Optional[Dict[str, Any]] = None
     timestamp: Optional[str] = None
+    # How many progress_logs / handoff_logs entries are already stored as events
+    progress_log_offset: int = 0
+    handoff_log_offset: int = 0
 
     class Config:
         arbitrary_types_allowed = True
\ No newline at end of file
@@ -2,35 +2,67 @@ import streamlit as st
 import uuid
 import re
 import os
-import pytz
-import requests
 from datetime import datetime
-from dotenv import load_dotenv
+from zoneinfo import ZoneInfo
 
 from context import UserSessionContext
 from utils.user_auth import UserAuth
 from utils.profile_manager import ProfileManager
-from utils.notifications import send_progress_email
-from utils.reminder_scheduler import schedule_reminder
-from utils.progress_chart import generate_progress_chart
-from utils.feedback import collect_feedback
-from utils.export_pdf import generate_progress_report
-
-# Load API keys and configuration 
-load_dotenv(os.path.join(os.path.dirname(__file__), 'api.env'))
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_API_URL = os.getenv("GEMINI_API_URL")
-
-def call_gemini_api(prompt: str) -> str:
+from utils.response_cache import get_response_cache, make_cache_key
+from utils.single_flight import sync_flight
+from utils.model_gateway import get_model_gateway
+
+# Page-specific helpers (reports, alerts, HTTP client) are imported where they
+# are used so a Streamlit rerun only pays for the page being shown.
+
+@st.cache_resource
+def load_config() -> dict:
+    # Load API keys and configuration once per process, not on every rerun
+    from dotenv import load_dotenv
+
+    load_dotenv(os.path.join(os.path.dirname(__file__), 'api.env'))
+    return {
+        "api_key": os.getenv("GEMINI_API_KEY"),
+        "api_url": os.getenv("GEMINI_API_URL"),
+        "timeout": float(os.getenv("GEMINI_TIMEOUT", "30")),
+    }
+
+CONFIG = load_config()
+GEMINI_API_KEY = CONFIG["api_key"]
+GEMINI_API_URL = CONFIG["api_url"]
+GEMINI_TIMEOUT = CONFIG["timeout"]
+DEFAULT_TIMEZONE = 'Asia/Karachi'
+
+def call_gemini_api(prompt: str, cache_key: str = None) -> str:
     if not GEMINI_API_KEY or not GEMINI_API_URL:
         return "❌ Gemini API configuration missing in .env"
 
-    try:
+    # Shared with the chat agent, so repeat questions skip the API entirely
+    cache = get_response_cache()
+    if cache_key:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    def _request():
+        import requests
+
         headers = {"Content-Type": "application/json"}
         payload = {"contents": [{"parts": [{"text": prompt}]}]}
-        response = requests.post(f"{GEMINI_API_URL}?key={GEMINI_API_KEY}", json=payload, headers=headers)
+        response = requests.post(f"{GEMINI_API_URL}?key={GEMINI_API_KEY}", json=payload, headers=headers,
+                                 timeout=GEMINI_TIMEOUT)
         response.raise_for_status()
-        return response.json().get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "No response from Gemini")
+        text = response.json().get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text")
+        if text and cache_key:
+            cache.set(cache_key, text)
+        return text
+
+    try:
+        # Reruns from other dashboard users asking the same thing wait on one request
+        # The gateway applies the shared rate limit, retries 429/5xx and trips the breaker
+        text = sync_flight.do(cache_key or make_cache_key("dashboard_prompt", prompt=prompt),
+                              lambda: get_model_gateway().call_sync(_request))
+        return text or "No response from Gemini"
     except Exception as e:
         return f"❌ Error: {str(e)}"
 
@@ -39,8 +71,15 @@ def parse_goal_input(text: str) -> str:
     match = re.search(pattern, text.lower())
     return f"{match[1]} {match[2]} {match[3]} in {match[4]} {match[5]}" if match else text
 
-def get_pkt_time() -> str:
-    return datetime.now(pytz.timezone('Asia/Karachi')).isoformat()
+@st.cache_resource
+def timezone_names() -> list:
+    from zoneinfo import available_timezones
+
+    return sorted(available_timezones())
+
+def get_local_time() -> str:
+    # The user's chosen zone (sidebar); Asia/Karachi until they pick one
+    return datetime.now(ZoneInfo(st.session_state.get("timezone", DEFAULT_TIMEZONE))).isoformat()
 
 # ---------- UI Styling ----------
 st.markdown("""
@@ -102,12 +141,30 @@ if "context" not in st.session_state:
 if "is_authenticated" not in st.session_state:
     st.session_state.is_authenticated = False
 
-auth = UserAuth()
-profile_manager = ProfileManager()
+if "timezone" not in st.session_state:
+    st.session_state.timezone = DEFAULT_TIMEZONE
+
+@st.cache_resource
+def get_services():
+    # Built once per process; they share pooled connections to health_wellness.db
+    return UserAuth(), ProfileManager()
+
+auth, profile_manager = get_services()
+
+@st.cache_resource
+def start_background_workers():
+    # Started with the app, so reminders and mail stored before a restart go out without waiting for a new one
+    from utils.reminder_scheduler import get_reminder_worker
+    from utils.email_outbox import get_outbox_worker
+
+    return get_reminder_worker(), get_outbox_worker()
+
+start_background_workers()
 
 # ---------- Sidebar ----------
 st.sidebar.title("⚕️ SmartCare Health & Wellness Planner")
 page = st.sidebar.radio("Navigation", ["Dashboard", "Profile", "Progress Analytics", "Alerts"]) if st.session_state.is_authenticated else "Dashboard"
+st.sidebar.selectbox("Timezone", timezone_names(), key="timezone")
 
 # ---------- Dashboard ----------
 if page == "Dashboard":
@@ -153,7 +210,7 @@ if page == "Dashboard":
                     with st.spinner("Generating plan..."):
                         structured_goal = parse_goal_input(user_input)
                         st.session_state.context.goal = structured_goal
-                        st.session_state.context.timestamp = get_pkt_time()
+                        st.session_state.context.timestamp = get_local_time()
 
                         prompt = (
                             f"User input: {structured_goal}\n"
@@ -162,12 +219,18 @@ if page == "Dashboard":
                             "Generate a detailed weekly health plan including meals, workouts, injury support, and tips."
                         )
 
-                        response = call_gemini_api(prompt)
+                        cache_key = make_cache_key(
+                            "dashboard_plan",
+                            goal=structured_goal,
+                            diet_preferences=st.session_state.context.diet_preferences,
+                            health_conditions=st.session_state.context.health_conditions,
+                        )
+                        response = call_gemini_api(prompt, cache_key)
 
                         if "Error" not in response:
                             st.markdown("### 🧠 Your AI-Powered Plan")
                             st.markdown(response)
-                            st.session_state.context.handoff_logs.append(f"{get_pkt_time()} | {user_input} -> {response}")
+                            st.session_state.context.handoff_logs.append(f"{get_local_time()} | {user_input} -> {response}")
                             st.success("✅ Plan Ready!")
                         else:
                             st.error(response)
@@ -199,6 +262,11 @@ elif page == "Profile":
 
 # ---------- Progress Analytics ----------
 elif page == "Progress Analytics":
+    import io
+    from utils.export_pdf import generate_progress_report
+    from utils.export_logs import export_logs
+    from utils.progress_chart import generate_progress_chart
+
     st.title("📊 Progress Analytics")
 
     with st.expander("📄 Generate Reports"):
@@ -206,23 +274,40 @@ elif page == "Progress Analytics":
 
         if col1.button("Download PDF Report"):
             with st.spinner("Generating report..."):
-                st.session_state.context.timestamp = get_pkt_time()
+                st.session_state.context.timestamp = get_local_time()
                 result = generate_progress_report(st.session_state.context)
                 if result and result.get("pdf_content"):
                     st.download_button(
                         label="Download PDF",
                         data=result["pdf_content"],
-                        file_name=f"progress_report_{get_pkt_time()}.pdf",
+                        file_name=f"progress_report_{get_local_time()}.pdf",
                         mime="application/pdf"
                     )
                     st.success("📄 Report ready!")
                 else:
                     st.error("⚠️ Failed to generate report. Please try again.")
 
+        export_format = col2.selectbox("Log format", ["csv", "jsonl", "parquet", "txt"])
+        export_range = col2.date_input("Recorded between", value=(), help="Leave empty to export everything")
         if col2.button("Export Logs"):
-            st.success("📤 Logs exported successfully (placeholder)")
+            with st.spinner("Exporting logs..."):
+                buffer = io.BytesIO()
+                since, until = (tuple(export_range) + (None, None))[:2]
+                compression = None if export_format == "parquet" else "gzip"
+                result = export_logs(st.session_state.context, buffer, fmt=export_format,
+                                     compression=compression, since=since, until=until or since)
+                if "error" not in result:
+                    suffix = f".{export_format}" + (".gz" if compression else "")
+                    st.download_button(
+                        label=f"Download {result['rows']} log entries",
+                        data=buffer.getvalue(),
+                        file_name=f"logs_{st.session_state.context.uid}{suffix}",
+                        mime="application/gzip" if compression else "application/octet-stream"
+                    )
+                else:
+                    st.error(f"⚠️ {result['error']}")
 
-    tab1, tab2 = st.tabs(["🗂️ Consultations", "📆 Timeline"])
+    tab1, tab2, tab3 = st.tabs(["🗂️ Consultations", "📆 Timeline", "📈 Trends"])
 
     with tab1:
         if not st.session_state.context.handoff_logs:
@@ -238,10 +323,28 @@ elif page == "Progress Analytics":
             for log in st.session_state.context.progress_logs:
                 st.markdown(f"<div style='background: #16213e; padding: 10px; border-radius: 8px;'>📅 {log['timestamp']}: {log['event']}</div>", unsafe_allow_html=True)
 
+    with tab3:
+        chart = generate_progress_chart(st.session_state.context)
+        if chart.get("image"):
+            st.image(chart["image"])
+        else:
+            st.info(chart.get("message") or chart.get("error", "No chart available."))
+
 # ---------- Alerts ----------
 elif page == "Alerts":
+    from utils.notifications import send_progress_email
+    from utils.reminder_scheduler import schedule_reminder, list_reminders, pending_notifications, dismiss_notifications
+
     st.title("🔔 Notification Center")
 
+    notifications = pending_notifications(st.session_state.context.uid)
+    if notifications:
+        for notification in notifications:
+            st.info(f"⏰ {notification['event']} — {notification['timestamp']}")
+        if st.button("Dismiss reminders"):
+            dismiss_notifications(st.session_state.context.uid, notifications[0]["id"])
+            st.rerun()
+
     with st.expander("✉️ Email Notifications"):
         col1, col2 = st.columns(2)
         email = col1.text_input("Email*", value=st.session_state.context.email)
@@ -250,8 +353,12 @@ elif page == "Alerts":
 
         if st.button("Save Email Settings"):
             if email:
-                result = send_progress_email(st.session_state.context, email, "smtp.gmail.com", 587, "your_email@gmail.com", "your_app_password")
-                st.success(f"✉️ {result['message']}")
+                # Queued in the outbox; delivery uses the SMTP_* settings and never blocks the page
+                result = send_progress_email(st.session_state.context, email)
+                if "error" not in result:
+                    st.success(f"✉️ {result['message']}")
+                else:
+                    st.error(f"⚠️ {result['error']}")
             else:
                 st.error("⚠️ Email is required.")
 
@@ -263,11 +370,20 @@ elif page == "Alerts":
         method = col2.radio("Notify By", ["Email", "In-App"])
 
         if st.button("Save Reminder"):
-            result = schedule_reminder(st.session_state.context, time, email, "smtp.gmail.com", 587, "your_email@gmail.com", "your_app_password")
-            st.success(f"⏰ {result['message']}")
+            result = schedule_reminder(st.session_state.context, reminder_type, time, days, method=method,
+                                       timezone=st.session_state.timezone, recipient_email=email)
+            if "error" not in result:
+                st.success(f"⏰ {result['message']}")
+            else:
+                st.error(f"⚠️ {result['error']}")
+
+        for reminder in list_reminders(st.session_state.context.uid):
+            next_at = datetime.fromtimestamp(reminder["next_fire_at"], ZoneInfo(st.session_state.timezone))
+            st.markdown(f"• {reminder['kind']} at {reminder['local_time']} ({reminder['timezone']}), "
+                        f"next {next_at.strftime('%a %d %b %H:%M')} via {reminder['method'].replace('_', '-')}")
 
 # ---------- Footer ----------
-st.markdown(f"<div style='text-align: center; color: #a4b0be;'>© {datetime.now().year} HealthSync Wellness | Last updated: {get_pkt_time()}</div>", unsafe_allow_html=True)
+st.markdown(f"<div style='text-align: center; color: #a4b0be;'>© {datetime.now().year} HealthSync Wellness | Last updated: {get_local_time()}</div>", unsafe_allow_html=True)
 
 # ---------- Sidebar Help ----------
 st.sidebar.markdown("""
@@ -1,5 +1,6 @@
 import chainlit as cl
 import uuid
+import logging
 from agent import HealthWellnessAgent
 from context import UserSessionContext
 from tools.goal_analyzer import GoalAnalyzerTool
@@ -11,6 +12,11 @@ from agents.escalation_agent import EscalationAgent
 from agents.nutrition_expert_agent import NutritionExpertAgent
 from agents.injury_support_agent import InjurySupportAgent
 from hooks import CustomRunHooks
+from openai_agents import Runner
+from utils.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+db = DatabaseManager()
 
 @cl.on_chat_start
 async def on_chat_start():
@@ -49,12 +55,30 @@ async def on_chat_start():
 async def on_message(message: cl.Message):
     agent = cl.user_session.get("agent")
     context = cl.user_session.get("context")
-    result = await agent.process_input(message.content, context)
+    reply = cl.Message(content="")
+    result = {}
+
+    # Stream advice tokens into one message; tools and handoffs show up as steps
+    async for step in Runner.stream(agent, message.content, context):
+        if step.type == "token":
+            await reply.stream_token(step.data)
+        elif step.type in ("tool", "handoff", "tool_error"):
+            async with cl.Step(name=step.name, type="tool") as tool_step:
+                tool_step.output = step.pretty_output
+        elif step.type == "final":
+            result = step.data
 
     # Handle response
     if "agent_advice" in result:
-        await cl.Message(content=result["agent_advice"]).send()
+        reply.content = result["agent_advice"]
+        await reply.send()
     elif "error" in result:
         await cl.Message(content=f"❌ {result['error']}").send()
     else:
         await cl.Message(content="🤔 I didn’t understand. Try rephrasing.").send()
+
+    # Persist off the event loop; writes from every session are committed in batches
+    try:
+        await db.save_context_async(context)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not save session context: {e}")
@@ -41,14 +41,35 @@ class Tool(ABC):
     async def execute(self, _input_text: str, _context: UserSessionContext) -> Any:
         pass  # type: ignore
 
+class Step:
+    """One event from a streamed run: "tool", "handoff", "tool_error", "token", "error" or "final"."""
+    def __init__(self, type: str, data: Any = None, name: Optional[str] = None):
+        self.type = type
+        self.data = data
+        self.name = name
+
+    @property
+    def pretty_output(self) -> str:
+        if self.type == "token":
+            return self.data
+        if self.type in ("tool", "handoff") and isinstance(self.data, dict):
+            return f"{self.name}: {self.data.get('message', self.data)}"
+        if self.name:
+            return f"{self.name}: {self.data}"
+        return str(self.data)
+
+    def __repr__(self) -> str:
+        return f"Step(type={self.type!r}, name={self.name!r})"
+
 class Runner:
     @staticmethod
-    async def stream(starting_agent: Any, input_text: str, context: UserSessionContext) -> AsyncGenerator[Any, None]:
-        class Step:
-            def __init__(self, output: str):
-                self.pretty_output = output
+    async def stream(starting_agent: Any, input_text: str, context: UserSessionContext) -> AsyncGenerator[Step, None]:
+        if hasattr(starting_agent, "process_input_stream"):
+            async for step in starting_agent.process_input_stream(input_text, context):
+                yield step
+            return
         response = await starting_agent.process_input(input_text, context)
-        yield Step(str(response))
+        yield Step("final", response)
 
 class RunHooks:
     def on_agent_start(self, _agent_name: str, _context: UserSessionContext) -> None:
@@ -0,0 +1,132 @@
+import re
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Vocabulary for handoff agents that do not declare their own trigger_keywords
+DEFAULT_HANDOFF_KEYWORDS = {
+    "escalation": ["real trainer", "talk to someone", "escalate"],
+    "injury_support": ["knee", "joint"],
+    "nutrition_expert": ["diabetic", "diabetes"],
+}
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Compile keywords into one trie-shaped regex that prefers the longest match."""
+    trie: Dict[str, Any] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Greedy optional: try the longer keyword before stopping at this one
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+@dataclass
+class Route:
+    name: str
+    kind: str  # "tool", "handoff" or "escalation"
+    keywords: List[str]
+    condition: Optional[Callable[[str, Any], bool]] = None  # Extra non-keyword trigger
+
+
+@dataclass
+class RoutingDecision:
+    tools: List[str] = field(default_factory=list)
+    handoffs: List[str] = field(default_factory=list)
+    escalate: bool = False
+    matched: Dict[str, List[str]] = field(default_factory=dict)  # route name -> keywords hit
+
+    def keywords_for(self, name: str) -> List[str]:
+        return self.matched.get(name, [])
+
+    def explain(self) -> Dict[str, Any]:
+        return {"tools": self.tools, "handoffs": self.handoffs, "escalate": self.escalate, "matched": self.matched}
+
+
+class Router:
+    """Single-pass keyword routing for tools and handoffs.
+
+    Every vocabulary is compiled once into one regex; each message is
+    lowercased and scanned once, whatever the number of routes.
+    """
+
+    def __init__(self, routes: List[Route], cache_size: int = 1024):
+        self.routes = routes
+        self._owners: Dict[str, List[str]] = {}
+        for route in routes:
+            for keyword in route.keywords:
+                self._owners.setdefault(keyword.lower(), []).append(route.name)
+        keywords = sorted(self._owners)
+        # Every keyword starting where a longer one matched is one of its prefixes
+        self._prefixes = {kw: [k for k in keywords if kw.startswith(k)] for kw in keywords}
+        self._pattern = re.compile(f"(?=({_trie_pattern(keywords)}))") if keywords else None
+        self._cache: "OrderedDict[str, Dict[str, List[str]]]" = OrderedDict()
+        self._cache_size = cache_size
+
+    @classmethod
+    def for_agent(cls, tools: List[Any], handoffs: Dict[str, Any]) -> "Router":
+        routes = []
+        for tool in tools:
+            keywords = getattr(tool, "trigger_keywords", None)
+            name = getattr(tool, "name", type(tool).__name__)
+            if keywords is None:
+                # Tools without a vocabulary keep their own should_trigger
+                routes.append(Route(name, "tool", [], lambda text, ctx, tool=tool: tool.should_trigger(text, ctx)))
+            else:
+                routes.append(Route(name, "tool", list(keywords), getattr(tool, "trigger_condition", None)))
+        for name, agent in handoffs.items():
+            keywords = getattr(agent, "trigger_keywords", None) or DEFAULT_HANDOFF_KEYWORDS.get(name, [])
+            routes.append(Route(name, "escalation" if name == "escalation" else "handoff", list(keywords)))
+        return cls(routes)
+
+    def scan(self, input_text: str) -> Dict[str, List[str]]:
+        """Map route name -> keywords found in the text (one pass, memoized)."""
+        text = input_text.lower()
+        cached = self._cache.get(text)
+        if cached is not None:
+            self._cache.move_to_end(text)
+            return cached
+
+        found: Set[str] = set()
+        if self._pattern:
+            for match in self._pattern.finditer(text):
+                if match.group(1):
+                    found.update(self._prefixes[match.group(1)])
+        matched: Dict[str, List[str]] = {}
+        for keyword in sorted(found):
+            for owner in self._owners[keyword]:
+                matched.setdefault(owner, []).append(keyword)
+
+        self._cache[text] = matched
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return matched
+
+    def route(self, input_text: str, context: Any) -> RoutingDecision:
+        matched = self.scan(input_text)
+        decision = RoutingDecision(matched=dict(matched))
+        for route in self.routes:
+            hit = route.name in matched or (route.condition is not None and route.condition(input_text, context))
+            if not hit:
+                continue
+            if route.kind == "tool":
+                decision.tools.append(route.name)
+            elif route.kind == "escalation":
+                decision.escalate = True
+            else:
+                decision.handoffs.append(route.name)
+        logger.debug("🧭 Routing %r: %s", input_text, decision)
+        return decision
@@ -0,0 +1,17 @@
+import pytest
+from context import UserSessionContext
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    # A fresh database per test; storage and workers are process-wide per path, so nothing is shared
+    return str(tmp_path / "health_wellness.db")
+
+
+@pytest.fixture
+def make_context():
+    def _make(uid: int = 1, **fields) -> UserSessionContext:
+        defaults = dict(name=f"User{uid}", uid=uid, handoff_logs=[], progress_logs=[], diet_preferences=[],
+                        health_conditions=[])
+        return UserSessionContext(**{**defaults, **fields})
+    return _make
@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+from utils.database import DatabaseManager
+
+
+def event_count(db, uid, kind="progress"):
+    return db.storage.query_one("SELECT COUNT(*) FROM user_events WHERE uid = ? AND kind = ?", (uid, kind))[0]
+
+
+def test_save_appends_only_entries_added_since_the_last_save(db_path, make_context):
+    db = DatabaseManager(db_path)
+    context = make_context(progress_logs=[{"event": "ran 5km", "timestamp": "2026-01-01"}], handoff_logs=["nutrition"])
+
+    db.save_context(context)
+    db.save_context(context)  # nothing new
+    context.progress_logs.append({"event": "swam", "timestamp": "2026-01-02"})
+    db.save_context(context)
+
+    assert event_count(db, 1) == 2 and event_count(db, 1, "handoff") == 1
+    assert (context.progress_log_offset, context.handoff_log_offset) == (2, 1)
+    assert [event["payload"]["event"] for event in db.iter_events(1)] == ["swam", "ran 5km"]
+
+
+def test_loaded_context_resumes_from_its_offsets(db_path, make_context):
+    db = DatabaseManager(db_path, recent_limit=3)
+    context = make_context(progress_logs=[{"event": f"day {i}"} for i in range(5)])
+    db.save_context(context)
+
+    loaded = db.load_context(1)
+    # Only the newest recent_limit entries come back, all counted as already stored
+    assert [log["event"] for log in loaded.progress_logs] == ["day 2", "day 3", "day 4"]
+    assert loaded.progress_log_offset == 3 and loaded.handoff_log_offset == 0
+
+    loaded.progress_logs.append({"event": "day 5"})
+    db.save_context(loaded)
+
+    assert event_count(db, 1) == 6
+    assert db.recent_events(1, limit=1)[0]["payload"] == {"event": "day 5"}
+
+
+def test_failed_save_keeps_entries_unsaved(db_path, make_context, monkeypatch):
+    db = DatabaseManager(db_path)
+    context = make_context(progress_logs=[{"event": "ran"}])
+
+    def broken(conn, rows, events):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(DatabaseManager, "_write_rows", staticmethod(broken))
+    with pytest.raises(RuntimeError):
+        db.save_context(context)
+    assert context.progress_log_offset == 0
+
+    monkeypatch.undo()
+    db.save_context(context)
+    assert event_count(db, 1) == 1 and context.progress_log_offset == 1
+
+
+def test_async_save_snapshots_the_delta(db_path, make_context):
+    db = DatabaseManager(db_path)
+    context = make_context(progress_logs=[{"event": "ran"}])
+
+    async def scenario():
+        pending = asyncio.ensure_future(db.save_context_async(context))
+        await asyncio.sleep(0)
+        context.progress_logs.append({"event": "added while saving"})
+        await pending
+        await db.save_context_async(context)
+        return await db.load_context_async(1)
+
+    loaded = asyncio.run(scenario())
+    assert event_count(db, 1) == 2
+    assert [log["event"] for log in loaded.progress_logs] == ["ran", "added while saving"]
@@ -0,0 +1,80 @@
+import sqlite3
+import threading
+import pytest
+from utils.db_worker import DBWorker
+from utils.storage import Storage
+
+
+@pytest.fixture
+def worker(db_path):
+    storage = Storage(db_path)
+    storage.execute("CREATE TABLE items (name TEXT UNIQUE)")
+    worker = DBWorker(storage)
+    yield worker
+    worker.close()
+    storage.close()
+
+
+def insert(name):
+    return lambda conn: conn.execute("INSERT INTO items (name) VALUES (?)", (name,)).lastrowid
+
+
+def names(worker):
+    return sorted(row[0] for row in worker.storage.query_all("SELECT name FROM items"))
+
+
+def hold_writer(worker):
+    """Park the writer thread inside a write so everything queued next lands in one batch."""
+    entered, release = threading.Event(), threading.Event()
+    blocker = worker.submit_write(lambda conn: (entered.set(), release.wait(5)))
+    assert entered.wait(5)
+    return blocker, release
+
+
+def test_failed_write_is_rolled_back_without_touching_its_batch(worker):
+    blocker, release = hold_writer(worker)
+
+    def partial_then_fail(conn):
+        conn.execute("INSERT INTO items (name) VALUES ('half-done')")
+        conn.execute("INSERT INTO items (name) VALUES ('first')")  # UNIQUE violation
+
+    futures = [worker.submit_write(insert("first")), worker.submit_write(partial_then_fail),
+               worker.submit_write(insert("second"))]
+    release.set()
+    blocker.result(5)
+
+    assert futures[0].result(5) and futures[2].result(5)
+    with pytest.raises(sqlite3.IntegrityError):
+        futures[1].result(5)
+    # The failing write's own first insert went with its savepoint
+    assert names(worker) == ["first", "second"]
+    stats = worker.stats()
+    assert stats["batches"] == 2 and stats["writes"] == 4 and stats["failed"] == 1
+
+
+def test_writes_queued_together_share_one_commit(worker):
+    blocker, release = hold_writer(worker)
+    futures = [worker.submit_write(insert(f"item{i}")) for i in range(20)]
+    release.set()
+
+    assert [future.result(5) for future in futures] == list(range(1, 21))
+    assert worker.stats()["batches"] == 2
+    assert len(names(worker)) == 20
+
+
+def test_batch_that_cannot_begin_fails_every_write(worker, db_path):
+    # Shorter busy timeout on the writer's own connection, so the locked BEGIN gives up quickly
+    worker.submit_write(lambda conn: conn.execute("PRAGMA busy_timeout = 100")).result(5)
+    other = sqlite3.connect(db_path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")  # holds the write lock past the worker's busy timeout
+    try:
+        futures = [worker.submit_write(insert("blocked")), worker.submit_write(insert("also blocked"))]
+        for future in futures:
+            with pytest.raises(sqlite3.OperationalError):
+                future.result(5)
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+
+    assert worker.submit_write(insert("after")).result(5)
+    assert names(worker) == ["after"]
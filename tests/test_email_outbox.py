@@ -0,0 +1,69 @@
+import time
+import pytest
+from utils.email_outbox import EmailOutbox, OutboxWorker, SMTPPool, SMTPSettings, build_progress_email
+from utils.smtp_sink import SMTPSink, serve_smtp_sink
+
+
+@pytest.fixture
+def sink():
+    server = serve_smtp_sink(port=0, sink=SMTPSink(), background=True)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_worker(db_path, server, size=2):
+    settings = SMTPSettings(host="127.0.0.1", port=server.server_address[1], username="outbox", password="secret",
+                            starttls=False, timeout=5.0)
+    return OutboxWorker(EmailOutbox(db_path, base_delay=0.01, max_delay=0.01), SMTPPool(settings, size=size),
+                        concurrency=size, batch_size=4)
+
+
+def test_progress_email_lists_preferences_stored_as_text(make_context):
+    context = make_context(goal="lose 5kg")
+    context.diet_preferences = "Vegan, Gluten-free"  # as ProfileManager stores them
+
+    _, body = build_progress_email(context)
+
+    assert "Vegan, Gluten-free" in body
+    assert "V, e, g" not in body
+
+
+def test_worker_delivers_the_outbox_over_pooled_sessions(db_path, sink, make_context):
+    worker = make_worker(db_path, sink)
+    context = make_context(diet_preferences=["Vegetarian"])
+    subject, body = build_progress_email(context)
+    worker.outbox.enqueue_many((f"user{i}@example.com", subject, body, i) for i in range(10))
+    try:
+        totals = worker.drain()
+    finally:
+        worker.stop()
+
+    assert totals["sent"] == 10 and totals["batches"] == 3
+    assert worker.outbox.counts() == {"sent": 10}
+    stats = sink.sink.stats()
+    assert stats["messages"] == 10
+    # Sessions are reused across messages and batches instead of one login per email
+    assert stats["connections"] <= 2 and stats["logins"] == stats["connections"]
+    delivered = sorted(message["to"][0] for message in sink.sink.messages)
+    assert delivered == sorted(f"user{i}@example.com" for i in range(10))
+    assert b"Vegetarian" in sink.sink.messages[0]["data"]
+
+
+def test_deferred_messages_are_retried_then_delivered(db_path, sink):
+    worker = make_worker(db_path, sink, size=1)
+    worker.outbox.enqueue("someone@example.com", "Progress", "Keep going\n")
+    sink.sink.error_rate = 1.0  # 451 for every message
+    try:
+        first = worker.run_once()
+        assert first["retried"] == 1 and worker.outbox.counts() == {"pending": 1}
+
+        sink.sink.error_rate = 0.0
+        time.sleep(0.05)  # past the backoff
+        second = worker.run_once()
+    finally:
+        worker.stop()
+
+    assert second["sent"] == 1
+    assert worker.outbox.counts() == {"sent": 1}
+    assert sink.sink.stats()["rejected"] == 1
@@ -0,0 +1,84 @@
+import time
+import asyncio
+from utils.escalation_queue import EscalationQueue, escalation_priority, URGENT, HIGH, NORMAL
+
+
+def test_priority_from_keywords_and_conditions():
+    assert escalation_priority("I have chest pain")[0] == URGENT
+    assert escalation_priority("my knee hurts", [])[0] == HIGH
+    assert escalation_priority("talk to a trainer", "Diabetes, Asthma") == (HIGH, ["condition: Diabetes", "condition: Asthma"])
+    assert escalation_priority("talk to a trainer", []) == (NORMAL, [])
+
+
+def test_repeat_within_window_merges_into_the_open_item(db_path):
+    queue = EscalationQueue(db_path)
+
+    first = queue.enqueue(1, "please escalate, I want a real trainer")
+    repeat = queue.enqueue(1, "I have chest pain now")
+    other = queue.enqueue(2, "please escalate, I want a real trainer")
+
+    assert repeat == {"escalation_id": first["escalation_id"], "priority": "urgent", "deduplicated": True}
+    assert not other["deduplicated"] and other["escalation_id"] != first["escalation_id"]
+    item = queue.get(first["escalation_id"])
+    # The original message stays; the repeat is kept as a follow-up and raised the priority
+    assert item["message"] == "please escalate, I want a real trainer"
+    assert [f["message"] for f in item["follow_ups"]] == ["I have chest pain now"]
+    assert item["repeats"] == 1 and item["priority"] == "urgent"
+    assert queue.counts() == {"pending": 2}
+
+
+def test_repeats_in_one_batch_and_anonymous_text_dedup(db_path):
+    queue = EscalationQueue(db_path)
+
+    tickets = queue.enqueue_many([(None, "Talk to  someone", ()), (None, "talk to someone", ()),
+                                  (5, "escalate", ()), (5, "my back hurts", ())])
+
+    assert tickets[0]["escalation_id"] == tickets[1]["escalation_id"] and tickets[1]["deduplicated"]
+    assert tickets[2]["escalation_id"] == tickets[3]["escalation_id"]
+    # Every ticket reports the item's final priority
+    assert tickets[2]["priority"] == tickets[3]["priority"] == "high"
+    assert queue.counts() == {"pending": 2}
+
+
+def test_repeat_after_the_window_opens_a_new_item(db_path):
+    queue = EscalationQueue(db_path, dedup_window=0.05)
+    first = queue.enqueue(1, "escalate")
+    time.sleep(0.1)
+    assert queue.enqueue(1, "escalate")["escalation_id"] != first["escalation_id"]
+
+
+def test_claim_order_lease_expiry_and_ack(db_path):
+    queue = EscalationQueue(db_path, lease=0.1)
+    normal = queue.enqueue(1, "talk to someone")["escalation_id"]
+    urgent = queue.enqueue(2, "I fainted after training")["escalation_id"]
+
+    claimed = queue.claim("alice")
+    assert [item["escalation_id"] for item in claimed] == [urgent]
+    # Held under alice's lease, so bob gets the next item instead
+    assert [item["escalation_id"] for item in queue.claim("bob", limit=5)] == [normal]
+    assert queue.claim("carol") == []
+
+    time.sleep(0.15)
+    # Both leases ran out; carol picks up the urgent one again and alice can no longer ack it
+    assert [item["escalation_id"] for item in queue.claim("carol")] == [urgent]
+    assert not queue.ack(urgent, "alice", "called back")
+    assert queue.ack(urgent, "carol", "called back")
+
+    item = queue.get(urgent)
+    assert (item["status"], item["claimed_by"], item["resolution"]) == ("resolved", "carol", "called back")
+    assert queue.release(normal, "bob")
+    assert queue.counts() == {"pending": 1, "resolved": 1}
+    # A resolved item is not reopened by a repeat
+    assert queue.enqueue(2, "I fainted again")["escalation_id"] != urgent
+
+
+def test_enqueue_async_shares_the_dedup(db_path):
+    queue = EscalationQueue(db_path)
+
+    async def burst():
+        return await asyncio.gather(*(queue.enqueue_async(9, f"escalate {i}") for i in range(5)))
+
+    tickets = asyncio.run(burst())
+    assert len({ticket["escalation_id"] for ticket in tickets}) == 1
+    assert sum(ticket["deduplicated"] for ticket in tickets) == 4
+    assert queue.get(tickets[0]["escalation_id"])["repeats"] == 4
@@ -0,0 +1,98 @@
+import json
+import sqlite3
+from utils.database import DatabaseManager
+from utils.migrations import MIGRATIONS, migrate, schema_version
+from utils.user_auth import UserAuth
+
+# The shared table as the old DatabaseManager created it, before UserAuth added its columns
+LEGACY_CONTEXT_TABLE = """
+    CREATE TABLE users (
+        uid INTEGER PRIMARY KEY, name TEXT, goal TEXT, diet_preferences TEXT, workout_plan TEXT,
+        meal_plan TEXT, injury_notes TEXT, handoff_logs TEXT, progress_logs TEXT
+    )
+"""
+
+
+def legacy_database(db_path, statements):
+    conn = sqlite3.connect(db_path)
+    for sql, params in statements:
+        conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+def test_mixed_legacy_users_table_is_split(db_path):
+    legacy_database(db_path, [
+        (LEGACY_CONTEXT_TABLE, ()),
+        # UserAuth ran second and widened the context table with its credential columns
+        ("ALTER TABLE users ADD COLUMN email TEXT", ()),
+        ("ALTER TABLE users ADD COLUMN username TEXT", ()),
+        ("ALTER TABLE users ADD COLUMN password TEXT", ()),
+        ("INSERT INTO users (uid, name, goal, diet_preferences, workout_plan, meal_plan, injury_notes, handoff_logs, progress_logs) "
+         "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+         (7, "Fatima", json.dumps("lose 5kg"), "Vegetarian", json.dumps({"days": []}), "null", "sore left knee",
+          json.dumps(["nutrition_expert"]), json.dumps([{"event": "ran 5km"}, {"event": "swam"}]))),
+        ("INSERT INTO users (uid, name, goal, diet_preferences, injury_notes) VALUES (?, ?, ?, ?, ?)",
+         (8, "Ali", "null", json.dumps(["Vegan"]), json.dumps({"area": "back"}))),
+        # Registration picked its own uid, so credentials and context never shared a row
+        ("INSERT INTO users (email, username, password, uid) VALUES (?, ?, ?, ?)", ("ali@example.com", "ali", "pw", 90)),
+    ])
+
+    db = DatabaseManager(db_path)
+
+    conn = db.storage.connection()
+    assert schema_version(conn) == MIGRATIONS[-1][0]
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "users" not in tables and "legacy_users" in tables
+    # Only rows with a name were contexts; the credential row became an account
+    assert [row[0] for row in conn.execute("SELECT uid FROM user_contexts ORDER BY uid")] == [7, 8]
+    assert UserAuth(db_path).authenticate_user("ali@example.com", "pw")["uid"] == 90
+
+    fatima = db.load_context(7)
+    assert fatima.goal == "lose 5kg"
+    # Raw text from the old save_context comes back in the shape the model expects
+    assert fatima.diet_preferences == ["Vegetarian"]
+    assert fatima.injury_notes == {"notes": "sore left knee"}
+    assert [log["event"] for log in fatima.progress_logs] == ["ran 5km", "swam"]
+    assert fatima.handoff_logs == ["nutrition_expert"]
+    assert fatima.progress_log_offset == 2
+
+    ali = db.load_context(8)
+    assert ali.diet_preferences == ["Vegan"] and ali.injury_notes == {"area": "back"}
+    assert ali.progress_logs == [] and ali.goal is None
+
+
+def test_credentials_only_table_becomes_accounts(db_path):
+    legacy_database(db_path, [
+        ("CREATE TABLE users (email TEXT PRIMARY KEY, username TEXT, password TEXT, uid INTEGER)", ()),
+        ("INSERT INTO users VALUES (?, ?, ?, ?)", ("a@example.com", "a", "pw", 11)),
+        ("INSERT INTO users VALUES (?, ?, ?, ?)", ("b@example.com", "b", "pw", None)),
+    ])
+
+    db = DatabaseManager(db_path)
+
+    accounts = dict(db.storage.query_all("SELECT email, uid FROM accounts"))
+    assert accounts["a@example.com"] == 11
+    assert accounts["b@example.com"] is not None  # given a fresh uid
+    assert db.storage.query_one("SELECT COUNT(*) FROM user_contexts")[0] == 0
+
+
+def test_already_split_raw_text_is_reencoded(db_path):
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    # Stop at version 7, as databases split before the re-encoding step did
+    migrate_to = [step for step in MIGRATIONS if step[0] <= 7]
+    conn.execute("BEGIN")
+    for version, _, step in migrate_to:
+        step(conn)
+    conn.execute(f"PRAGMA user_version = {migrate_to[-1][0]}")
+    conn.execute("INSERT INTO user_contexts (uid, name, goal, diet_preferences, injury_notes) VALUES (1, 'A', 'null', 'Keto', 'bad wrist')")
+    conn.execute("INSERT INTO user_contexts (uid, name, goal, diet_preferences, injury_notes) VALUES (2, 'B', 'null', '[\"Vegan\"]', NULL)")
+    conn.execute("COMMIT")
+
+    assert migrate(conn) == MIGRATIONS[-1][0]
+    conn.close()
+
+    db = DatabaseManager(db_path)
+    assert db.load_context(1).diet_preferences == ["Keto"]
+    assert db.load_context(1).injury_notes == {"notes": "bad wrist"}
+    assert db.load_context(2).diet_preferences == ["Vegan"] and db.load_context(2).injury_notes is None
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from utils.reminder_scheduler import add_reminder, fire_reminder, next_fire, weekday_mask
+from utils.storage import get_storage
+from utils.migrations import ensure_migrated
+
+NEW_YORK = ZoneInfo("America/New_York")
+EVERY_DAY = weekday_mask(["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"])
+
+
+def at(year, month, day, hour, minute):
+    return datetime(year, month, day, hour, minute, tzinfo=NEW_YORK).timestamp()
+
+
+def local(timestamp):
+    return datetime.fromtimestamp(timestamp, NEW_YORK)
+
+
+def test_weekday_mask_accepts_short_and_long_names():
+    assert weekday_mask(["Mon", "wed", "Friday"]) == 0b0010101
+    assert weekday_mask([]) == 0
+
+
+def test_next_fire_rolls_over_to_the_next_selected_weekday():
+    mon_wed_fri = weekday_mask(["Mon", "Wed", "Fri"])
+    # Friday 2026-05-15: before 07:30 it is today, at or after it is next Monday
+    assert local(next_fire("07:30", mon_wed_fri, "America/New_York", at(2026, 5, 15, 7, 0))) == \
+        datetime(2026, 5, 15, 7, 30, tzinfo=NEW_YORK)
+    assert local(next_fire("07:30", mon_wed_fri, "America/New_York", at(2026, 5, 15, 7, 30))) == \
+        datetime(2026, 5, 18, 7, 30, tzinfo=NEW_YORK)
+    # A single weekday already passed today comes round a week later
+    assert local(next_fire("07:30", weekday_mask(["Fri"]), "America/New_York", at(2026, 5, 15, 9, 0))) == \
+        datetime(2026, 5, 22, 7, 30, tzinfo=NEW_YORK)
+    assert next_fire("07:30", 0, "America/New_York", at(2026, 5, 15, 9, 0)) is None
+
+
+def test_next_fire_keeps_local_time_across_dst_changes():
+    # US clocks spring forward on 2026-03-08: a daily 07:30 reminder is 23 hours after the previous one
+    saturday = next_fire("07:30", EVERY_DAY, "America/New_York", at(2026, 3, 7, 6, 0))
+    sunday = next_fire("07:30", EVERY_DAY, "America/New_York", saturday)
+    assert (local(sunday).hour, local(sunday).minute) == (7, 30)
+    assert sunday - saturday == timedelta(hours=23).total_seconds()
+    # ...and fall back on 2026-11-01, making that day's gap 25 hours
+    saturday = next_fire("07:30", EVERY_DAY, "America/New_York", at(2026, 10, 31, 6, 0))
+    sunday = next_fire("07:30", EVERY_DAY, "America/New_York", saturday)
+    assert sunday - saturday == timedelta(hours=25).total_seconds()
+
+
+def test_next_fire_inside_dst_gap_and_overlap():
+    # 02:30 does not exist on 2026-03-08; it fires at the same instant as 03:30 EDT
+    skipped = next_fire("02:30", EVERY_DAY, "America/New_York", at(2026, 3, 8, 0, 0))
+    assert local(skipped).strftime("%H:%M %Z") == "03:30 EDT"
+    # 01:30 happens twice on 2026-11-01; only the first (EDT) occurrence fires, then the next day's
+    first = next_fire("01:30", EVERY_DAY, "America/New_York", at(2026, 11, 1, 0, 0))
+    assert local(first).strftime("%H:%M %Z") == "01:30 EDT"
+    following = next_fire("01:30", EVERY_DAY, "America/New_York", first)
+    assert local(following) == datetime(2026, 11, 2, 1, 30, tzinfo=NEW_YORK)
+
+
+def test_fire_advances_the_row_once(db_path):
+    storage = get_storage(db_path)
+    ensure_migrated(storage)
+    with storage.transaction() as conn:
+        fire_at, reminder_id = add_reminder(conn, 3, "Meal", "12:00", EVERY_DAY, "UTC", "in_app")
+        outcome, following = fire_reminder(conn, reminder_id, fire_at, fire_at + 1, grace=3600)
+        # A second worker holding the same heap entry finds the row already advanced
+        assert fire_reminder(conn, reminder_id, fire_at, fire_at + 2, grace=3600) == ("stale", None)
+
+    assert outcome == "fired" and following == fire_at + 86400
+    assert storage.query_one("SELECT next_fire_at FROM reminders WHERE id = ?", (reminder_id,))[0] == following
+    payload = storage.query_one("SELECT payload FROM user_events WHERE uid = 3 AND kind = 'reminder'")[0]
+    assert "Time for your meal" in payload
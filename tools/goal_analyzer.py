@@ -1,34 +1,37 @@
 import re
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from context import UserSessionContext
 
+GOAL_PATTERN = re.compile(
+    r"(lose|gain)\s+"             # lose/gain
+    r"(\d+(?:\.\d+)?)\s*"         # number (5 or 5.5)
+    r"(kg|kgs|lbs|pounds)?\s*"    # optional unit
+    r"(in)?\s*"
+    r"(\d+)\s*"
+    r"(weeks?|months?)"
+)
+
+def parse_goal(input_text: str) -> Optional[re.Match]:
+    """Match a goal like 'lose 5kg in 2 months' in free text."""
+    cleaned = input_text.lower().replace("loss", "lose").strip()
+    return GOAL_PATTERN.search(cleaned)
+
 class GoalAnalyzerTool:
     name = "GoalAnalyzerTool"
     description = "Extracts and sets the user's fitness goal."
+    trigger_keywords = ["lose", "gain", "weight", "fat", "muscle"]
 
     def should_trigger(self, input_text: str, context: UserSessionContext) -> bool:
         """
         Trigger if the input mentions weight or fitness goals.
         """
-        keywords = ["lose", "gain", "weight", "fat", "muscle"]
-        return any(word in input_text.lower() for word in keywords)
+        return any(word in input_text.lower() for word in self.trigger_keywords)
 
     async def execute(self, input_text: str, context: UserSessionContext) -> Dict[str, Any]:
         """
         Parses input like 'lose 5kg in 2 months' and stores the goal in context.
         """
-        cleaned = input_text.lower().replace("loss", "lose").strip()
-
-        pattern = (
-            r"(lose|gain)\s+"             # lose/gain
-            r"(\d+(?:\.\d+)?)\s*"         # number (5 or 5.5)
-            r"(kg|kgs|lbs|pounds)?\s*"    # optional unit
-            r"(in)?\s*"
-            r"(\d+)\s*"
-            r"(weeks?|months?)"
-        )
-
-        match = re.search(pattern, cleaned)
+        match = parse_goal(input_text)
         if match:
             action, amount, unit, _, duration, duration_unit = match.groups()
             unit = unit or "kg"
@@ -4,10 +4,10 @@ from context import UserSessionContext
 class MealPlannerTool:
     name = "MealPlannerTool"
     description = "Suggests a vegetarian meal plan based on user preferences."
+    trigger_keywords = ["meal", "diet", "plan", "food", "vegetarian"]
 
     def should_trigger(self, input_text: str, context: UserSessionContext) -> bool:
-        keywords = ["meal", "diet", "plan", "food", "vegetarian"]
-        return any(word in input_text.lower() for word in keywords)
+        return any(word in input_text.lower() for word in self.trigger_keywords)
 
     async def execute(self, user_input: str, context: UserSessionContext) -> Dict[str, Any]:
         if "vegetarian" not in context.diet_preferences:
@@ -1,17 +1,30 @@
+from datetime import datetime
 from openai_agents import Tool
 from context import UserSessionContext
 from guardrails import validate_output
-import asyncio
+from utils.reminder_scheduler import has_account_async, schedule_reminder_async
 
 class CheckinSchedulerTool(Tool):
-    def __init__(self):
+    trigger_keywords = ["schedule", "checkin"]
+
+    def __init__(self, db_path: str = "health_wellness.db"):
         super().__init__(name="CheckinSchedulerTool")
+        self.db_path = db_path
 
     def should_trigger(self, input_text: str, context: UserSessionContext) -> bool:
-        return "schedule" in input_text.lower() or "checkin" in input_text.lower()
+        return any(word in input_text.lower() for word in self.trigger_keywords)
 
     async def execute(self, input_text: str, context: UserSessionContext) -> dict:
-        await asyncio.sleep(1)  # Simulate async processing
         schedule = {"checkin": "Weekly progress check scheduled for every Monday"}
-        context.progress_logs.append({"event": "Scheduled weekly checkin", "timestamp": "now"})
+        # Chat sessions get a throwaway uid; only registered users get a stored reminder they can see and cancel
+        if await has_account_async(context.uid, self.db_path):
+            # A real recurring in-app reminder: Mondays 09:00 in the default timezone
+            result = await schedule_reminder_async(context, "Checkin", "09:00", ["Mon"], message="Weekly progress check-in",
+                                                   db_path=self.db_path)
+            if "error" in result:
+                return validate_output(result, context)
+            schedule["next"] = result["message"]
+        else:
+            schedule["next"] = "Sign in on the dashboard to get a recurring reminder"
+        context.progress_logs.append({"event": "Scheduled weekly checkin", "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
         return validate_output({"schedule": schedule}, context)
\ No newline at end of file
@@ -3,11 +3,13 @@ from context import UserSessionContext
 from guardrails import validate_output
 import asyncio
 class ProgressTrackerTool(Tool):
+    trigger_keywords = ["progress", "update"]
+
     def __init__(self):
         super().__init__(name="ProgressTrackerTool")
 
     def should_trigger(self, input_text: str, context: UserSessionContext) -> bool:
-        return "progress" in input_text.lower() or "update" in input_text.lower()
+        return any(word in input_text.lower() for word in self.trigger_keywords)
 
     async def execute(self, input_text: str, context: UserSessionContext) -> dict:
         await asyncio.sleep(1)  # Simulate async processing
@@ -1,14 +1,22 @@
 from openai_agents import Tool
 from context import UserSessionContext
 from guardrails import validate_output
+from tools.goal_analyzer import parse_goal
 import asyncio
 
 class WorkoutRecommenderTool(Tool):
+    trigger_keywords = ["workout"]
+
     def __init__(self):
         super().__init__(name="WorkoutRecommenderTool")
 
     def should_trigger(self, input_text: str, context: UserSessionContext) -> bool:
-        return context.goal is not None or "workout" in input_text.lower()
+        return "workout" in input_text.lower() or self.trigger_condition(input_text, context)
+
+    def trigger_condition(self, input_text: str, context: UserSessionContext) -> bool:
+        # A goal parsed from this same message counts too, since GoalAnalyzerTool
+        # may still be running alongside this tool
+        return context.goal is not None or parse_goal(input_text) is not None
 
     async def execute(self, input_text: str, context: UserSessionContext) -> dict:
         await asyncio.sleep(1)  # Simulate async processing
@@ -0,0 +1,181 @@
+"""Render the progress report of every user into a directory, resumably.
+
+Users are paged from user_contexts in uid order and rendered in a process
+pool with a bounded number of reports in flight. Each finished user is
+appended to checkpoint.jsonl in the output directory, so re-running the same
+command skips users already done and retries the ones that failed.
+
+    python -m utils.batch_reports reports/2026-10 --workers 8 --archive reports/2026-10.zip
+"""
+import os
+import json
+import time
+import logging
+import zipfile
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, Optional, Set
+from utils.error_handler import handle_operation
+from utils.storage import get_storage
+from utils.migrations import ensure_migrated
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT = "checkpoint.jsonl"
+
+
+def render_user(db_path: str, uid: int, output_dir: str) -> Dict:
+    """Write one user's report to <output_dir>/<uid>.pdf; top level so process pools can pickle it."""
+    from utils.database import DatabaseManager
+    from utils.export_pdf import write_progress_report
+
+    db = DatabaseManager(db_path)
+    context = db.load_context(uid)
+    if context is None:
+        raise LookupError(f"user {uid} has no saved context")
+    path = os.path.join(output_dir, f"{uid}.pdf")
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, "wb") as out:
+        entries = write_progress_report(context, out, db)
+    os.replace(partial, path)
+    return {"uid": uid, "file": os.path.basename(path), "entries": entries, "bytes": os.path.getsize(path)}
+
+
+class BatchReports:
+    def __init__(self, db_path: str = "health_wellness.db", workers: int = 0, page_size: int = 1000):
+        self.db_path = db_path
+        self.workers = workers
+        self.page_size = page_size
+        self.storage = get_storage(db_path)
+        ensure_migrated(self.storage)
+
+    def _uids(self) -> Iterator[int]:
+        # Keyset pages keep the read short and the uid list out of memory
+        last = -1
+        while True:
+            page = self.storage.query_all(
+                "SELECT uid FROM user_contexts WHERE uid > ? ORDER BY uid LIMIT ?", (last, self.page_size)
+            )
+            for (uid,) in page:
+                yield uid
+            if len(page) < self.page_size:
+                return
+            last = page[-1][0]
+
+    @staticmethod
+    def _completed(checkpoint_path: str) -> Set[int]:
+        done = set()
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+                    if entry.get("status") == "ok":
+                        done.add(entry["uid"])
+        return done
+
+    def _results(self, uids: Iterator[int], output_dir: str) -> Iterator[Dict]:
+        if self.workers <= 1:
+            for uid in uids:
+                try:
+                    yield {"status": "ok", **render_user(self.db_path, uid, output_dir)}
+                except Exception as e:
+                    yield {"status": "failed", "uid": uid, "error": str(e)}
+            return
+
+        # spawn, not fork: children must not inherit the parent's open SQLite connections
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            pending: Dict[Future, int] = {}
+            for uid in uids:
+                pending[pool.submit(render_user, self.db_path, uid, output_dir)] = uid
+                if len(pending) < self.workers * 4:
+                    continue
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from self._collect(finished, pending)
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from self._collect(finished, pending)
+
+    @staticmethod
+    def _collect(finished, pending: Dict[Future, int]) -> Iterator[Dict]:
+        for future in finished:
+            uid = pending.pop(future)
+            try:
+                yield {"status": "ok", **future.result()}
+            except Exception as e:
+                yield {"status": "failed", "uid": uid, "error": str(e)}
+
+    def run(self, output_dir: str, archive: Optional[str] = None, log_every: int = 500) -> dict:
+        """Render reports for every user not yet in the checkpoint; returns counts and throughput."""
+        def _run():
+            os.makedirs(output_dir, exist_ok=True)
+            checkpoint_path = os.path.join(output_dir, CHECKPOINT)
+            done = self._completed(checkpoint_path)
+            todo = (uid for uid in self._uids() if uid not in done)
+
+            started = time.perf_counter()
+            counts = {"rendered": 0, "failed": 0, "skipped": len(done), "entries": 0, "bytes": 0}
+            failures = []
+            with open(checkpoint_path, "a+") as checkpoint:
+                if checkpoint.tell():
+                    checkpoint.seek(checkpoint.tell() - 1)
+                    if checkpoint.read(1) != "\n":
+                        checkpoint.write("\n")  # end a line cut short by a crash
+                for result in self._results(todo, output_dir):
+                    checkpoint.write(json.dumps(result) + "\n")
+                    checkpoint.flush()
+                    if result["status"] == "ok":
+                        counts["rendered"] += 1
+                        counts["entries"] += result["entries"]
+                        counts["bytes"] += result["bytes"]
+                    else:
+                        counts["failed"] += 1
+                        failures.append({"uid": result["uid"], "error": result["error"]})
+                        logger.warning(f"⚠️ Report for user {result['uid']} failed: {result['error']}")
+                    processed = counts["rendered"] + counts["failed"]
+                    if processed % log_every == 0:
+                        logger.info(f"📄 {processed} reports, {processed / (time.perf_counter() - started):.1f}/s")
+
+            if archive:
+                self._archive(output_dir, archive)
+            elapsed = time.perf_counter() - started
+            logger.info(f"📦 Batch done: {counts['rendered']} rendered, {counts['failed']} failed in {elapsed:.1f}s")
+            return {
+                **counts,
+                "failures": failures[:100],
+                "elapsed_s": elapsed,
+                "reports_per_s": counts["rendered"] / elapsed if elapsed else 0.0,
+                "output_dir": output_dir,
+                "archive": archive,
+                "message": "Batch reports generated successfully" if not counts["failed"] else
+                           f"Batch finished with {counts['failed']} failures; re-run to retry them",
+            }
+
+        return handle_operation(_run)
+
+    @staticmethod
+    def _archive(output_dir: str, archive: str):
+        # PDFs are already deflated, so they are stored as-is
+        partial = f"{archive}.tmp"
+        with zipfile.ZipFile(partial, "w", compression=zipfile.ZIP_STORED) as zf:
+            for entry in os.scandir(output_dir):
+                if entry.name.endswith(".pdf"):
+                    zf.write(entry.path, entry.name)
+        os.replace(partial, archive)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate progress reports for every user")
+    parser.add_argument("output_dir", help="reports and checkpoint.jsonl are written here; re-run to resume")
+    parser.add_argument("--db", default="health_wellness.db")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes (0 or 1 = in-process)")
+    parser.add_argument("--archive", help="also pack the reports into this .zip when done")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    summary = BatchReports(args.db, workers=args.workers).run(args.output_dir, args.archive)
+    print(json.dumps(summary, indent=2))
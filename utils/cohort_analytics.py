@@ -0,0 +1,240 @@
+"""Platform-wide analytics over every user, read in bounded chunks.
+
+Activity data is read from activity_daily_rollups (refreshed incrementally
+first), partitioned by uid range. Each partition streams its rows in uid
+order with fetchmany and reduces every chunk of whole users to per-day and
+per-type totals with pandas, so partials merge by plain addition and memory
+stays flat however many users there are. Partitions can run in a process pool.
+
+    python -m utils.cohort_analytics --workers 4 --output cohort.json
+"""
+import json
+import time
+import logging
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from utils.error_handler import handle_operation
+from utils.storage import get_storage
+from utils.migrations import ensure_migrated
+from utils.workout_history import ActivityAnalytics
+from tools.goal_analyzer import GOAL_PATTERN
+
+logger = logging.getLogger(__name__)
+
+GOAL_ACTIVITY = "Goal Submission"
+LBS_TO_KG = 0.453592
+WEEKS_PER_UNIT = {"week": 1.0, "month": 4.345}
+UNIX_EPOCH_JULIAN_DAY = 2440587  # CAST(julianday('1970-01-01') AS INTEGER)
+
+
+def _empty_partial() -> Dict[str, Any]:
+    import pandas as pd
+
+    return {
+        "rows": 0,
+        "activities": 0,
+        "daily_active": pd.Series(dtype="int64"),  # day number -> distinct users
+        "by_type": pd.Series(dtype="int64"),
+        "active_users": 0,
+        "submitted_goal": 0,
+        "returned_after_goal": 0,
+    }
+
+
+def _reduce_users(partial: Dict[str, Any], frame) -> Dict[str, Any]:
+    """Fold rows covering complete users into the partial's totals."""
+    if frame.empty:
+        return partial
+    frame = frame[frame["day"].notna()]
+    partial["rows"] += len(frame)
+    partial["activities"] += int(frame["count"].sum())
+    daily = frame.drop_duplicates(["uid", "day"])["day"].value_counts()
+    partial["daily_active"] = partial["daily_active"].add(daily, fill_value=0).astype("int64")
+    partial["by_type"] = partial["by_type"].add(frame.groupby("activity_type", observed=True)["count"].sum(), fill_value=0).astype("int64")
+
+    last_active = frame.groupby("uid")["day"].max()
+    first_goal = frame[frame["activity_type"] == GOAL_ACTIVITY].groupby("uid")["day"].min()
+    partial["active_users"] += len(last_active)
+    partial["submitted_goal"] += len(first_goal)
+    partial["returned_after_goal"] += int((last_active.reindex(first_goal.index) > first_goal).sum())
+    return partial
+
+
+def _to_frame(rows: List[Tuple]):
+    import numpy as np
+    import pandas as pd
+
+    # Typed columns straight from the tuples; from_records' per-cell inference is the slow part
+    uids, days, types, counts = zip(*rows)
+    return pd.DataFrame({
+        "uid": np.fromiter(uids, dtype=np.int64, count=len(rows)),
+        "day": np.array(days, dtype=np.float64),  # NULL for unparseable timestamps
+        "activity_type": pd.Categorical(types),
+        "count": np.fromiter(counts, dtype=np.int64, count=len(rows)),
+    })
+
+
+def scan_partition(db_path: str, low: int, high: int, chunk_size: int) -> Dict[str, Any]:
+    """Aggregate rollups for low < uid <= high; top level so process pools can pickle it."""
+    import pandas as pd
+
+    partial = _empty_partial()
+    # Read-only: partitions never contend for the write lock
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        cursor = conn.execute(f"""
+            SELECT uid, CAST(julianday(day) AS INTEGER) - {UNIX_EPOCH_JULIAN_DAY}, activity_type, count
+            FROM activity_daily_rollups WHERE uid > ? AND uid <= ? ORDER BY uid, day
+        """, (low, high))
+        carry = None
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            frame = _to_frame(rows)
+            if carry is not None:
+                frame = pd.concat([carry, frame], ignore_index=True)
+            # The last user may continue into the next chunk, so hold their rows back
+            last_uid = frame["uid"].iat[-1]
+            carry = frame[frame["uid"] == last_uid]
+            partial = _reduce_users(partial, frame[frame["uid"] != last_uid])
+        if carry is not None:
+            partial = _reduce_users(partial, carry)
+    finally:
+        conn.close()
+    return partial
+
+
+def _merge(partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # uid ranges are disjoint, so every total simply adds up
+    merged = _empty_partial()
+    for partial in partials:
+        for key, value in partial.items():
+            if hasattr(value, "add"):
+                merged[key] = merged[key].add(value, fill_value=0).astype("int64")
+            else:
+                merged[key] += value
+    return merged
+
+
+def _day_label(day_number: int) -> str:
+    import numpy as np
+
+    return str(np.datetime64(int(day_number), "D"))
+
+
+def classify_goals(goals) -> Dict[str, Any]:
+    """Vectorized version of GoalAnalyzerTool's parsing over a Series of goal strings."""
+    import numpy as np
+    import pandas as pd
+
+    cleaned = goals.dropna().astype(str).str.strip('"').str.lower().str.replace("loss", "lose", regex=False)
+    parts = cleaned.str.extract(GOAL_PATTERN.pattern).dropna(subset=[0, 1, 4, 5])
+    if parts.empty:
+        return {"parsed": 0, "by_action": {}, "amount_kg": {}, "pace_kg_per_week": {}}
+
+    amount = parts[1].astype(float).to_numpy()
+    amount_kg = np.where(parts[2].isin(["lbs", "pounds"]).to_numpy(), amount * LBS_TO_KG, amount)
+    weeks = (parts[4].astype(float) * parts[5].str.rstrip("s").map(WEEKS_PER_UNIT)).to_numpy()
+    pace = np.divide(amount_kg, weeks, out=np.zeros(len(parts)), where=weeks > 0)
+
+    amount_bins = pd.cut(amount_kg, [0, 2, 5, 10, 20, np.inf], labels=["<2kg", "2-5kg", "5-10kg", "10-20kg", "20kg+"])
+    pace_bins = pd.cut(pace, [-np.inf, 0.25, 0.5, 1.0, np.inf], labels=["<0.25", "0.25-0.5", "0.5-1", ">1"])
+    return {
+        "parsed": int(len(parts)),
+        "by_action": {k: int(v) for k, v in parts[0].value_counts().items()},
+        "amount_kg": {str(k): int(v) for k, v in pd.Series(amount_bins).value_counts(sort=False).items()},
+        "pace_kg_per_week": {str(k): int(v) for k, v in pd.Series(pace_bins).value_counts(sort=False).items()},
+    }
+
+
+class CohortAnalytics:
+    def __init__(self, db_path: str = "health_wellness.db", chunk_size: int = 200_000, workers: int = 0):
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.storage = get_storage(db_path)
+        ensure_migrated(self.storage)
+
+    def _partitions(self) -> List[Tuple[int, int]]:
+        low, high = self.storage.query_one("SELECT MIN(uid), MAX(uid) FROM activity_daily_rollups")
+        if low is None:
+            return []
+        count = max(1, self.workers)
+        step = (high - low + count) // count
+        return [(low - 1 + i * step, min(high, low - 1 + (i + 1) * step)) for i in range(count)]
+
+    def _scan_activities(self) -> Dict[str, Any]:
+        # Only activities added since the last refresh are folded in here
+        ActivityAnalytics(self.db_path).refresh()
+        partitions = self._partitions()
+        args = [(self.db_path, low, high, self.chunk_size) for low, high in partitions]
+        if self.workers > 1 and len(partitions) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                partials = list(pool.map(scan_partition, *zip(*args)))
+        else:
+            partials = [scan_partition(*arg) for arg in args]
+        return _merge(partials)
+
+    def _scan_goals(self) -> Tuple[Dict[str, Any], int]:
+        import pandas as pd
+
+        totals: Dict[str, Any] = {"parsed": 0, "by_action": {}, "amount_kg": {}, "pace_kg_per_week": {}}
+        with_goal = 0
+        for chunk in pd.read_sql_query("SELECT goal FROM user_contexts WHERE goal IS NOT NULL AND goal != 'null'",
+                                       self.storage.connection(), chunksize=self.chunk_size):
+            with_goal += len(chunk)
+            found = classify_goals(chunk["goal"])
+            totals["parsed"] += found["parsed"]
+            for section in ("by_action", "amount_kg", "pace_kg_per_week"):
+                for key, value in found[section].items():
+                    totals[section][key] = totals[section].get(key, 0) + value
+        return totals, with_goal
+
+    def report(self, output_path: Optional[str] = None) -> dict:
+        """Daily active users, activity mix, goal funnel and goal-type distribution for all users."""
+        def _report():
+            started = time.perf_counter()
+            scan = self._scan_activities()
+            goal_types, goals_on_profile = self._scan_goals()
+            registered = self.storage.query_one("SELECT COUNT(*) FROM accounts")[0]
+
+            result = {
+                "total_activities": int(scan["activities"]),
+                "rows_scanned": int(scan["rows"]),
+                "daily_active_users": {_day_label(day): int(n) for day, n in scan["daily_active"].sort_index().items()},
+                "activity_by_type": {k: int(v) for k, v in scan["by_type"].items()},
+                "goal_funnel": {
+                    "registered": int(registered),
+                    "active": int(scan["active_users"]),
+                    "submitted_goal": int(scan["submitted_goal"]),
+                    "goal_on_profile": int(goals_on_profile),
+                    "returned_after_goal": int(scan["returned_after_goal"]),
+                },
+                "goal_types": goal_types,
+                "elapsed_s": time.perf_counter() - started,
+                "message": "Cohort analytics generated successfully"
+            }
+            if output_path:
+                with open(output_path, "w") as f:
+                    json.dump(result, f, indent=2)
+            logger.info(f"📊 Cohort report over {result['total_activities']} activities in {result['elapsed_s']:.2f}s")
+            return result
+
+        return handle_operation(_report)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Platform-wide activity and goal analytics")
+    parser.add_argument("--db", default="health_wellness.db")
+    parser.add_argument("--workers", type=int, default=0, help="processes for the activity scan (0 = in-process)")
+    parser.add_argument("--chunk-size", type=int, default=200_000)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    report = CohortAnalytics(args.db, chunk_size=args.chunk_size, workers=args.workers).report(args.output)
+    if not args.output:
+        print(json.dumps(report, indent=2))
@@ -1,74 +1,302 @@
-import sqlite3
 import json
-from typing import Optional
+import gzip
+import time
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from context import UserSessionContext
+from utils.storage import get_storage
+from utils.db_worker import get_db_worker
+from utils.migrations import ensure_migrated
+
+# progress_logs and handoff_logs are stored as rows in user_events under these kinds
+LOG_KINDS = {"progress": "progress_logs", "handoff": "handoff_logs"}
+CONTEXT_COLUMNS = "uid, name, goal, diet_preferences, health_conditions, workout_plan, meal_plan, injury_notes"
+
+
+def _chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _open_text(path: str, mode: str):
+    return gzip.open(path, mode + "t", encoding="utf-8") if path.endswith(".gz") else open(path, mode, encoding="utf-8")
+
 
 class DatabaseManager:
-    def __init__(self, db_path: str = "health_wellness.db"):
+    def __init__(self, db_path: str = "health_wellness.db", recent_limit: int = 50):
         self.db_path = db_path
+        self.recent_limit = recent_limit
+        self.storage = get_storage(db_path)
+        self.worker = get_db_worker(db_path)
         self.init_db()
 
     def init_db(self):
-        # Create the 'users' table if it doesn't exist already
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    uid INTEGER PRIMARY KEY,
-                    name TEXT,
-                    goal TEXT,
-                    diet_preferences TEXT,
-                    workout_plan TEXT,
-                    meal_plan TEXT,
-                    injury_notes TEXT,
-                    handoff_logs TEXT,
-                    progress_logs TEXT
-                )
-            """)
-            conn.commit()
+        # user_contexts / user_events live in the versioned schema
+        ensure_migrated(self.storage)
+
+    @staticmethod
+    def _take_delta(context: UserSessionContext) -> Dict[str, List[str]]:
+        """Claim the log entries not yet persisted and advance the offsets past them."""
+        delta = {}
+        for kind, field in LOG_KINDS.items():
+            logs = getattr(context, field)
+            offset = min(getattr(context, f"{kind}_log_offset"), len(logs))
+            # Serialized here so the write never sees entries mutated after the call
+            delta[kind] = [json.dumps(event) for event in logs[offset:]]
+            setattr(context, f"{kind}_log_offset", len(logs))
+        return delta
+
+    @staticmethod
+    def _restore_delta(context: UserSessionContext, delta: Dict[str, List[str]]):
+        # The write failed, so those entries are still unsaved
+        for kind, events in delta.items():
+            attr = f"{kind}_log_offset"
+            setattr(context, attr, max(0, getattr(context, attr) - len(events)))
+
+    @staticmethod
+    def _profile_row(context: UserSessionContext) -> Tuple:
+        return (
+            context.uid,
+            context.name,
+            json.dumps(context.goal),
+            json.dumps(context.diet_preferences),
+            json.dumps(context.health_conditions),
+            json.dumps(context.workout_plan),
+            json.dumps(context.meal_plan),
+            json.dumps(context.injury_notes),
+            time.time(),
+        )
+
+    @staticmethod
+    def _write_context(conn, row: Tuple, delta: Dict[str, List[str]]):
+        DatabaseManager._write_rows(conn, [row], [(row[0], kind, payload) for kind, events in delta.items() for payload in events])
+
+    @staticmethod
+    def _write_rows(conn, rows: List[Tuple], events: List[Tuple]):
+        # Profile fields are small and overwritten; history is only appended to
+        conn.executemany("""
+            INSERT OR REPLACE INTO user_contexts (
+                uid, name, goal, diet_preferences, health_conditions, workout_plan, meal_plan, injury_notes, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        now = time.time()
+        conn.executemany(
+            "INSERT INTO user_events (uid, kind, payload, created_at) VALUES (?, ?, ?, ?)",
+            [event + (now,) for event in events]
+        )
+
+    def _read_context(self, conn, uid: int) -> Optional[UserSessionContext]:
+        row = conn.execute(f"SELECT {CONTEXT_COLUMNS} FROM user_contexts WHERE uid = ?", (uid,)).fetchone()
+        if not row:
+            return None
+
+        # Only the most recent events are loaded; older history is paged on demand
+        logs = {kind: [event["payload"] for event in reversed(self._page(conn, uid, kind, None, self.recent_limit))]
+                for kind in LOG_KINDS}
+        return self._build_context(row, logs)
+
+    @staticmethod
+    def _build_context(row: Tuple, logs: Dict[str, List[Any]]) -> UserSessionContext:
+        return UserSessionContext(
+            uid=row[0],
+            name=row[1],
+            goal=json.loads(row[2]) if row[2] else None,
+            diet_preferences=json.loads(row[3]) if row[3] else [],
+            health_conditions=json.loads(row[4]) if row[4] else [],
+            workout_plan=json.loads(row[5]) if row[5] else None,
+            meal_plan=json.loads(row[6]) if row[6] else None,
+            injury_notes=json.loads(row[7]) if row[7] else None,
+            handoff_logs=logs["handoff"],
+            progress_logs=logs["progress"],
+            handoff_log_offset=len(logs["handoff"]),
+            progress_log_offset=len(logs["progress"])
+        )
+
+    @staticmethod
+    def _page(conn, uid: int, kind: str, before_id: Optional[int], limit: int) -> List[Dict[str, Any]]:
+        """Newest-first page of events older than before_id."""
+        rows = conn.execute(
+            "SELECT id, payload, created_at FROM user_events WHERE uid = ? AND kind = ? AND id < ? ORDER BY id DESC LIMIT ?",
+            (uid, kind, before_id if before_id is not None else 2 ** 63 - 1, limit)
+        ).fetchall()
+        return [{"id": r[0], "payload": json.loads(r[1]), "created_at": r[2]} for r in rows]
 
     def save_context(self, context: UserSessionContext):
-        # Save or update user session context in the database
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                INSERT OR REPLACE INTO users (
-                    uid, name, goal, diet_preferences, workout_plan,
-                    meal_plan, injury_notes, handoff_logs, progress_logs
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                context.uid,
-                context.name,
-                json.dumps(context.goal),
-                context.diet_preferences,
-                json.dumps(context.workout_plan),
-                json.dumps(context.meal_plan),
-                context.injury_notes,
-                json.dumps(context.handoff_logs),
-                json.dumps(context.progress_logs)
-            ))
-
-            conn.commit()
+        # Save profile fields and append only the log entries added since the last save
+        delta = self._take_delta(context)
+        try:
+            with self.storage.transaction() as conn:
+                self._write_context(conn, self._profile_row(context), delta)
+        except Exception:
+            self._restore_delta(context, delta)
+            raise
 
     def load_context(self, uid: int) -> Optional[UserSessionContext]:
-        # Load a user's session context from the database using their UID
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM users WHERE uid = ?", (uid,))
-            row = cursor.fetchone()
-
-            if row:
-                return UserSessionContext(
-                    uid=row[0],
-                    name=row[1],
-                    goal=json.loads(row[2]) if row[2] else None,
-                    diet_preferences=row[3],
-                    workout_plan=json.loads(row[4]) if row[4] else None,
-                    meal_plan=json.loads(row[5]) if row[5] else None,
-                    injury_notes=row[6],
-                    handoff_logs=json.loads(row[7]) if row[7] else [],
-                    progress_logs=json.loads(row[8]) if row[8] else []
-                )
-
-        return None
+        # Load a user's session context with only the most recent events
+        return self._read_context(self.storage.connection(), uid)
+
+    async def save_context_async(self, context: UserSessionContext):
+        # Snapshot now so later edits to the live context don't leak into this write
+        delta = self._take_delta(context)
+        row = self._profile_row(context)
+        try:
+            await self.worker.write(lambda conn: self._write_context(conn, row, delta))
+        except Exception:
+            self._restore_delta(context, delta)
+            raise
+
+    async def load_context_async(self, uid: int) -> Optional[UserSessionContext]:
+        return await self.worker.read(lambda conn: self._read_context(conn, uid))
+
+    def recent_events(self, uid: int, kind: str = "progress", before_id: Optional[int] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """One page of older history, newest first; pass the last id seen as before_id."""
+        return self._page(self.storage.connection(), uid, kind, before_id, limit)
+
+    def iter_events(self, uid: int, kind: str = "progress", page_size: int = 200) -> Iterator[Dict[str, Any]]:
+        """Walk a user's full history newest first, one page at a time."""
+        before_id = None
+        while True:
+            page = self._page(self.storage.connection(), uid, kind, before_id, page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            before_id = page[-1]["id"]
+
+    def scan_events(self, uid: int, kind: str, since: Optional[float] = None, until: Optional[float] = None,
+                    page_size: int = 1000) -> Iterator[List[Tuple[int, str, float]]]:
+        """Pages of (id, payload JSON, created_at) for one kind, oldest first, optionally within [since, until)."""
+        conn = self.storage.connection()
+        last_id = 0
+        while True:
+            # Per kind and keyed on id, so every page is a range read of the (uid, kind, id) index
+            rows = conn.execute(
+                "SELECT id, payload, created_at FROM user_events "
+                "WHERE uid = ? AND kind = ? AND id > ? AND created_at >= ? AND created_at < ? ORDER BY id LIMIT ?",
+                (uid, kind, last_id, since if since is not None else 0.0,
+                 until if until is not None else float("inf"), page_size)
+            ).fetchall()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+
+    # ---------- bulk APIs (nightly jobs, data moves) ----------
+
+    def save_contexts(self, contexts: Iterable[UserSessionContext], chunk_size: int = 500) -> int:
+        """Save many contexts, one transaction and two executemany calls per chunk."""
+        saved = 0
+        for chunk in _chunks(contexts, chunk_size):
+            deltas = [self._take_delta(context) for context in chunk]
+            events = [(context.uid, kind, payload)
+                      for context, delta in zip(chunk, deltas) for kind, payloads in delta.items() for payload in payloads]
+            try:
+                with self.storage.transaction() as conn:
+                    self._write_rows(conn, [self._profile_row(context) for context in chunk], events)
+            except Exception:
+                for context, delta in zip(chunk, deltas):
+                    self._restore_delta(context, delta)
+                raise
+            saved += len(chunk)
+        return saved
+
+    def load_contexts(self, uids: Iterable[int], chunk_size: int = 500) -> Iterator[UserSessionContext]:
+        """Yield contexts for the given uids (missing ones are skipped), a chunk of queries at a time."""
+        conn = self.storage.connection()
+        for chunk in _chunks(uids, chunk_size):
+            marks = ",".join("?" * len(chunk))
+            rows = conn.execute(f"SELECT {CONTEXT_COLUMNS} FROM user_contexts WHERE uid IN ({marks})", chunk).fetchall()
+            yield from self._with_recent_logs(conn, rows)
+
+    def iter_contexts(self, chunk_size: int = 500) -> Iterator[UserSessionContext]:
+        """Yield every saved context in uid order, paging by key so memory stays flat."""
+        conn = self.storage.connection()
+        last_uid = None
+        while True:
+            rows = conn.execute(
+                f"SELECT {CONTEXT_COLUMNS} FROM user_contexts WHERE ? IS NULL OR uid > ? ORDER BY uid LIMIT ?",
+                (last_uid, last_uid, chunk_size)
+            ).fetchall()
+            if not rows:
+                return
+            yield from self._with_recent_logs(conn, rows)
+            last_uid = rows[-1][0]
+
+    def _with_recent_logs(self, conn, rows: List[Tuple]) -> Iterator[UserSessionContext]:
+        # One window query fetches the recent events of the whole chunk
+        uids = [row[0] for row in rows]
+        logs: Dict[int, Dict[str, List[Any]]] = {uid: {kind: [] for kind in LOG_KINDS} for uid in uids}
+        if uids:
+            marks = ",".join("?" * len(uids))
+            for uid, kind, payload in conn.execute(f"""
+                SELECT uid, kind, payload FROM (
+                    SELECT uid, kind, payload, id,
+                           ROW_NUMBER() OVER (PARTITION BY uid, kind ORDER BY id DESC) AS recent
+                    FROM user_events WHERE uid IN ({marks})
+                ) WHERE recent <= ? ORDER BY id
+            """, uids + [self.recent_limit]):
+                if kind in LOG_KINDS:
+                    logs[uid][kind].append(json.loads(payload))
+        for row in rows:
+            yield self._build_context(row, logs[row[0]])
+
+    def export_jsonl(self, path: str, chunk_size: int = 1000) -> Dict[str, int]:
+        """Dump contexts and their full event history as JSONL (.gz compresses), in bounded memory."""
+        conn = self.storage.connection()
+        counts = {"contexts": 0, "events": 0}
+        with _open_text(path, "w") as f:
+            f.write(json.dumps({"type": "header", "schema_version": conn.execute("PRAGMA user_version").fetchone()[0],
+                                "exported_at": time.time()}) + "\n")
+            for table, kind, key, columns in (("user_contexts", "context", "uid", CONTEXT_COLUMNS + ", updated_at"),
+                                              ("user_events", "event", "id", "id, uid, kind, payload, created_at")):
+                names = [name.strip() for name in columns.split(",")]
+                last = None
+                while True:
+                    rows = conn.execute(
+                        f"SELECT {columns} FROM {table} WHERE ? IS NULL OR {key} > ? ORDER BY {key} LIMIT ?",
+                        (last, last, chunk_size)
+                    ).fetchall()
+                    if not rows:
+                        break
+                    f.writelines(json.dumps({"type": kind, **dict(zip(names, row))}) + "\n" for row in rows)
+                    counts[kind + "s"] += len(rows)
+                    last = rows[-1][0]
+        return counts
+
+    def import_jsonl(self, path: str, chunk_size: int = 1000) -> Dict[str, int]:
+        """Load an export_jsonl dump chunk by chunk; re-importing the same file is a no-op for events."""
+        counts = {"contexts": 0, "events": 0}
+        context_columns = CONTEXT_COLUMNS + ", updated_at"
+        names = [name.strip() for name in context_columns.split(",")]
+
+        def records():
+            with _open_text(path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+        for chunk in _chunks(records(), chunk_size):
+            contexts = [tuple(r.get(name) for name in names) for r in chunk if r.get("type") == "context"]
+            events = [(r["id"], r["uid"], r["kind"], r["payload"], r["created_at"]) for r in chunk if r.get("type") == "event"]
+            with self.storage.transaction() as conn:
+                conn.executemany(f"INSERT OR REPLACE INTO user_contexts ({context_columns}) VALUES ({','.join('?' * len(names))})", contexts)
+                conn.executemany("INSERT OR IGNORE INTO user_events (id, uid, kind, payload, created_at) VALUES (?, ?, ?, ?, ?)", events)
+            counts["contexts"] += len(contexts)
+            counts["events"] += len(events)
+        return counts
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bulk export/import of saved user contexts as JSONL")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("path", help="JSONL file; a .gz suffix compresses")
+    parser.add_argument("--db", default="health_wellness.db")
+    args = parser.parse_args()
+    manager = DatabaseManager(args.db)
+    counts = manager.export_jsonl(args.path) if args.action == "export" else manager.import_jsonl(args.path)
+    print(f"{args.action}ed {counts['contexts']} contexts and {counts['events']} events")
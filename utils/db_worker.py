@@ -0,0 +1,152 @@
+import os
+import queue
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from utils.storage import DEFAULT_DB_PATH, Storage, get_storage
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class DBWorker:
+    """Keeps SQLite off the event loop.
+
+    Writes go to one dedicated thread that drains whatever is pending and
+    commits it as a single transaction, each write under its own savepoint
+    so one failure does not undo its neighbours. Reads run on a small thread
+    pool, each thread with its own WAL connection, so they never wait behind
+    a commit.
+    """
+
+    def __init__(self, storage: Storage, max_batch: int = 64, read_workers: int = 4):
+        self.storage = storage
+        self.max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+        self._readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="db-read")
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.counters = {"writes": 0, "batches": 0, "failed": 0, "reads": 0}
+
+    # ---------- sync submission ----------
+
+    def submit_write(self, fn: Callable[[Any], Any]) -> Future:
+        """Queue fn(conn) for the writer thread; the future resolves after commit."""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def submit_read(self, fn: Callable[[Any], Any]) -> Future:
+        with self._lock:
+            self.counters["reads"] += 1
+        return self._readers.submit(lambda: fn(self.storage.connection()))
+
+    # ---------- async API ----------
+
+    async def write(self, fn: Callable[[Any], Any]) -> Any:
+        return await asyncio.wrap_future(self.submit_write(fn))
+
+    async def read(self, fn: Callable[[Any], Any]) -> Any:
+        return await asyncio.wrap_future(self.submit_read(fn))
+
+    # ---------- writer thread ----------
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Group commit: everything that queued up during the last write goes in together
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(item is _STOP for item in batch)
+            writes = [item for item in batch if item is not _STOP]
+            if writes:
+                self._commit(writes)
+            if stop:
+                return
+
+    def _commit(self, writes: List[Tuple[Callable[[Any], Any], Future]]):
+        conn = self.storage.connection()
+        outcomes: List[Tuple[Future, str, Any]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in writes:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT write")
+                try:
+                    outcomes.append((future, "ok", fn(conn)))
+                    conn.execute("RELEASE write")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    outcomes.append((future, "error", e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            # The whole batch is lost, so every writer hears about it
+            logger.error(f"❌ Database batch of {len(writes)} writes failed: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # BEGIN itself can fail (locked past busy_timeout) before any future was started
+            outcomes = [(future, "error", e) for _, future in writes
+                        if future.running() or future.set_running_or_notify_cancel()]
+
+        failed = 0
+        for future, kind, value in outcomes:
+            if kind == "ok":
+                future.set_result(value)
+            else:
+                failed += 1
+                future.set_exception(value)
+        with self._lock:
+            self.counters["writes"] += len(writes)
+            self.counters["batches"] += 1
+            self.counters["failed"] += failed
+
+    def flush(self, timeout: Optional[float] = None):
+        """Block until every write queued so far is committed."""
+        self.submit_write(lambda conn: None).result(timeout)
+
+    def close(self):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+        self._readers.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+        stats["pending"] = self._queue.qsize()
+        stats["avg_batch"] = stats["writes"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+
+_workers: Dict[str, DBWorker] = {}
+_workers_lock = threading.Lock()
+
+
+def get_db_worker(db_path: str = DEFAULT_DB_PATH) -> DBWorker:
+    """Process-wide worker per database file, shared by every session."""
+    key = os.path.abspath(db_path)
+    with _workers_lock:
+        worker = _workers.get(key)
+        if worker is None:
+            worker = _workers[key] = DBWorker(get_storage(db_path))
+        return worker
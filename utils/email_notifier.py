@@ -2,8 +2,8 @@
 import smtplib
 from email.mime.text import MIMEText
 from context import UserSessionContext
-from datetime import datetime
 from utils.error_handler import handle_operation
+from utils.email_outbox import build_progress_email
 
 def send_progress_email(context: UserSessionContext, recipient_email: str, smtp_server: str, smtp_port: int, sender_email: str, sender_password: str):
     """
@@ -21,36 +21,8 @@ def send_progress_email(context: UserSessionContext, recipient_email: str, smtp_
         dict: Success or error message.
     """
     def _send_email():
-        # Prepare email content
-        subject = f"Health & Wellness Progress Update for {context.name}"
-        body = f"Health & Wellness Progress Update\n"
-        body += f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-        body += "Goals:\n"
-        if context.goal:
-            body += (f"Action: {context.goal.get('action', 'N/A')}, "
-                     f"Amount: {context.goal.get('amount', 'N/A')} {context.goal.get('unit', 'N/A')}, "
-                     f"Duration: {context.goal.get('duration', 'N/A')} {context.goal.get('duration_unit', 'N/A')}\n")
-        else:
-            body += "No goals set yet.\n"
-        body += "\nDietary Preferences:\n"
-        body += context.diet_preferences or "None specified\n"
-        body += "\nMeal Plan:\n"
-        if context.meal_plan:
-            for meal in context.meal_plan:
-                body += f"- {meal}\n"
-        else:
-            body += "No meal plan set yet.\n"
-        body += "\nWorkout Plan:\n"
-        if context.workout_plan:
-            for day in context.workout_plan.get('days', []):
-                body += f"- {day['day']}: {', '.join(day['exercises'])}\n"
-        else:
-            body += "No workout plan set yet.\n"
-        body += "\nHandoff Logs:\n"
-        body += "\n".join(context.handoff_logs) if context.handoff_logs else "No handoff logs available.\n"
-        body += "\nProgress Logs:\n"
-        for log in context.progress_logs:
-            body += f"- {log['timestamp']}: {log['event']}\n" if context.progress_logs else "No progress logs available.\n"
+        # Same body as the outbox sends; bulk sends should go through utils.email_outbox instead
+        subject, body = build_progress_email(context)
 
         # Create email message
         msg = MIMEText(body)
@@ -0,0 +1,461 @@
+"""Persistent email outbox delivered over pooled SMTP sessions.
+
+Callers enqueue rows into email_outbox and return at once. OutboxWorker
+claims due rows in batches and spreads each batch over at most `concurrency`
+authenticated SMTP sessions. Those sessions stay open across messages and
+batches, so a weekly send pays for a handful of TLS handshakes, not one per
+user. Transient failures are retried with exponential backoff; 5xx rejections
+fail immediately.
+
+    python -m utils.smtp_sink --port 1025
+    SMTP_HOST=127.0.0.1 SMTP_PORT=1025 SMTP_STARTTLS=0 python -m utils.email_outbox --drain
+"""
+import os
+import ssl
+import time
+import random
+import smtplib
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from context import UserSessionContext, as_list
+from utils.env import load_env
+from utils.storage import get_storage
+from utils.migrations import ensure_migrated
+
+logger = logging.getLogger(__name__)
+
+# (id, recipient, subject, body, attempts)
+Claimed = Tuple[int, str, str, str, int]
+
+
+@dataclass
+class SMTPSettings:
+    host: str = "localhost"
+    port: int = 587
+    username: Optional[str] = None
+    password: Optional[str] = None
+    sender: str = "noreply@smartcare.local"
+    starttls: bool = True
+    timeout: float = 30.0
+    # Providers cap messages per session (Gmail ~100), so sessions are recycled before that
+    max_messages_per_connection: int = 100
+
+    @classmethod
+    def from_env(cls) -> "SMTPSettings":
+        load_env()
+        username = os.getenv("SMTP_USERNAME")
+        return cls(
+            host=os.getenv("SMTP_HOST", "localhost"),
+            port=int(os.getenv("SMTP_PORT", "587")),
+            username=username,
+            password=os.getenv("SMTP_PASSWORD"),
+            sender=os.getenv("SMTP_SENDER") or username or cls.sender,
+            starttls=os.getenv("SMTP_STARTTLS", "1").lower() not in ("0", "false", "no"),
+            timeout=float(os.getenv("SMTP_TIMEOUT", "30")),
+        )
+
+
+def build_progress_email(context: UserSessionContext) -> Tuple[str, str]:
+    """Subject and plain-text body of a user's progress update."""
+    lines = [
+        "Health & Wellness Progress Update",
+        f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        "",
+        "Goal:",
+        str(context.goal) if context.goal else "No goals set yet.",
+        "",
+        "Dietary Preferences:",
+        ", ".join(as_list(context.diet_preferences)) or "None specified",
+        "",
+        "Meal Plan:",
+    ]
+    if context.meal_plan:
+        lines.extend(f"- {meal}: {dish}" for meal, dish in context.meal_plan.items())
+    else:
+        lines.append("No meal plan set yet.")
+    lines += ["", "Workout Plan:"]
+    if context.workout_plan:
+        lines.extend(f"- {day['day']}: {', '.join(day['exercises'])}" for day in context.workout_plan.get("days", []))
+    else:
+        lines.append("No workout plan set yet.")
+    lines += ["", "Handoff Logs:"]
+    if context.handoff_logs:
+        lines.extend(f"- {log}" for log in context.handoff_logs)
+    else:
+        lines.append("No handoff logs available.")
+    lines += ["", "Progress Logs:"]
+    if context.progress_logs:
+        lines.extend(f"- {log.get('timestamp')}: {log.get('event')}" for log in context.progress_logs)
+    else:
+        lines.append("No progress logs available.")
+    return f"Health & Wellness Progress Update for {context.name}", "\n".join(lines) + "\n"
+
+
+def is_permanent(exc: BaseException) -> bool:
+    """True when the server rejected this message outright (5xx); retrying it would not help."""
+    if isinstance(exc, smtplib.SMTPAuthenticationError):
+        return False  # a credentials problem affects every message; keep them queued
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    code = getattr(exc, "smtp_code", None)
+    return isinstance(code, int) and code >= 500
+
+
+def queue_email(conn, recipient: str, subject: str, body: str, uid: Optional[int] = None,
+                send_at: Optional[float] = None) -> int:
+    """Insert one outbox row on the caller's connection, inside whatever transaction it has open."""
+    now = time.time()
+    return conn.execute(
+        "INSERT INTO email_outbox (uid, recipient, subject, body, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        (uid, recipient, subject, body, send_at or now, now)
+    ).lastrowid
+
+
+class EmailOutbox:
+    """The email_outbox table: enqueue, claim due rows under a lease, record outcomes."""
+
+    def __init__(self, db_path: str = "health_wellness.db", max_attempts: int = 5, base_delay: float = 30.0,
+                 max_delay: float = 3600.0, lease: float = 300.0):
+        self.storage = get_storage(db_path)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease = lease
+        ensure_migrated(self.storage)
+
+    def enqueue(self, recipient: str, subject: str, body: str, uid: Optional[int] = None,
+                send_at: Optional[float] = None) -> int:
+        with self.storage.transaction() as conn:
+            return queue_email(conn, recipient, subject, body, uid, send_at)
+
+    def enqueue_many(self, messages: Iterable[Tuple[str, str, str, Optional[int]]], chunk_size: int = 1000) -> int:
+        """Queue (recipient, subject, body, uid) tuples, one transaction per chunk."""
+        queued = 0
+        iterator = iter(messages)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                return queued
+            now = time.time()
+            with self.storage.transaction() as conn:
+                conn.executemany(
+                    "INSERT INTO email_outbox (uid, recipient, subject, body, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(uid, recipient, subject, body, now, now) for recipient, subject, body, uid in chunk]
+                )
+            queued += len(chunk)
+
+    def claim(self, limit: int) -> List[Claimed]:
+        """Take up to `limit` due messages; rows left 'sending' past the lease are claimed again."""
+        now = time.time()
+        with self.storage.transaction(immediate=True) as conn:
+            rows = conn.execute("""
+                SELECT id, recipient, subject, body, attempts + 1 FROM email_outbox
+                WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?
+                ORDER BY next_attempt_at LIMIT ?
+            """, (now, limit)).fetchall()
+            conn.executemany(
+                "UPDATE email_outbox SET status = 'sending', attempts = attempts + 1, next_attempt_at = ? WHERE id = ?",
+                [(now + self.lease, row[0]) for row in rows]
+            )
+        return rows
+
+    def complete(self, sent: List[int], failed: List[Tuple[int, int, BaseException]]) -> Dict[str, int]:
+        """Record a batch's outcomes; failures are rescheduled with backoff until max_attempts."""
+        now = time.time()
+        retry, dead = [], []
+        for message_id, attempts, exc in failed:
+            error = f"{type(exc).__name__}: {exc}"[:500]
+            if is_permanent(exc) or attempts >= self.max_attempts:
+                dead.append((error, message_id))
+            else:
+                # Jittered, so a server hiccup does not bring the whole batch back at once
+                delay = random.uniform(self.base_delay, min(self.max_delay, self.base_delay * 2 ** attempts))
+                retry.append((now + delay, error, message_id))
+        with self.storage.transaction() as conn:
+            conn.executemany("UPDATE email_outbox SET status = 'sent', sent_at = ?, last_error = NULL WHERE id = ?",
+                             [(now, message_id) for message_id in sent])
+            conn.executemany("UPDATE email_outbox SET status = 'pending', next_attempt_at = ?, last_error = ? WHERE id = ?", retry)
+            conn.executemany("UPDATE email_outbox SET status = 'failed', last_error = ? WHERE id = ?", dead)
+        return {"sent": len(sent), "retried": len(retry), "failed": len(dead)}
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.storage.query_all("SELECT status, COUNT(*) FROM email_outbox GROUP BY status"))
+
+    def purge_sent(self, older_than_days: float = 30) -> int:
+        with self.storage.transaction() as conn:
+            return conn.execute("DELETE FROM email_outbox WHERE status = 'sent' AND sent_at < ?",
+                                (time.time() - older_than_days * 86400,)).rowcount
+
+
+class SMTPPool:
+    """Up to `size` authenticated SMTP sessions, reused across messages and batches."""
+
+    def __init__(self, settings: SMTPSettings, size: int = 4, idle_timeout: float = 60.0):
+        self.settings = settings
+        self.idle_timeout = idle_timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: List[Tuple[smtplib.SMTP, float]] = []
+        self._sent: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.counters = {"connects": 0, "reuses": 0, "discards": 0}
+
+    def _connect(self) -> smtplib.SMTP:
+        conn = smtplib.SMTP(self.settings.host, self.settings.port, timeout=self.settings.timeout)
+        try:
+            conn.ehlo()
+            if self.settings.starttls:
+                conn.starttls(context=ssl.create_default_context())
+                conn.ehlo()
+            if self.settings.username:
+                conn.login(self.settings.username, self.settings.password or "")
+        except Exception:
+            self._close(conn)
+            raise
+        with self._lock:
+            self.counters["connects"] += 1
+            self._sent[id(conn)] = 0
+        return conn
+
+    @staticmethod
+    def _close(conn: smtplib.SMTP):
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    def acquire(self) -> smtplib.SMTP:
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    conn, last_used = self._idle.pop() if self._idle else (None, 0.0)
+                if conn is None:
+                    return self._connect()
+                # A session idle for a while may have been dropped by the server; NOOP is one round trip
+                if time.monotonic() - last_used < self.idle_timeout or self._alive(conn):
+                    with self._lock:
+                        self.counters["reuses"] += 1
+                    return conn
+                self.discard(conn, release=False)
+        except Exception:
+            self._slots.release()
+            raise
+
+    @staticmethod
+    def _alive(conn: smtplib.SMTP) -> bool:
+        try:
+            return conn.noop()[0] == 250
+        except Exception:
+            return False
+
+    def sent_one(self, conn: smtplib.SMTP) -> bool:
+        """Count a delivered message; False once the session should be recycled."""
+        with self._lock:
+            self._sent[id(conn)] = self._sent.get(id(conn), 0) + 1
+            return self._sent[id(conn)] < self.settings.max_messages_per_connection
+
+    def release(self, conn: smtplib.SMTP):
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+        self._slots.release()
+
+    def discard(self, conn: smtplib.SMTP, release: bool = True):
+        with self._lock:
+            self._sent.pop(id(conn), None)
+            self.counters["discards"] += 1
+        self._close(conn)
+        if release:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._sent.clear()
+        for conn, _ in idle:
+            self._close(conn)
+
+
+class OutboxWorker:
+    """Claims due outbox rows in batches and sends them over the pool, in the background or on demand."""
+
+    def __init__(self, outbox: EmailOutbox, pool: SMTPPool, concurrency: int = 4, batch_size: int = 200,
+                 poll_interval: float = 5.0):
+        self.outbox = outbox
+        self.pool = pool
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._senders = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="smtp")
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.counters = {"batches": 0, "sent": 0, "retried": 0, "failed": 0}
+        self.last_batch: Dict[str, Any] = {}
+
+    def _message(self, recipient: str, subject: str, body: str) -> EmailMessage:
+        msg = EmailMessage()
+        msg["Subject"] = subject
+        msg["From"] = self.pool.settings.sender
+        msg["To"] = recipient
+        msg["Date"] = formatdate(localtime=True)
+        msg["Message-ID"] = make_msgid()
+        msg.set_content(body)
+        return msg
+
+    def _send_share(self, rows: List[Claimed]) -> Tuple[List[int], List[Tuple[int, int, BaseException]]]:
+        """Send one share of a batch sequentially over a single pooled session."""
+        sent, failed = [], []
+        conn = None
+        try:
+            for index, (message_id, recipient, subject, body, attempts) in enumerate(rows):
+                if conn is None:
+                    try:
+                        conn = self.pool.acquire()
+                    except Exception as e:
+                        # Could not open a session: the rest of this share waits for the retry
+                        failed.extend((row[0], row[4], e) for row in rows[index:])
+                        return sent, failed
+                try:
+                    conn.send_message(self._message(recipient, subject, body))
+                    sent.append(message_id)
+                    if not self.pool.sent_one(conn):
+                        self.pool.discard(conn)
+                        conn = None
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                    failed.append((message_id, attempts, e))  # the session itself is still fine
+                except Exception as e:
+                    failed.append((message_id, attempts, e))
+                    self.pool.discard(conn)
+                    conn = None
+        finally:
+            if conn is not None:
+                self.pool.release(conn)
+        return sent, failed
+
+    def run_once(self) -> Dict[str, Any]:
+        """Claim and deliver one batch; returns that batch's metrics."""
+        started = time.perf_counter()
+        rows = self.outbox.claim(self.batch_size)
+        if not rows:
+            return {"claimed": 0}
+        shares = [rows[i::self.concurrency] for i in range(min(self.concurrency, len(rows)))]
+        sent, failed = [], []
+        for share_sent, share_failed in self._senders.map(self._send_share, shares):
+            sent += share_sent
+            failed += share_failed
+        outcome = self.outbox.complete(sent, failed)
+        elapsed = time.perf_counter() - started
+        metrics = {"claimed": len(rows), **outcome, "seconds": elapsed,
+                   "per_second": len(sent) / elapsed if elapsed else 0.0, **self.pool.counters}
+        with self._lock:
+            self.counters["batches"] += 1
+            for key in ("sent", "retried", "failed"):
+                self.counters[key] += outcome[key]
+            self.last_batch = metrics
+        logger.info(f"📧 Batch of {len(rows)}: {outcome['sent']} sent, {outcome['retried']} retrying, "
+                    f"{outcome['failed']} failed in {elapsed:.2f}s ({metrics['per_second']:.0f}/s)")
+        return metrics
+
+    def drain(self, max_batches: Optional[int] = None) -> Dict[str, Any]:
+        """Deliver everything currently due, batch after batch."""
+        totals = {"batches": 0, "claimed": 0, "sent": 0, "retried": 0, "failed": 0, "seconds": 0.0}
+        while max_batches is None or totals["batches"] < max_batches:
+            metrics = self.run_once()
+            if not metrics["claimed"]:
+                break
+            totals["batches"] += 1
+            for key in ("claimed", "sent", "retried", "failed", "seconds"):
+                totals[key] += metrics[key]
+        totals["per_second"] = totals["sent"] / totals["seconds"] if totals["seconds"] else 0.0
+        return totals
+
+    def notify(self):
+        """Wake the background loop now instead of at the next poll."""
+        self._wake.set()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_once()["claimed"]:
+                    continue
+            except Exception as e:
+                logger.error(f"❌ Email outbox batch failed: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join()
+        self._senders.shutdown(wait=True)
+        self.pool.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {**self.counters, "last_batch": dict(self.last_batch)}
+        stats["queue"] = self.outbox.counts()
+        stats["pool"] = dict(self.pool.counters)
+        return stats
+
+
+_workers: Dict[str, OutboxWorker] = {}
+_workers_lock = threading.Lock()
+
+
+def get_outbox_worker(db_path: str = "health_wellness.db") -> OutboxWorker:
+    """Process-wide delivery worker, started on first use; SMTP_* variables configure it."""
+    key = os.path.abspath(db_path)
+    with _workers_lock:
+        worker = _workers.get(key)
+        if worker is None:
+            load_env()
+            concurrency = int(os.getenv("SMTP_CONCURRENCY", "4"))
+            worker = _workers[key] = OutboxWorker(EmailOutbox(db_path), SMTPPool(SMTPSettings.from_env(), size=concurrency),
+                                                  concurrency=concurrency)
+            worker.start()
+        return worker
+
+
+if __name__ == "__main__":
+    import json
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Deliver queued emails")
+    parser.add_argument("--db", default="health_wellness.db")
+    parser.add_argument("--drain", action="store_true", help="send everything due, then exit")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("SMTP_CONCURRENCY", "4")))
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    worker = OutboxWorker(EmailOutbox(args.db), SMTPPool(SMTPSettings.from_env(), size=args.concurrency),
+                          concurrency=args.concurrency, batch_size=args.batch_size)
+    if args.drain:
+        print(json.dumps({**worker.drain(), "queue": worker.outbox.counts()}, indent=2))
+        worker.stop()
+    else:
+        worker.start()
+        try:
+            while True:
+                time.sleep(60)
+                print(json.dumps(worker.stats()))
+        except KeyboardInterrupt:
+            worker.stop()
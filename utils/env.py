@@ -0,0 +1,23 @@
+import os
+import threading
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_env():
+    """Load .env once, on first use rather than at import time."""
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if not _loaded:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            _loaded = True
+
+
+def getenv(name: str, default=None):
+    load_env()
+    return os.getenv(name, default)
@@ -2,4 +2,10 @@ def handle_operation(func, context=None):
     try:
         return func()
     except Exception as e:
-        return {"error": f"Operation failed: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Operation failed: {str(e)}"}
+
+async def handle_operation_async(func, context=None):
+    try:
+        return await func()
+    except Exception as e:
+        return {"error": f"Operation failed: {str(e)}"}
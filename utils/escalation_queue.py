@@ -0,0 +1,253 @@
+"""Durable queue of escalations waiting for a human expert.
+
+EscalationAgent enqueues; experts claim the most urgent open items under a
+lease and ack them once handled. A user escalating again while their earlier
+item is still open within `dedup_window` bumps that item instead of adding a
+new one; the first message stays the item's message and later ones are kept
+as follow-ups. Enqueues from the agent go through the DB writer, so bursts share a
+commit.
+
+    python -m utils.escalation_queue list
+    python -m utils.escalation_queue claim --worker alice
+    python -m utils.escalation_queue ack <id> --worker alice --resolution "Called back"
+"""
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import logging
+import secrets
+import threading
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from utils.storage import get_storage
+from utils.db_worker import get_db_worker
+from utils.migrations import ensure_migrated
+
+logger = logging.getLogger(__name__)
+
+URGENT, HIGH, NORMAL = 0, 1, 2
+PRIORITY_NAMES = {URGENT: "urgent", HIGH: "high", NORMAL: "normal"}
+
+URGENT_KEYWORDS = ["chest pain", "can't breathe", "cannot breathe", "shortness of breath", "fainted", "passed out",
+                   "suicid", "self harm", "emergency", "severe", "bleeding"]
+HIGH_KEYWORDS = ["pain", "injur", "hurt", "swelling", "dizzy", "medication"]
+HIGH_CONDITIONS = ["diabetes", "heart", "hypertension", "blood pressure", "pregnan", "asthma", "joint issues"]
+
+_URGENT_RE = re.compile("|".join(map(re.escape, URGENT_KEYWORDS)))
+_HIGH_RE = re.compile("|".join(map(re.escape, HIGH_KEYWORDS)))
+
+OPEN = "status IN ('pending', 'claimed')"
+MAX_FOLLOW_UPS = 20
+
+# (uid, message, health conditions)
+Request = Tuple[Optional[int], str, Union[str, Sequence[str], None]]
+
+
+def new_escalation_id() -> str:
+    """UUIDv7-style id: millisecond timestamp then 74 random bits, so ids never collide and sort by creation time."""
+    millis = time.time_ns() // 1_000_000
+    rand = secrets.randbits(74)
+    value = (millis << 80) | (0x7 << 76) | ((rand >> 62) << 64) | (0b10 << 62) | (rand & ((1 << 62) - 1))
+    return str(uuid.UUID(int=value))
+
+
+def escalation_priority(message: str, health_conditions: Union[str, Sequence[str], None] = ()) -> Tuple[int, List[str]]:
+    """Priority (lower is more urgent) and the reasons behind it."""
+    text = (message or "").lower()
+    if isinstance(health_conditions, str):
+        health_conditions = health_conditions.split(",")
+    reasons = [f"keyword: {word}" for word in dict.fromkeys(_URGENT_RE.findall(text))]
+    if reasons:
+        return URGENT, reasons
+    reasons = [f"keyword: {word}" for word in dict.fromkeys(_HIGH_RE.findall(text))]
+    for condition in health_conditions or []:
+        condition = condition.strip()
+        if any(marker in condition.lower() for marker in HIGH_CONDITIONS):
+            reasons.append(f"condition: {condition}")
+    return (HIGH if reasons else NORMAL), reasons
+
+
+def dedup_key(uid: Optional[int], message: str) -> str:
+    # Anonymous requests can only be matched on what they say
+    if uid is not None:
+        return f"uid:{uid}"
+    return "text:" + hashlib.sha1(" ".join((message or "").lower().split()).encode("utf-8")).hexdigest()
+
+
+def enqueue_rows(conn, requests: Sequence[Request], window: float) -> List[Dict[str, Any]]:
+    """Insert or merge escalations inside the caller's write transaction; one ticket per request, in order."""
+    now = time.time()
+    tickets, merged, fresh = [], {}, {}
+    for uid, message, conditions in requests:
+        priority, reasons = escalation_priority(message, conditions)
+        key = dedup_key(uid, message)
+        item = fresh.get(key) or merged.get(key)
+        if item is None:
+            row = conn.execute(
+                f"SELECT id, priority, follow_ups FROM escalations WHERE dedup_key = ? AND {OPEN} AND last_seen_at >= ? "
+                "ORDER BY last_seen_at DESC LIMIT 1", (key, now - window)
+            ).fetchone()
+            if row:
+                item = merged[key] = {"id": row[0], "priority": row[1], "reasons": None, "follow_ups": json.loads(row[2]),
+                                      "repeats": 0}
+        if item is None:
+            item = fresh[key] = {"id": new_escalation_id(), "uid": uid, "priority": priority, "reasons": reasons,
+                                 "message": message, "follow_ups": [], "repeats": 0}
+            tickets.append({"escalation_id": item["id"], "priority": PRIORITY_NAMES[priority], "deduplicated": False})
+            continue
+        # A repeat keeps the item's place in line and its original message, and can only raise its urgency
+        item["repeats"] += 1
+        item["follow_ups"] = (item["follow_ups"] + [{"message": message, "at": now}])[-MAX_FOLLOW_UPS:]
+        if priority < item["priority"]:
+            item["priority"], item["reasons"] = priority, reasons
+        tickets.append({"escalation_id": item["id"], "priority": PRIORITY_NAMES[item["priority"]], "deduplicated": True})
+    conn.executemany(
+        "INSERT INTO escalations (id, uid, dedup_key, priority, reasons, message, follow_ups, repeats, created_at, "
+        "last_seen_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(item["id"], item["uid"], key, item["priority"], json.dumps(item["reasons"]), item["message"],
+          json.dumps(item["follow_ups"]), item["repeats"], now, now) for key, item in fresh.items()]
+    )
+    conn.executemany(
+        "UPDATE escalations SET repeats = repeats + ?, follow_ups = ?, last_seen_at = ?, priority = MIN(priority, ?), "
+        "reasons = COALESCE(?, reasons) WHERE id = ?",
+        [(item["repeats"], json.dumps(item["follow_ups"]), now, item["priority"],
+          None if item["reasons"] is None else json.dumps(item["reasons"]), item["id"]) for item in merged.values()]
+    )
+    # Tickets for later repeats were written before the item settled; report its final priority
+    final = {item["id"]: PRIORITY_NAMES[item["priority"]] for item in [*fresh.values(), *merged.values()]}
+    for ticket in tickets:
+        ticket["priority"] = final[ticket["escalation_id"]]
+    return tickets
+
+
+def _as_dict(row) -> Dict[str, Any]:
+    escalation_id, uid, priority, reasons, message, follow_ups, repeats, created_at = row
+    return {"escalation_id": escalation_id, "uid": uid, "priority": PRIORITY_NAMES.get(priority, priority),
+            "reasons": json.loads(reasons), "message": message, "follow_ups": json.loads(follow_ups),
+            "repeats": repeats, "created_at": created_at}
+
+
+class EscalationQueue:
+    """The escalations table: enqueue with dedup, claim by priority under a lease, ack or release."""
+
+    COLUMNS = "id, uid, priority, reasons, message, follow_ups, repeats, created_at"
+
+    def __init__(self, db_path: str = "health_wellness.db", dedup_window: float = 900.0, lease: float = 900.0):
+        self.storage = get_storage(db_path)
+        self.worker = get_db_worker(db_path)
+        self.dedup_window = dedup_window
+        self.lease = lease
+        ensure_migrated(self.storage)
+
+    def enqueue(self, uid: Optional[int], message: str,
+                health_conditions: Union[str, Sequence[str], None] = ()) -> Dict[str, Any]:
+        return self.enqueue_many([(uid, message, health_conditions)])[0]
+
+    def enqueue_many(self, requests: Iterable[Request], chunk_size: int = 1000) -> List[Dict[str, Any]]:
+        """Queue (uid, message, health_conditions) tuples, one transaction per chunk."""
+        tickets = []
+        iterator = iter(requests)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                return tickets
+            with self.storage.transaction(immediate=True) as conn:
+                tickets.extend(enqueue_rows(conn, chunk, self.dedup_window))
+
+    async def enqueue_async(self, uid: Optional[int], message: str,
+                            health_conditions: Union[str, Sequence[str], None] = ()) -> Dict[str, Any]:
+        """Same as enqueue, queued on the DB writer so concurrent sessions share a commit."""
+        tickets = await self.worker.write(lambda conn: enqueue_rows(conn, [(uid, message, health_conditions)],
+                                                                    self.dedup_window))
+        return tickets[0]
+
+    def claim(self, worker: str, limit: int = 1) -> List[Dict[str, Any]]:
+        """Take up to `limit` open escalations, most urgent and oldest first; expired leases are claimed again."""
+        now = time.time()
+        with self.storage.transaction(immediate=True) as conn:
+            rows = conn.execute(f"""
+                SELECT {self.COLUMNS} FROM escalations
+                WHERE {OPEN} AND (status = 'pending' OR lease_until < ?)
+                ORDER BY priority, created_at LIMIT ?
+            """, (now, limit)).fetchall()
+            conn.executemany("UPDATE escalations SET status = 'claimed', claimed_by = ?, lease_until = ? WHERE id = ?",
+                             [(worker, now + self.lease, row[0]) for row in rows])
+        return [_as_dict(row) for row in rows]
+
+    def ack(self, escalation_id: str, worker: str, resolution: str = "") -> bool:
+        """Mark a claimed escalation handled; False if this worker no longer holds it."""
+        with self.storage.transaction() as conn:
+            return conn.execute(
+                "UPDATE escalations SET status = 'resolved', resolution = ?, resolved_at = ?, lease_until = NULL "
+                "WHERE id = ? AND status = 'claimed' AND claimed_by = ?",
+                (resolution, time.time(), escalation_id, worker)
+            ).rowcount == 1
+
+    def release(self, escalation_id: str, worker: str) -> bool:
+        """Hand a claimed escalation back to the queue without resolving it."""
+        with self.storage.transaction() as conn:
+            return conn.execute(
+                "UPDATE escalations SET status = 'pending', claimed_by = NULL, lease_until = NULL "
+                "WHERE id = ? AND status = 'claimed' AND claimed_by = ?", (escalation_id, worker)
+            ).rowcount == 1
+
+    def get(self, escalation_id: str) -> Optional[Dict[str, Any]]:
+        row = self.storage.query_one(f"SELECT {self.COLUMNS}, status, claimed_by, resolution FROM escalations WHERE id = ?",
+                                     (escalation_id,))
+        if row is None:
+            return None
+        return {**_as_dict(row[:8]), "status": row[8], "claimed_by": row[9], "resolution": row[10]}
+
+    def open_items(self, limit: int = 50) -> List[Dict[str, Any]]:
+        rows = self.storage.query_all(
+            f"SELECT {self.COLUMNS} FROM escalations WHERE {OPEN} ORDER BY priority, created_at LIMIT ?", (limit,)
+        )
+        return [_as_dict(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.storage.query_all("SELECT status, COUNT(*) FROM escalations GROUP BY status"))
+
+
+_queues: Dict[str, EscalationQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_escalation_queue(db_path: str = "health_wellness.db") -> EscalationQueue:
+    key = os.path.abspath(db_path)
+    with _queues_lock:
+        escalation_queue = _queues.get(key)
+        if escalation_queue is None:
+            escalation_queue = _queues[key] = EscalationQueue(db_path)
+        return escalation_queue
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Work the escalation queue")
+    parser.add_argument("--db", default="health_wellness.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="show open escalations and queue counts")
+    claim = commands.add_parser("claim", help="take the most urgent open escalations")
+    claim.add_argument("--worker", required=True)
+    claim.add_argument("--limit", type=int, default=1)
+    for name in ("ack", "release"):
+        command = commands.add_parser(name)
+        command.add_argument("escalation_id")
+        command.add_argument("--worker", required=True)
+        if name == "ack":
+            command.add_argument("--resolution", default="")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    escalations = EscalationQueue(args.db)
+    if args.command == "list":
+        print(json.dumps({"counts": escalations.counts(), "open": escalations.open_items()}, indent=2))
+    elif args.command == "claim":
+        print(json.dumps(escalations.claim(args.worker, args.limit), indent=2))
+    elif args.command == "ack":
+        print("acknowledged" if escalations.ack(args.escalation_id, args.worker, args.resolution) else "not held by this worker")
+    else:
+        print("released" if escalations.release(args.escalation_id, args.worker) else "not held by this worker")
@@ -1,2 +1,11 @@
-def generate_progress_chart(context):
-    return {"message": "Chart generated (placeholder)"}
\ No newline at end of file
+from context import UserSessionContext
+from utils.progress_chart import generate_progress_chart as render_progress_chart
+
+def generate_progress_chart(context: UserSessionContext, output_path: str = "progress_chart.png") -> dict:
+    """Render the progress chart and save it as a PNG file."""
+    result = render_progress_chart(context)
+    if "image" not in result:
+        return result
+    with open(output_path, "wb") as f:
+        f.write(result["image"])
+    return {"message": f"Chart exported to {output_path}", "path": output_path}
@@ -1,31 +1,216 @@
-
+import io
+import csv
+import json
+import gzip
+import time
+from functools import lru_cache
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Tuple, Union
 from context import UserSessionContext
-from datetime import datetime
+from utils.error_handler import handle_operation
+
+FORMATS = ("jsonl", "csv", "parquet", "txt")
+COMPRESSIONS = ("gzip", "zstd")
+COLUMNS = ("uid", "kind", "recorded_at", "timestamp", "event")
+SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+
+# (uid, kind, created_at, payload as JSON text)
+Row = Tuple[int, str, float, str]
+
+
+def _epoch(value: Union[None, str, date, datetime], end: bool = False) -> Optional[float]:
+    """Date-range bound as epoch seconds; a bare date as the upper bound includes that whole day."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value) if len(value) > 10 else date.fromisoformat(value)
+    if not isinstance(value, datetime):
+        value = datetime.combine(value + timedelta(days=1) if end else value, datetime.min.time())
+    return value.timestamp()
+
+
+def _infer(path: Union[str, BinaryIO], fmt: Optional[str], compression: Optional[str]) -> Tuple[str, Optional[str]]:
+    name = path if isinstance(path, str) else getattr(path, "name", "")
+    name = name if isinstance(name, str) else ""
+    for suffix, codec in SUFFIXES.items():
+        if name.endswith(suffix):
+            compression = compression or codec
+            name = name[:-len(suffix)]
+    fmt = fmt or next((f for f in FORMATS if name.endswith("." + f)), "txt")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}'; use one of {', '.join(FORMATS)}")
+    if compression and compression not in COMPRESSIONS:
+        raise ValueError(f"Unsupported compression '{compression}'; use one of {', '.join(COMPRESSIONS)}")
+    return fmt, compression
+
+
+@contextmanager
+def _sink(target: Union[str, BinaryIO], compression: Optional[str]) -> Iterator[BinaryIO]:
+    zstandard = None
+    if compression == "zstd":
+        # Checked before the target is opened so a missing package leaves no empty file behind
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd compression needs the 'zstandard' package (pip install zstandard)")
+    raw = open(target, "wb") if isinstance(target, str) else target
+    try:
+        if compression == "gzip":
+            # Level 6: most of level 9's ratio at a fraction of the CPU, for downloads served inline
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as out:
+                yield out
+        elif compression == "zstd":
+            with zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False) as out:
+                yield out
+        else:
+            yield raw
+    finally:
+        if isinstance(target, str):
+            raw.close()
+
+
+def _pages(context: UserSessionContext, kinds: Sequence[str], since: Optional[float], until: Optional[float],
+           db_path: Optional[str], page_size: int) -> Iterator[List[Row]]:
+    """Stored events page by page, then entries the context has not saved yet, one kind after another."""
+    db = None
+    if db_path:
+        from utils.database import DatabaseManager
+
+        db = DatabaseManager(db_path)
+    now = time.time()
+    for kind in kinds:
+        logs = getattr(context, f"{kind}_logs")
+        offset = min(getattr(context, f"{kind}_log_offset"), len(logs))
+        if db is not None:
+            for page in db.scan_events(context.uid, kind, since, until, page_size):
+                yield [(context.uid, kind, created_at, payload) for _, payload, created_at in page]
+        else:
+            offset = 0
+        if (since is None or now >= since) and (until is None or now < until) and logs[offset:]:
+            yield [(context.uid, kind, now, json.dumps(entry)) for entry in logs[offset:]]
+
+
+@lru_cache(maxsize=4096)
+def _recorded_at(created_at: float) -> str:
+    # Events saved together share created_at, so most rows hit the cache
+    return datetime.fromtimestamp(created_at).strftime('%Y-%m-%d %H:%M:%S')
+
 
-def export_logs(context: UserSessionContext, output_path: str = "user_logs.txt"):
+def _flat(row: Row) -> Tuple:
+    uid, kind, created_at, payload = row
+    entry = json.loads(payload)
+    if isinstance(entry, dict):
+        return uid, kind, _recorded_at(created_at), entry.get("timestamp"), entry.get("event")
+    return uid, kind, _recorded_at(created_at), None, str(entry)
+
+
+def _write_jsonl(out: BinaryIO, pages: Iterator[List[Row]]) -> int:
+    written = 0
+    for page in pages:
+        # Payloads are already JSON, so each line is assembled without a decode/encode round trip
+        out.write("".join(
+            f'{{"uid": {uid}, "kind": "{kind}", "recorded_at": "{_recorded_at(created_at)}", "payload": {payload}}}\n'
+            for uid, kind, created_at, payload in page
+        ).encode("utf-8"))
+        written += len(page)
+    return written
+
+
+def _write_csv(out: BinaryIO, pages: Iterator[List[Row]]) -> int:
+    # Each page is formatted in memory and handed to the (compressing) stream in one write
+    buffer = io.StringIO(newline="")
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    written = 0
+    for page in pages:
+        writer.writerows(_flat(row) for row in page)
+        out.write(buffer.getvalue().encode("utf-8"))
+        buffer.seek(0)
+        buffer.truncate()
+        written += len(page)
+    if not written:
+        out.write(buffer.getvalue().encode("utf-8"))
+    return written
+
+
+def _write_txt(out: BinaryIO, pages: Iterator[List[Row]], context: UserSessionContext) -> int:
+    out.write(f"Health & Wellness Logs for {context.name} (UID: {context.uid})\n".encode("utf-8"))
+    out.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n".encode("utf-8"))
+    written, section = 0, None
+    for page in pages:
+        lines = []
+        for row in page:
+            uid, kind, recorded_at, timestamp, event = _flat(row)
+            if kind != section:
+                section = kind
+                lines.append(f"\n{kind.capitalize()} Logs:\n")
+            lines.append(f"- {timestamp}: {event}\n" if timestamp else f"- {event}\n")
+        out.write("".join(lines).encode("utf-8"))
+        written += len(page)
+    if not written:
+        out.write(b"\nNo logs available.\n")
+    return written
+
+
+def _write_parquet(out: BinaryIO, pages: Iterator[List[Row]], compression: Optional[str]) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([("uid", pa.int64()), ("kind", pa.string()), ("recorded_at", pa.string()),
+                        ("timestamp", pa.string()), ("event", pa.string())])
+    written, batch = 0, []
+
+    def flush():
+        columns = list(zip(*batch))
+        writer.write_table(pa.Table.from_arrays([pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                                                schema=schema))
+
+    # Compression is a per-column codec inside the file; pages are grouped into row groups of ~64k rows
+    with pq.ParquetWriter(out, schema, compression=compression or "snappy") as writer:
+        for page in pages:
+            batch.extend(_flat(row) for row in page)
+            written += len(page)
+            if len(batch) >= 65536:
+                flush()
+                batch = []
+        if batch:
+            flush()
+    return written
+
+
+def export_logs(context: UserSessionContext, output_path: Union[str, BinaryIO] = "user_logs.txt",
+                fmt: Optional[str] = None, compression: Optional[str] = None,
+                since: Union[None, str, date, datetime] = None, until: Union[None, str, date, datetime] = None,
+                kinds: Sequence[str] = ("progress", "handoff"), db_path: Optional[str] = "health_wellness.db",
+                page_size: int = 1000) -> dict:
     """
-    Export handoff and progress logs to a text file.
-    
+    Export a user's handoff and progress logs, streaming stored history page by page.
+
     Args:
-        context (UserSessionContext): The user's session context containing logs.
-        output_path (str): Path to save the log file.
+        context (UserSessionContext): The user whose logs are exported; unsaved entries are included.
+        output_path (str | binary file): Destination; format and compression default from its suffix
+            (e.g. logs.csv.gz, logs.jsonl.zst, logs.parquet).
+        fmt (str): jsonl, csv, parquet or txt.
+        compression (str): gzip or zstd; for parquet it is the codec used inside the file.
+        since, until: Date range on when each event was recorded; a bare until date is inclusive.
     """
-    with open(output_path, 'w') as f:
-        f.write(f"Health & Wellness Logs for {context.name} (UID: {context.uid})\n")
-        f.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-        
-        f.write("Handoff Logs:\n")
-        if context.handoff_logs:
-            for log in context.handoff_logs:
-                f.write(f"- {log}\n")
+    def _export():
+        resolved, codec = _infer(output_path, fmt, compression)
+        pages = _pages(context, kinds, _epoch(since), _epoch(until, end=True), db_path, page_size)
+        if resolved == "parquet":
+            import pyarrow  # noqa: F401  fail before creating the output file
+            with _sink(output_path, None) as out:
+                rows = _write_parquet(out, pages, codec)
         else:
-            f.write("No handoff logs available.\n")
-        
-        f.write("\nProgress Logs:\n")
-        if context.progress_logs:
-            for log in context.progress_logs:
-                f.write(f"- {log['timestamp']}: {log['event']}\n")
-        else:
-            f.write("No progress logs available.\n")
-    
-    return {"message": f"Logs exported to {output_path}"}
+            with _sink(output_path, codec) as out:
+                if resolved == "jsonl":
+                    rows = _write_jsonl(out, pages)
+                elif resolved == "csv":
+                    rows = _write_csv(out, pages)
+                else:
+                    rows = _write_txt(out, pages, context)
+        where = output_path if isinstance(output_path, str) else "stream"
+        return {"message": f"Exported {rows} log entries to {where}", "rows": rows, "format": resolved, "compression": codec}
+
+    return handle_operation(_export, context=context)
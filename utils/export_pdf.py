@@ -1,54 +1,130 @@
-import io
+import os
+import json
+import glob
+import hashlib
+import logging
+import tempfile
+import threading
 from datetime import datetime
-from context import UserSessionContext
-
-def generate_progress_report(context: UserSessionContext) -> dict:
-    try:
-        # Safely get context values or provide defaults
-        name = context.name or "N/A"
-        email = context.email or "N/A"
-        goal = context.goal or "No goal set"
-        diet = ", ".join(context.diet_preferences) if context.diet_preferences else "Not specified"
-        health_conditions = ", ".join(context.health_conditions) if context.health_conditions else "None"
-
-        report_lines = []
-        report_lines.append("📋 Health & Wellness Progress Report")
-        report_lines.append("====================================\n")
-        report_lines.append(f"🧑 Name: {name}")
-        report_lines.append(f"📧 Email: {email}")
-        report_lines.append(f"🎯 Goal: {goal}")
-        report_lines.append(f"🥗 Dietary Preferences: {diet}")
-        report_lines.append(f"🩺 Health Conditions: {health_conditions}")
-        report_lines.append(f"📅 Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-
-        report_lines.append("📝 Progress Logs:")
-        if context.progress_logs:
-            for log in context.progress_logs:
-                timestamp = log.get("timestamp", "Unknown time")
-                event = log.get("event", "No event")
-                report_lines.append(f"• {timestamp} - {event}")
-        else:
-            report_lines.append("• No progress logs available.")
-
-        report_lines.append("\n🗣️ Handoff Consultations:")
-        if context.handoff_logs:
-            for log in context.handoff_logs:
-                report_lines.append(f"• {log}")
-        else:
-            report_lines.append("• No consultations recorded.")
-
-        # Combine all into a single string
-        full_report = "\n".join(report_lines)
-
-        # Create an in-memory file (for download)
-        file_buffer = io.StringIO()
-        file_buffer.write(full_report)
-        file_buffer.seek(0)
+from typing import Any, Iterator, List, Optional, Tuple
+from context import UserSessionContext, as_list
+from utils.error_handler import handle_operation
+from utils.pdf_writer import StreamingPDF
 
+logger = logging.getLogger(__name__)
+
+REPORT_DIR = os.path.join(tempfile.gettempdir(), "health_wellness_reports")
+KINDS = ("progress", "handoff")
+
+
+def _history(context: UserSessionContext, db, kind: str) -> Iterator[Any]:
+    """Every log entry of one kind, newest first: unsaved entries, then stored events page by page."""
+    logs = getattr(context, f"{kind}_logs")
+    offset = min(getattr(context, f"{kind}_log_offset"), len(logs))
+    yield from reversed(logs[offset:])
+    if db is None:
+        yield from reversed(logs[:offset])
+        return
+    for event in db.iter_events(context.uid, kind):
+        yield event["payload"]
+
+
+def _watermark(context: UserSessionContext, db) -> Tuple[List[Tuple[str, int]], str]:
+    """Newest stored event id per kind, and the report's 'Logs as of' line, taken from the data rather than the clock."""
+    unsaved = sum(len(getattr(context, f"{kind}_logs")[getattr(context, f"{kind}_log_offset"):]) for kind in KINDS)
+    if db is None:
+        return [(kind, len(getattr(context, f"{kind}_logs"))) for kind in KINDS], "Logs as of: this session (not saved)"
+    latest = db.storage.query_all(
+        "SELECT kind, id, created_at FROM user_events WHERE id IN "
+        "(SELECT MAX(id) FROM user_events WHERE uid = ? GROUP BY kind)", (context.uid,)
+    )
+    label = "Logs as of: " + (datetime.fromtimestamp(max(row[2] for row in latest)).strftime('%Y-%m-%d %H:%M:%S')
+                              if latest else "nothing saved yet")
+    if unsaved:
+        label += f" (plus {unsaved} unsaved entries)"
+    return sorted((kind, event_id) for kind, event_id, _ in latest), label
+
+
+def _report_key(context: UserSessionContext, latest: List[Tuple[str, int]]) -> str:
+    # Profile fields, the newest stored event ids and any unsaved entries identify the report's content
+    fields = context.model_dump(exclude={"timestamp", "progress_logs", "handoff_logs",
+                                         "progress_log_offset", "handoff_log_offset"})
+    pending = {kind: getattr(context, f"{kind}_logs")[getattr(context, f"{kind}_log_offset"):] for kind in KINDS}
+    payload = json.dumps({"fields": fields, "pending": pending, "latest": latest}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def write_progress_report(context: UserSessionContext, out, db=None, as_of: Optional[str] = None) -> int:
+    """Stream the report for one user into a binary file object; returns the number of log entries written."""
+    if as_of is None:
+        _, as_of = _watermark(context, db)
+    pdf = StreamingPDF(out)
+    pdf.line("Health & Wellness Progress Report", style="bold", size=16)
+    pdf.line()
+    pdf.line(f"Name: {context.name or 'N/A'}")
+    pdf.line(f"Email: {context.email or 'N/A'}")
+    pdf.line(f"Goal: {context.goal or 'No goal set'}")
+    pdf.line(f"Dietary Preferences: {', '.join(as_list(context.diet_preferences)) or 'Not specified'}")
+    pdf.line(f"Health Conditions: {', '.join(as_list(context.health_conditions)) or 'None'}")
+    # Cached reports are served for as long as the data is unchanged, so this names the data's age, not the render time
+    pdf.line(as_of)
+
+    written = 0
+    pdf.line()
+    pdf.line("Progress Logs (most recent first)", style="bold", size=12)
+    empty = True
+    for log in _history(context, db, "progress"):
+        pdf.line(f"- {log.get('timestamp', 'Unknown time')} - {log.get('event', 'No event')}")
+        written, empty = written + 1, False
+    if empty:
+        pdf.line("- No progress logs available.")
+
+    pdf.line()
+    pdf.line("Handoff Consultations (most recent first)", style="bold", size=12)
+    empty = True
+    for log in _history(context, db, "handoff"):
+        pdf.line(f"- {log}")
+        written, empty = written + 1, False
+    if empty:
+        pdf.line("- No consultations recorded.")
+
+    pdf.close()
+    return written
+
+
+def generate_progress_report(context: UserSessionContext, db_path: Optional[str] = "health_wellness.db",
+                             report_dir: str = REPORT_DIR) -> dict:
+    """Build (or reuse) the user's PDF report; returns its bytes as pdf_content and its path."""
+    def _generate():
+        from utils.database import DatabaseManager
+
+        db = DatabaseManager(db_path) if db_path else None
+        latest, as_of = _watermark(context, db)
+        key = _report_key(context, latest)
+        os.makedirs(report_dir, exist_ok=True)
+        path = os.path.join(report_dir, f"{context.uid}-{key}.pdf")
+        cached = os.path.exists(path)
+        if not cached:
+            # Written to a temp name first so a concurrent request never reads half a file
+            partial = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(partial, "wb") as out:
+                entries = write_progress_report(context, out, db, as_of)
+            os.replace(partial, path)
+            for stale in glob.glob(os.path.join(report_dir, f"{context.uid}-*.pdf")):
+                if stale != path:
+                    try:
+                        os.remove(stale)
+                    except FileNotFoundError:
+                        pass
+            logger.info(f"📄 Report for user {context.uid}: {entries} log entries, {os.path.getsize(path)} bytes")
+
+        with open(path, "rb") as f:
+            pdf_content = f.read()
         return {
             "message": "✅ Report generated successfully.",
-            "file": file_buffer.getvalue()
+            "pdf_content": pdf_content,
+            "path": path,
+            "cache_hit": cached,
         }
 
-    except Exception as e:
-        return {"error": f"❌ Failed to generate report: {str(e)}"}
+    return handle_operation(_generate, context=context)
@@ -1,2 +1,199 @@
-def collect_feedback(context, feedback_text):
-    return {"message": "Feedback recorded"}
\ No newline at end of file
+import os
+import json
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from context import UserSessionContext
+from utils.error_handler import handle_operation
+from utils.storage import get_storage
+from utils.migrations import ensure_migrated
+from utils.workout_history import insert_activities
+
+logger = logging.getLogger(__name__)
+
+FEEDBACK_ACTIVITY = "Feedback Submission"
+MAX_FEEDBACK_CHARS = 4000
+
+# (uid, feedback text, rating or None, local timestamp)
+Feedback = Tuple[int, str, Optional[int], str]
+
+
+class FeedbackIngestor:
+    """Buffers feedback in memory and writes it in batches: one transaction per max_batch entries or flush_interval."""
+
+    def __init__(self, db_path: str = "health_wellness.db", max_batch: int = 500, flush_interval: float = 1.0,
+                 max_pending: int = 50_000, put_timeout: float = 5.0):
+        self.storage = get_storage(db_path)
+        ensure_migrated(self.storage)
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        # Bounded, so a stalled database pushes back on submitters instead of growing without limit
+        self._queue: "queue.Queue[Feedback]" = queue.Queue(maxsize=max_pending)
+        self._carry: List[Feedback] = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.counters = {"submitted": 0, "flushed": 0, "batches": 0, "failed_flushes": 0}
+        self._pending_by_user: Dict[int, int] = {}
+
+    def submit(self, uid: int, text: str, rating: Optional[int] = None) -> None:
+        text = (text or "").strip()
+        if not text:
+            raise ValueError("Feedback text cannot be empty")
+        if rating is not None and not 1 <= int(rating) <= 5:
+            raise ValueError("Rating must be between 1 and 5")
+        entry = (uid, text[:MAX_FEEDBACK_CHARS], None if rating is None else int(rating),
+                 datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        # Counted before the put so the flusher never sees an entry it has no pending count for
+        with self._lock:
+            self._pending_by_user[uid] = self._pending_by_user.get(uid, 0) + 1
+        try:
+            self._queue.put(entry, timeout=self.put_timeout)
+        except queue.Full:
+            with self._lock:
+                self._release(uid)
+            raise RuntimeError("Feedback queue is full; try again shortly")
+        with self._lock:
+            self.counters["submitted"] += 1
+        if self._queue.qsize() >= self.max_batch:
+            self._wake.set()
+
+    def _release(self, uid: int):
+        left = self._pending_by_user[uid] - 1
+        if left:
+            self._pending_by_user[uid] = left
+        else:
+            del self._pending_by_user[uid]
+
+    def _take(self) -> List[Feedback]:
+        batch, self._carry = self._carry, []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _write(conn, batch: List[Feedback]):
+        insert_activities(conn, [
+            (uid, FEEDBACK_ACTIVITY, json.dumps({"feedback": text, "rating": rating}), at)
+            for uid, text, rating, at in batch
+        ])
+        # Collapse the batch per user so each counter row is touched once
+        totals: Dict[int, List[Any]] = {}
+        for uid, _, rating, at in batch:
+            row = totals.setdefault(uid, [uid, 0, 0, 0, at, at])
+            row[1] += 1
+            if rating is not None:
+                row[2] += rating
+                row[3] += 1
+            row[4], row[5] = min(row[4], at), max(row[5], at)
+        conn.executemany("""
+            INSERT INTO feedback_counters (uid, submissions, rating_total, rated, first_at, last_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (uid) DO UPDATE SET
+                submissions = submissions + excluded.submissions,
+                rating_total = rating_total + excluded.rating_total,
+                rated = rated + excluded.rated,
+                first_at = min(first_at, excluded.first_at),
+                last_at = max(last_at, excluded.last_at)
+        """, list(totals.values()))
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns how many entries were stored."""
+        stored = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take()
+                if not batch:
+                    return stored
+                try:
+                    with self.storage.transaction(immediate=True) as conn:
+                        self._write(conn, batch)
+                except Exception:
+                    # Kept for the next attempt rather than dropped
+                    self._carry = batch
+                    with self._lock:
+                        self.counters["failed_flushes"] += 1
+                    raise
+                stored += len(batch)
+                with self._lock:
+                    self.counters["flushed"] += len(batch)
+                    self.counters["batches"] += 1
+                    for uid, *_ in batch:
+                        self._release(uid)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="feedback-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Feedback flush failed, will retry: {e}")
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join()
+        self.flush()
+
+    def user_counts(self, uid: int) -> Dict[str, Any]:
+        """Stored totals for one user plus whatever is still waiting to be flushed."""
+        row = self.storage.query_one(
+            "SELECT submissions, rating_total, rated, first_at, last_at FROM feedback_counters WHERE uid = ?", (uid,)
+        )
+        submissions, rating_total, rated, first_at, last_at = row or (0, 0, 0, None, None)
+        with self._lock:
+            pending = self._pending_by_user.get(uid, 0)
+        return {"submissions": submissions + pending, "stored": submissions, "pending": pending,
+                "average_rating": round(rating_total / rated, 2) if rated else None,
+                "first_at": first_at, "last_at": last_at}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counters, "pending": self._queue.qsize() + len(self._carry)}
+
+
+_ingestors: Dict[str, FeedbackIngestor] = {}
+_ingestors_lock = threading.Lock()
+
+
+def get_feedback_ingestor(db_path: str = "health_wellness.db") -> FeedbackIngestor:
+    """Process-wide ingestor for a database, flushing in the background and once more at exit."""
+    key = os.path.abspath(db_path)
+    with _ingestors_lock:
+        ingestor = _ingestors.get(key)
+        if ingestor is None:
+            ingestor = _ingestors[key] = FeedbackIngestor(db_path)
+            ingestor.start()
+            atexit.register(ingestor.stop)
+        return ingestor
+
+
+def collect_feedback(context: UserSessionContext, feedback_text: str, rating: Optional[int] = None,
+                     db_path: str = "health_wellness.db") -> dict:
+    """Queue a user's feedback; it is stored as a 'Feedback Submission' activity within about a second."""
+    def _collect():
+        get_feedback_ingestor(db_path).submit(context.uid, feedback_text, rating)
+        return {"message": "Feedback recorded"}
+
+    return handle_operation(_collect, context=context)
@@ -0,0 +1,245 @@
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, List, Optional
+from utils.env import getenv, load_env
+
+logger = logging.getLogger(__name__)
+
+
+class LLMBackend(ABC):
+    """What Agent.model must provide; mirrors google.generativeai.GenerativeModel."""
+
+    name = "backend"
+
+    @abstractmethod
+    async def generate_content_async(self, prompt: str, stream: bool = False) -> Any:
+        """Return a response with .text, or an async iterable of chunks with .text when stream=True."""
+
+
+class GeminiBackend(LLMBackend):
+    """Real Gemini adapter; the SDK is imported and configured on first use."""
+
+    name = "gemini"
+
+    def __init__(self, model_name: str = "gemini-1.5-flash", api_key: Optional[str] = None):
+        self.model_name = model_name
+        self.api_key = api_key
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+
+                    api_key = self.api_key or getenv("GEMINI_API_KEY")
+                    if not api_key:
+                        raise ValueError("GEMINI_API_KEY is missing in your .env file")
+                    genai.configure(api_key=api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+                    logger.info(f"✅ Gemini Free Model Initialized ({self.model_name})")
+        return self._model
+
+    async def generate_content_async(self, prompt: str, stream: bool = False) -> Any:
+        return await self.model.generate_content_async(prompt, stream=stream)
+
+
+class BackendError(Exception):
+    """Injected failure from FakeBackend; status_code lets the gateway classify it."""
+
+    def __init__(self, status_code: int, message: str = "Injected backend error"):
+        super().__init__(f"{status_code} {message}")
+        self.status_code = status_code
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _StreamedResponse:
+    def __init__(self, chunks: List[str], delay: Callable[[], float], fail_at: Optional[int], status: int):
+        self._chunks = chunks
+        self._delay = delay
+        self._fail_at = fail_at
+        self._status = status
+        self.text = "".join(chunks)
+
+    async def __aiter__(self):
+        for index, chunk in enumerate(self._chunks):
+            if index == self._fail_at:
+                raise BackendError(self._status, "Injected mid-stream failure")
+            await asyncio.sleep(self._delay())
+            yield _Chunk(chunk)
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Turn 'fixed:0.5', 'uniform:0.2:1.0' or 'lognormal:0.8:0.4' (median, sigma) into a sampler."""
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class FakeBackend(LLMBackend):
+    """Offline deterministic stand-in with configurable latency, chunking and error rate."""
+
+    name = "fake"
+
+    def __init__(self, latency: str = "lognormal:0.8:0.4", chunk_latency: str = "fixed:0.03",
+                 chunk_words: int = 4, error_rate: float = 0.0, error_status: int = 429,
+                 stream_error_rate: float = 0.0, seed: Optional[int] = None):
+        self.first_token_latency = parse_latency(latency)
+        self.chunk_latency = parse_latency(chunk_latency)
+        self.chunk_words = max(1, chunk_words)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stream_error_rate = stream_error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeBackend":
+        load_env()
+        seed = os.getenv("FAKE_LLM_SEED")
+        return cls(
+            latency=os.getenv("FAKE_LLM_LATENCY", "lognormal:0.8:0.4"),
+            chunk_latency=os.getenv("FAKE_LLM_CHUNK_LATENCY", "fixed:0.03"),
+            chunk_words=int(os.getenv("FAKE_LLM_CHUNK_WORDS", "4")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            error_status=int(os.getenv("FAKE_LLM_ERROR_STATUS", "429")),
+            stream_error_rate=float(os.getenv("FAKE_LLM_STREAM_ERROR_RATE", "0")),
+            seed=int(seed) if seed else None,
+        )
+
+    def respond(self, prompt: str) -> str:
+        """Deterministic advice text: the same prompt always gets the same answer."""
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        lines = [line.strip() for line in prompt.strip().splitlines()]
+        question = lines[lines.index("User Question:") + 1] if "User Question:" in lines[:-1] else (lines[0] if lines else "")
+        tips = ["Stay hydrated through the day.", "Aim for seven to nine hours of sleep.",
+                "Build meals around vegetables and lean protein.", "Warm up before every workout.",
+                "Track progress weekly rather than daily.", "Add a rest day between hard sessions."]
+        start = int(digest[:8], 16) % len(tips)
+        picked = [tips[(start + i) % len(tips)] for i in range(3)]
+        return (f"Here is some friendly guidance based on your profile and question ({question[:80]}). "
+                f"Small, consistent steps will get you there.\n" + "\n".join(f"- {tip}" for tip in picked))
+
+    def sample(self) -> tuple:
+        """Draw (first-token latency, fail?, fail-mid-stream?) for one call."""
+        with self._lock:
+            self.calls += 1
+            return (self.first_token_latency(self._rng), self._rng.random() < self.error_rate,
+                    self._rng.random() < self.stream_error_rate)
+
+    def _chunk_delay(self) -> float:
+        with self._lock:
+            return self.chunk_latency(self._rng)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False) -> Any:
+        latency, fail, fail_mid_stream = self.sample()
+        await asyncio.sleep(latency)
+        if fail:
+            raise BackendError(self.error_status)
+        text = self.respond(prompt)
+        if not stream:
+            return _Chunk(text)
+        words = text.split(" ")
+        chunks = [" ".join(words[i:i + self.chunk_words]) + (" " if i + self.chunk_words < len(words) else "")
+                  for i in range(0, len(words), self.chunk_words)]
+        fail_at = len(chunks) // 2 if fail_mid_stream else None
+        return _StreamedResponse(chunks, self._chunk_delay, fail_at, self.error_status)
+
+
+def make_fake_handler(backend: FakeBackend):
+    # http.server is only needed when the stand-in is served, so keep it off the import path
+    from http.server import BaseHTTPRequestHandler
+
+    class FakeGeminiHandler(BaseHTTPRequestHandler):
+        """Answers Gemini REST generateContent requests, as used by dashboard.call_gemini_api."""
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+            try:
+                prompt = json.loads(body)["contents"][0]["parts"][0]["text"]
+            except (ValueError, KeyError, IndexError):
+                return self._reply(400, {"error": {"code": 400, "message": "Malformed request"}})
+
+            latency, fail, _ = backend.sample()
+            time.sleep(latency)
+            if fail:
+                return self._reply(backend.error_status, {"error": {"code": backend.error_status, "message": "Injected backend error"}})
+            self._reply(200, {"candidates": [{"content": {"parts": [{"text": backend.respond(prompt)}], "role": "model"}}]})
+
+        def _reply(self, status: int, payload: dict):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return FakeGeminiHandler
+
+
+def serve_fake_backend(host: str = "127.0.0.1", port: int = 8765, backend: Optional[FakeBackend] = None,
+                       background: bool = False):
+    """Run a local Gemini-compatible HTTP endpoint backed by FakeBackend."""
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer((host, port), make_fake_handler(backend or FakeBackend.from_env()))
+    logger.info(f"🧪 Fake Gemini listening on http://{host}:{server.server_port}/v1beta/models/fake:generateContent")
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    else:
+        server.serve_forever()
+    return server
+
+
+_default_backend: Optional[LLMBackend] = None
+_default_lock = threading.Lock()
+
+
+def get_default_backend() -> LLMBackend:
+    """Shared backend picked by LLM_BACKEND ('gemini' or 'fake')."""
+    global _default_backend
+    with _default_lock:
+        if _default_backend is None:
+            choice = getenv("LLM_BACKEND", "gemini").lower()
+            _default_backend = FakeBackend.from_env() if choice == "fake" else GeminiBackend()
+        return _default_backend
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve an offline Gemini stand-in for the dashboard")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="lognormal:0.8:0.4")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    serve_fake_backend(args.host, args.port, FakeBackend(latency=args.latency, error_rate=args.error_rate,
+                                                         error_status=args.error_status, seed=args.seed))
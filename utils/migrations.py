@@ -0,0 +1,335 @@
+import json
+import time
+import uuid
+import logging
+from typing import Callable, List, Tuple
+from utils.storage import Storage
+
+logger = logging.getLogger(__name__)
+
+
+def _columns(conn, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def _create_core_tables(conn):
+    # Credentials, keyed by uid with one account per email
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS accounts (
+            uid INTEGER PRIMARY KEY,
+            email TEXT NOT NULL,
+            username TEXT,
+            password TEXT,
+            created_at REAL
+        )
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_accounts_email ON accounts (email)")
+
+    # Session context saved by DatabaseManager; history lives in user_events
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_contexts (
+            uid INTEGER PRIMARY KEY,
+            name TEXT,
+            goal TEXT,
+            diet_preferences TEXT,
+            health_conditions TEXT,
+            workout_plan TEXT,
+            meal_plan TEXT,
+            injury_notes TEXT,
+            updated_at REAL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            uid INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_events_uid_kind ON user_events (uid, kind, id)")
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_profiles (
+            uid INTEGER PRIMARY KEY,
+            name TEXT,
+            email TEXT,
+            preferences TEXT,
+            updated_at TEXT
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS activities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            uid INTEGER NOT NULL,
+            activity_type TEXT NOT NULL,
+            activity_details TEXT,
+            timestamp TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_activities_uid_timestamp ON activities (uid, timestamp)")
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS llm_response_cache (
+            key TEXT PRIMARY KEY,
+            response TEXT,
+            created_at REAL,
+            expires_at REAL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_response_cache (expires_at)")
+
+
+def _legacy_json(value, shape: type):
+    """The old save_context stored diet_preferences and injury_notes as raw text; return them as JSON of `shape`."""
+    if value is None or value == "":
+        return None
+    try:
+        parsed = json.loads(value)
+    except (TypeError, ValueError):
+        parsed = value
+    if parsed is None or isinstance(parsed, shape):
+        return None if parsed is None else json.dumps(parsed)
+    if shape is list:
+        return json.dumps([str(parsed)])
+    return json.dumps({"notes": parsed})
+
+
+def _split_legacy_users(conn):
+    """Move the shared 'users' table into accounts / user_contexts / user_events.
+
+    DatabaseManager and UserAuth both created 'users', so depending on which
+    ran first it holds context rows, credential rows or a mix of both (UserAuth
+    added its columns to the context table). The original is kept as legacy_users.
+    """
+    if "users" not in {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}:
+        return
+    columns = set(_columns(conn, "users"))
+    now = time.time()
+
+    if {"email", "password"} <= columns:
+        rows = conn.execute(
+            f"SELECT email, username, password, {'uid' if 'uid' in columns else 'NULL'} FROM users WHERE email IS NOT NULL"
+        ).fetchall()
+        conn.executemany(
+            "INSERT OR IGNORE INTO accounts (uid, email, username, password, created_at) VALUES (?, ?, ?, ?, ?)",
+            [(uid if uid is not None else uuid.uuid4().int & (1 << 31) - 1, email, username, password, now)
+             for email, username, password, uid in rows]
+        )
+
+    if {"uid", "goal"} <= columns:
+        rows = conn.execute("""
+            SELECT uid, name, goal, diet_preferences, workout_plan, meal_plan, injury_notes, handoff_logs, progress_logs
+            FROM users WHERE uid IS NOT NULL AND name IS NOT NULL
+        """).fetchall()
+        conn.executemany("""
+            INSERT OR IGNORE INTO user_contexts (
+                uid, name, goal, diet_preferences, health_conditions, workout_plan, meal_plan, injury_notes, updated_at
+            ) VALUES (?, ?, ?, ?, '[]', ?, ?, ?, ?)
+        """, [(*row[:3], _legacy_json(row[3], list), *row[4:6], _legacy_json(row[6], dict), now) for row in rows])
+        events = []
+        for row in rows:
+            for kind, blob in (("handoff", row[7]), ("progress", row[8])):
+                for event in json.loads(blob) if blob else []:
+                    events.append((row[0], kind, json.dumps(event), now))
+        conn.executemany("INSERT INTO user_events (uid, kind, payload, created_at) VALUES (?, ?, ?, ?)", events)
+
+    conn.execute("ALTER TABLE users RENAME TO legacy_users")
+
+
+def _create_activity_rollups(conn):
+    # Per-user, per-day, per-type counters kept current from activities by id watermark
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS activity_daily_rollups (
+            uid INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            activity_type TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (uid, day, activity_type)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_watermarks (
+            name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL
+        )
+    """)
+
+
+def _create_email_outbox(conn):
+    # Emails waiting for the delivery worker; next_attempt_at doubles as the claim lease while sending
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            uid INTEGER,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            sent_at REAL
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (next_attempt_at)
+        WHERE status IN ('pending', 'sending')
+    """)
+
+
+def _create_reminders(conn):
+    # Recurring reminders; next_fire_at is UTC epoch seconds, NULL once nothing is left to fire
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS reminders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            uid INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            local_time TEXT NOT NULL,
+            weekdays INTEGER NOT NULL,
+            timezone TEXT NOT NULL,
+            method TEXT NOT NULL,
+            recipient TEXT,
+            message TEXT,
+            next_fire_at REAL,
+            last_fired_at REAL,
+            active INTEGER NOT NULL DEFAULT 1,
+            created_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reminders_next_fire ON reminders (next_fire_at) WHERE active = 1")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reminders_uid ON reminders (uid)")
+
+
+def _create_feedback_counters(conn):
+    # Running per-user feedback totals, bumped in the same transaction as each flushed batch
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS feedback_counters (
+            uid INTEGER PRIMARY KEY,
+            submissions INTEGER NOT NULL,
+            rating_total INTEGER NOT NULL DEFAULT 0,
+            rated INTEGER NOT NULL DEFAULT 0,
+            first_at TEXT NOT NULL,
+            last_at TEXT NOT NULL
+        )
+    """)
+
+
+def _create_escalations(conn):
+    # Handoffs waiting for a human expert; ids are time-ordered UUIDs, lower priority is more urgent
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS escalations (
+            id TEXT PRIMARY KEY,
+            uid INTEGER,
+            dedup_key TEXT NOT NULL,
+            priority INTEGER NOT NULL,
+            reasons TEXT NOT NULL,
+            message TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            repeats INTEGER NOT NULL DEFAULT 0,
+            claimed_by TEXT,
+            lease_until REAL,
+            resolution TEXT,
+            created_at REAL NOT NULL,
+            last_seen_at REAL NOT NULL,
+            resolved_at REAL
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_escalations_open ON escalations (priority, created_at)
+        WHERE status IN ('pending', 'claimed')
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_escalations_dedup ON escalations (dedup_key, last_seen_at)
+        WHERE status IN ('pending', 'claimed')
+    """)
+
+
+def _reencode_legacy_profiles(conn):
+    # Databases split before _legacy_json existed kept raw text that load_context cannot parse
+    rows = conn.execute("SELECT uid, diet_preferences, injury_notes FROM user_contexts").fetchall()
+    conn.executemany("UPDATE user_contexts SET diet_preferences = ?, injury_notes = ? WHERE uid = ?", [
+        (_legacy_json(diet, list), _legacy_json(notes, dict), uid) for uid, diet, notes in rows
+        if (diet, notes) != (_legacy_json(diet, list), _legacy_json(notes, dict))
+    ])
+
+
+def _add_escalation_follow_ups(conn):
+    # Repeats of an open escalation are kept next to its original message
+    if "follow_ups" not in _columns(conn, "escalations"):
+        conn.execute("ALTER TABLE escalations ADD COLUMN follow_ups TEXT NOT NULL DEFAULT '[]'")
+
+
+def _create_reminder_inbox(conn):
+    # Last in-app reminder event each user dismissed on the dashboard
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS reminder_inbox (
+            uid INTEGER PRIMARY KEY,
+            last_seen_id INTEGER NOT NULL
+        )
+    """)
+    # Dismissals used to be parked in rollup_watermarks as 'reminder_inbox:<uid>'
+    conn.execute("""
+        INSERT OR IGNORE INTO reminder_inbox (uid, last_seen_id)
+        SELECT CAST(substr(name, 16) AS INTEGER), last_id FROM rollup_watermarks WHERE name LIKE 'reminder_inbox:%'
+    """)
+    conn.execute("DELETE FROM rollup_watermarks WHERE name LIKE 'reminder_inbox:%'")
+
+
+# (version, description, step); append new steps, never edit released ones
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "core tables and indexes", _create_core_tables),
+    (2, "split legacy users table", _split_legacy_users),
+    (3, "daily activity rollups", _create_activity_rollups),
+    (4, "email outbox", _create_email_outbox),
+    (5, "reminders", _create_reminders),
+    (6, "feedback counters", _create_feedback_counters),
+    (7, "escalation queue", _create_escalations),
+    (8, "re-encode legacy profile text", _reencode_legacy_profiles),
+    (9, "escalation follow-ups", _add_escalation_follow_ups),
+    (10, "reminder inbox", _create_reminder_inbox),
+]
+
+
+def schema_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn) -> int:
+    """Apply pending migrations in one transaction; returns the resulting version."""
+    # IMMEDIATE takes the write lock first, so two processes starting together can't both migrate
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        current = schema_version(conn)
+        for version, description, step in MIGRATIONS:
+            if version <= current:
+                continue
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            logger.info(f"🗄️ Applied migration {version}: {description}")
+            current = version
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return current
+
+
+def ensure_migrated(storage: Storage):
+    """Bring the database up to date once per process."""
+    storage.ensure_schema("migrations", migrate)
+
+
+if __name__ == "__main__":
+    import argparse
+    from utils.storage import get_storage
+
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument("--db", default="health_wellness.db")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    storage = get_storage(args.db)
+    print(f"Schema version {schema_version(storage.connection())} -> {migrate(storage.connection())}")
@@ -0,0 +1,366 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import logging
+import itertools
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from utils.env import load_env
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes: lower value is served first
+INTERACTIVE = 0
+BATCH = 1
+LANES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised when the backend circuit breaker is rejecting calls."""
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    # requests.HTTPError carries a response; google.api_core errors expose .code
+    response = getattr(exc, "response", None)
+    for value in (getattr(exc, "status_code", None), getattr(response, "status_code", None), getattr(exc, "code", None)):
+        try:
+            if value is not None:
+                return int(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """True for quota/server errors and transport failures worth retrying."""
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    return bool(names & {"TimeoutError", "ConnectionError", "Timeout", "ResourceExhausted", "ServiceUnavailable",
+                         "InternalServerError", "DeadlineExceeded"})
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After")) if headers.get("Retry-After") else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Token-bucket rate limiter; reserve() returns how long the caller must wait."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Going negative queues the caller behind earlier reservations
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+
+class CircuitBreaker:
+    """Opens after consecutive backend failures, then lets one trial call through."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open":
+                remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+                if remaining > 0:
+                    raise CircuitOpenError(f"Gemini temporarily unavailable, retry in {remaining:.1f}s")
+                self.state = "half_open"
+                self._opened_at = time.monotonic()
+            elif self.state == "half_open":
+                # A trial that never reported back (e.g. cancelled) must not wedge the breaker
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError("Gemini recovery check in progress, retry shortly")
+                self._opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning("🚨 Gemini circuit opened after repeated failures")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+class _Gate:
+    """Concurrency cap shared by coroutines and threads; a freed slot goes to the best lane first, on either side."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        # [priority, seq, wake, granted, cancelled]
+        self._waiters: List[list] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _enter(self, priority: int, wake: Callable[[], Any]) -> Optional[list]:
+        """Take a slot now (None) or queue a waiter entry to be woken with one."""
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return None
+            entry = [priority, next(self._seq), wake, False, False]
+            heapq.heappush(self._waiters, entry)
+            return entry
+
+    async def acquire_async(self, priority: int):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        entry = self._enter(priority, lambda: loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None)))
+        if entry is None:
+            return
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                entry[4] = True
+                granted = entry[3]
+            # The slot may have been handed over just before the cancel landed
+            if granted:
+                self.release()
+            raise
+
+    def acquire(self, priority: int):
+        event = threading.Event()
+        if self._enter(priority, event.set) is not None:
+            event.wait()
+
+    def release(self):
+        while True:
+            with self._lock:
+                entry = None
+                while self._waiters:
+                    candidate = heapq.heappop(self._waiters)
+                    if not candidate[4]:
+                        entry = candidate
+                        entry[3] = True
+                        break
+                if entry is None:
+                    self.active -= 1
+                    return
+            try:
+                entry[2]()  # Slot passes straight to the waiter
+                return
+            except RuntimeError:
+                # Its event loop has closed; offer the slot to the next waiter
+                with self._lock:
+                    entry[4] = True
+
+    def depth(self) -> Dict[int, int]:
+        with self._lock:
+            counts: Dict[int, int] = {}
+            for priority, _, _, _, cancelled in self._waiters:
+                if not cancelled:
+                    counts[priority] = counts.get(priority, 0) + 1
+            return counts
+
+
+class ModelGateway:
+    """Shared front door to the LLM backend: rate limit, concurrency cap, priority lanes, retry and circuit breaker."""
+
+    def __init__(self, requests_per_minute: float = 60, burst: float = 10, max_concurrency: int = 8,
+                 max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 20.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # One budget for coroutines and threads, so max_concurrency is the real process-wide cap
+        self._gate = _Gate(max_concurrency)
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "succeeded": 0, "failed": 0, "retries": 0, "rejected": 0}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._waits = 0
+
+    # ---------- async path (agent / Chainlit) ----------
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], priority: int = INTERACTIVE) -> Any:
+        """Await fn() under the gateway's limits, retrying quota/server errors."""
+        async with self._async_slot(priority) as started:
+            return await self._with_retries_async(fn, started)
+
+    async def stream(self, open_fn: Callable[[], Awaitable[Any]], priority: int = INTERACTIVE) -> AsyncIterator[Any]:
+        """Open a streaming response with retries and hold the slot until it is drained."""
+        async with self._async_slot(priority) as started:
+            response = await self._with_retries_async(open_fn, started)
+            try:
+                async for chunk in response:
+                    yield chunk
+            except Exception as e:
+                # Chunks may already be out, so a mid-stream failure is not retried
+                self._record_failure(e)
+                raise
+
+    @asynccontextmanager
+    async def _async_slot(self, priority: int):
+        self._admit()
+        started = time.monotonic()
+        await self._gate.acquire_async(priority)
+        try:
+            yield started
+        finally:
+            self._gate.release()
+
+    async def _with_retries_async(self, fn: Callable[[], Awaitable[Any]], started: float) -> Any:
+        for attempt in range(self.max_retries + 1):
+            # Every attempt, retries included, spends a token, so a burst of 429s cannot outrun the limit
+            delay = self.bucket.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+            if attempt == 0:
+                self._record_wait(time.monotonic() - started)
+            try:
+                result = await fn()
+                self._record_success()
+                return result
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    # ---------- sync path (dashboard / batch jobs) ----------
+
+    def call_sync(self, fn: Callable[[], Any], priority: int = INTERACTIVE) -> Any:
+        with self._thread_slot(priority) as started:
+            for attempt in range(self.max_retries + 1):
+                delay = self.bucket.reserve()
+                if delay:
+                    time.sleep(delay)
+                if attempt == 0:
+                    self._record_wait(time.monotonic() - started)
+                try:
+                    result = fn()
+                    self._record_success()
+                    return result
+                except Exception as e:
+                    delay = self._retry_delay(e, attempt)
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+
+    @contextmanager
+    def _thread_slot(self, priority: int):
+        self._admit()
+        started = time.monotonic()
+        self._gate.acquire(priority)
+        try:
+            yield started
+        finally:
+            self._gate.release()
+
+    # ---------- shared bookkeeping ----------
+
+    def _admit(self):
+        with self._lock:
+            self.counters["calls"] += 1
+        try:
+            self.breaker.allow()
+        except CircuitOpenError:
+            with self._lock:
+                self.counters["rejected"] += 1
+            raise
+
+    def _retry_delay(self, exc: BaseException, attempt: int) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None to give up."""
+        if not is_retryable(exc):
+            # The backend answered (e.g. a 400), so it is up as far as the breaker cares
+            self.breaker.record_success()
+            with self._lock:
+                self.counters["failed"] += 1
+            return None
+        if attempt >= self.max_retries:
+            self._record_failure(exc)
+            return None
+        with self._lock:
+            self.counters["retries"] += 1
+        # Full jitter keeps a burst of 429s from retrying in lockstep
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        logger.warning(f"⏳ Gemini call failed ({exc}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+        return delay
+
+    def _record_success(self):
+        self.breaker.record_success()
+        with self._lock:
+            self.counters["succeeded"] += 1
+
+    def _record_failure(self, exc: BaseException):
+        if is_retryable(exc):
+            self.breaker.record_failure()
+        with self._lock:
+            self.counters["failed"] += 1
+
+    def _record_wait(self, waited: float):
+        with self._lock:
+            self._waits += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats["avg_wait"] = self._wait_total / self._waits if self._waits else 0.0
+            stats["max_wait"] = self._wait_max
+        depth: Dict[str, int] = {name: 0 for name in LANES.values()}
+        for priority, count in self._gate.depth().items():
+            name = LANES.get(priority, str(priority))
+            depth[name] = depth.get(name, 0) + count
+        stats["queue_depth"] = depth
+        stats["inflight"] = self._gate.active
+        stats["circuit"] = self.breaker.state
+        return stats
+
+
+_shared_gateway: Optional[ModelGateway] = None
+_shared_lock = threading.Lock()
+
+
+def get_model_gateway() -> ModelGateway:
+    """Process-wide gateway; limits come from GEMINI_RPM, GEMINI_BURST and GEMINI_MAX_CONCURRENCY."""
+    global _shared_gateway
+    with _shared_lock:
+        if _shared_gateway is None:
+            load_env()
+            _shared_gateway = ModelGateway(
+                requests_per_minute=float(os.getenv("GEMINI_RPM", "60")),
+                burst=float(os.getenv("GEMINI_BURST", "10")),
+                max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+            )
+        return _shared_gateway
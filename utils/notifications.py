@@ -1,5 +1,16 @@
-def send_progress_email(context, recipient_email, smtp_server, smtp_port, sender_email, sender_password):
-    return {"message": "Email settings saved"}
+from context import UserSessionContext
+from utils.error_handler import handle_operation
 
-def schedule_reminder(context, recipient_email, smtp_server, smtp_port, sender_email):
-    return {"message": "Reminder set"}
\ No newline at end of file
+
+def send_progress_email(context: UserSessionContext, recipient_email: str, db_path: str = "health_wellness.db"):
+    """Queue the user's progress email; the outbox worker delivers it in the background."""
+    def _queue():
+        from utils.email_outbox import build_progress_email, get_outbox_worker
+
+        worker = get_outbox_worker(db_path)
+        subject, body = build_progress_email(context)
+        worker.outbox.enqueue(recipient_email, subject, body, uid=context.uid)
+        worker.notify()
+        return {"message": f"Progress email queued for {recipient_email}"}
+
+    return handle_operation(_queue, context=context)
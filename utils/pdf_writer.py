@@ -0,0 +1,96 @@
+import zlib
+from typing import BinaryIO, List
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 50
+FONTS = {"regular": b"F1", "bold": b"F2"}
+
+
+def _escape(text: str) -> bytes:
+    # Built-in Helvetica is WinAnsi only; anything outside cp1252 (e.g. emoji) becomes '?'
+    raw = text.encode("cp1252", errors="replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _wrap(text: str, width: int) -> List[str]:
+    # Break at the last space that fits; textwrap is ~10x slower and this runs once per log entry
+    lines = []
+    while len(text) > width:
+        # Search past the continuation indent, or a long unbroken word would never shrink
+        cut = text.rfind(" ", 3, width + 1)
+        if cut < 3:
+            cut = width
+        lines.append(text[:cut])
+        text = "  " + text[cut:].lstrip()
+    lines.append(text)
+    return lines
+
+
+class StreamingPDF:
+    """Minimal text-only PDF writer that emits each page as soon as it is full.
+
+    Only byte offsets of written objects are kept, so memory stays constant
+    however long the document is. Uses the standard Helvetica fonts, which
+    every viewer provides, so nothing is embedded.
+    """
+
+    def __init__(self, out: BinaryIO, font_size: float = 10, leading: float = 14):
+        self.out = out
+        self.font_size = font_size
+        self.leading = leading
+        self.wrap_width = int((PAGE_WIDTH - 2 * MARGIN) / (font_size * 0.5))
+        self._pos = 0
+        self._offsets: List[int] = []
+        self._pages: List[int] = []
+        self._ops: List[bytes] = []
+        self._y = PAGE_HEIGHT - MARGIN
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        # 1 catalog, 2 page tree (written last), 3-4 fonts
+        self._object(b"<< /Type /Catalog /Pages 2 0 R >>")
+        self._offsets.append(0)
+        self._object(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        self._object(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+
+    def _write(self, data: bytes):
+        self.out.write(data)
+        self._pos += len(data)
+
+    def _object(self, body: bytes, number: int = 0) -> int:
+        if not number:
+            self._offsets.append(self._pos)
+            number = len(self._offsets)
+        else:
+            self._offsets[number - 1] = self._pos
+        self._write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        return number
+
+    def _flush_page(self):
+        content = zlib.compress(b"\n".join(self._ops))
+        stream = self._object(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(content), content))
+        self._pages.append(self._object(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>" % (PAGE_WIDTH, PAGE_HEIGHT, stream)
+        ))
+        self._ops = []
+        self._y = PAGE_HEIGHT - MARGIN
+
+    def line(self, text: str = "", style: str = "regular", size: float = 0):
+        """Write one line, wrapping long text and starting new pages as needed."""
+        size = size or self.font_size
+        width = max(10, int(self.wrap_width * self.font_size / size))
+        step = max(self.leading, size * 1.4)
+        for chunk in _wrap(text, width):
+            if self._y - step < MARGIN:
+                self._flush_page()
+            self._y -= step
+            self._ops.append(b"BT /%s %.1f Tf %d %.1f Td (%s) Tj ET" % (FONTS[style], size, MARGIN, self._y, _escape(chunk)))
+
+    def close(self):
+        if self._ops or not self._pages:
+            self._flush_page()
+        kids = b" ".join(b"%d 0 R" % page for page in self._pages)
+        self._object(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._pages)), number=2)
+        xref = self._pos
+        entries = b"".join(b"%010d 00000 n \n" % offset for offset in self._offsets)
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n%s" % (len(self._offsets) + 1, entries))
+        self._write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(self._offsets) + 1, xref))
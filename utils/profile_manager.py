@@ -1,47 +1,59 @@
-import sqlite3
 from context import UserSessionContext
-from utils.error_handler import handle_operation
+from utils.error_handler import handle_operation, handle_operation_async
+from utils.storage import get_storage
+from utils.db_worker import get_db_worker
+from utils.migrations import ensure_migrated
 from datetime import datetime
 
 class ProfileManager:
     def __init__(self, db_path: str = "health_wellness.db"):
         self.db_path = db_path
+        self.storage = get_storage(db_path)
+        self.worker = get_db_worker(db_path)
         self.init_db()
 
     def init_db(self):
-        """Initialize the user_profiles table."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS user_profiles (
-                    uid INTEGER PRIMARY KEY,
-                    name TEXT,
-                    email TEXT,
-                    preferences TEXT,
-                    updated_at TEXT
-                )
-            """)
-            conn.commit()
+        """Bring the user_profiles table up to date (once per process)."""
+        ensure_migrated(self.storage)
+
+    @staticmethod
+    def _write_profile(conn, row: tuple):
+        conn.execute("""
+            INSERT OR REPLACE INTO user_profiles (uid, name, email, preferences, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, row)
+
+    @staticmethod
+    def _profile_row(context: UserSessionContext, name: str, email: str, preferences: str) -> tuple:
+        return (context.uid, name or context.name, email, preferences or context.diet_preferences, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+    @staticmethod
+    def _apply_to_context(context: UserSessionContext, name: str, email: str, preferences: str) -> dict:
+        if name:
+            context.name = name
+        if preferences:
+            context.diet_preferences = preferences
+        context.progress_logs.append({
+            "event": f"Profile updated: name={name or context.name}, email={email}, preferences={preferences or context.diet_preferences}",
+            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
+        return {"message": "Profile updated successfully"}
 
     def update_profile(self, context: UserSessionContext, name: str = None, email: str = None, preferences: str = None) -> dict:
         """Update user profile in the database and context."""
         def _update():
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT OR REPLACE INTO user_profiles (uid, name, email, preferences, updated_at)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (context.uid, name or context.name, email, preferences or context.diet_preferences, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
-                conn.commit()
-            
-            if name:
-                context.name = name
-            if preferences:
-                context.diet_preferences = preferences
-            context.progress_logs.append({
-                "event": f"Profile updated: name={name or context.name}, email={email}, preferences={preferences or context.diet_preferences}",
-                "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            })
-            return {"message": "Profile updated successfully"}
-        
-        return handle_operation(_update, context=context)
\ No newline at end of file
+            row = self._profile_row(context, name, email, preferences)
+            with self.storage.transaction() as conn:
+                self._write_profile(conn, row)
+            return self._apply_to_context(context, name, email, preferences)
+
+        return handle_operation(_update, context=context)
+
+    async def update_profile_async(self, context: UserSessionContext, name: str = None, email: str = None, preferences: str = None) -> dict:
+        """Same as update_profile, with the write queued on the shared DB thread."""
+        async def _update():
+            row = self._profile_row(context, name, email, preferences)
+            await self.worker.write(lambda conn: self._write_profile(conn, row))
+            return self._apply_to_context(context, name, email, preferences)
+
+        return await handle_operation_async(_update, context=context)
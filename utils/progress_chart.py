@@ -1,2 +1,201 @@
-def generate_progress_chart(context):
-    return {"message": "Chart generated (placeholder)"}
\ No newline at end of file
+import io
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from context import UserSessionContext
+from utils.error_handler import handle_operation
+
+Series = List[Tuple[float, float]]
+
+
+def lttb(points: Sequence[Tuple[float, float]], threshold: int) -> Series:
+    """Largest-Triangle-Three-Buckets downsampling; keeps the visual shape of a long series."""
+    points = list(points)
+    if threshold >= len(points) or threshold < 3:
+        return points
+    import numpy as np
+
+    data = np.asarray(points, dtype=float)
+    sampled = [data[0]]
+    every = (len(data) - 2) / (threshold - 2)
+    selected = 0
+    for i in range(threshold - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_start, next_end = end, min(int((i + 2) * every) + 1, len(data))
+        # Average of the next bucket is the third corner of the triangle
+        next_avg = data[next_start:next_end].mean(axis=0) if next_end > next_start else data[-1]
+        bucket = data[start:end]
+        a = data[selected]
+        areas = np.abs((a[0] - next_avg[0]) * (bucket[:, 1] - a[1]) - (a[0] - bucket[:, 0]) * (next_avg[1] - a[1]))
+        selected = start + int(areas.argmax())
+        sampled.append(data[selected])
+    sampled.append(data[-1])
+    return [(float(x), float(y)) for x, y in sampled]
+
+
+class ChartCache:
+    """LRU of rendered PNGs and their point counts, keyed by a hash of what identifies the chart's data."""
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._images: "OrderedDict[str, Tuple[bytes, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def key(payload: Dict[str, Any]) -> str:
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, int]]:
+        with self._lock:
+            image = self._images.get(key)
+            if image is None:
+                self.counters["misses"] += 1
+                return None
+            self._images.move_to_end(key)
+            self.counters["hits"] += 1
+            return image
+
+    def set(self, key: str, image: bytes, points: int):
+        with self._lock:
+            self._images[key] = (image, points)
+            self._images.move_to_end(key)
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+
+
+_chart_cache = ChartCache()
+
+
+def _day_number(value: str) -> Optional[float]:
+    try:
+        return float(datetime.strptime(value[:10], "%Y-%m-%d").toordinal())
+    except (TypeError, ValueError):
+        return None
+
+
+def activity_series(activity_trend: Dict[str, int]) -> Series:
+    """Daily activity counts as (ordinal day, count), oldest first."""
+    points = [(_day_number(day), float(count)) for day, count in activity_trend.items()]
+    return sorted(p for p in points if p[0] is not None)
+
+
+def progress_series(events: Iterable[Tuple[Dict[str, Any], float]]) -> Series:
+    """Cumulative number of progress events per day from (entry, recorded_at epoch) pairs."""
+    per_day: Dict[float, int] = {}
+    for log, recorded_at in events:
+        day = _day_number(str(log.get("timestamp", ""))) if isinstance(log, dict) else None
+        if day is None:
+            # Tools and hooks log timestamp "now"; the day it was recorded is the honest stand-in
+            day = float(datetime.fromtimestamp(recorded_at).toordinal())
+        per_day[day] = per_day.get(day, 0) + 1
+    total, points = 0, []
+    for day in sorted(per_day):
+        total += per_day[day]
+        points.append((day, float(total)))
+    return points
+
+
+def _unsaved_progress(context: UserSessionContext, db_path: Optional[str]) -> List[Dict[str, Any]]:
+    if not db_path:
+        return context.progress_logs
+    return context.progress_logs[min(context.progress_log_offset, len(context.progress_logs)):]
+
+
+def _chart_key(context: UserSessionContext, db_path: Optional[str], title: str, activity: Series, max_points: int) -> str:
+    # Progress history is append-only, so its newest id plus unsaved entries stand in for the whole series
+    latest = None
+    if db_path:
+        from utils.database import DatabaseManager
+
+        latest = DatabaseManager(db_path).storage.query_one(
+            "SELECT MAX(id) FROM user_events WHERE uid = ? AND kind = 'progress'", (context.uid,)
+        )[0]
+    pending = _unsaved_progress(context, db_path)
+    # Unsaved entries are charted on today's date, so the day is part of their identity
+    today = datetime.now().strftime("%Y-%m-%d") if pending else None
+    return ChartCache.key({"title": title, "activity": activity, "latest": latest, "pending": pending, "today": today,
+                           "max_points": max_points})
+
+
+def _progress_events(context: UserSessionContext, db_path: Optional[str]) -> Iterable[Tuple[Dict[str, Any], float]]:
+    """Saved progress events with their recorded time, then entries the context has not saved yet."""
+    now = time.time()
+    if db_path:
+        from utils.database import DatabaseManager
+
+        for page in DatabaseManager(db_path).scan_events(context.uid, "progress"):
+            for _, payload, created_at in page:
+                yield json.loads(payload), created_at
+    for log in _unsaved_progress(context, db_path):
+        yield log, now
+
+
+def render_chart(panels: List[Dict[str, Any]], title: str, width: float = 8.0, dpi: int = 100) -> bytes:
+    """Draw one line panel per entry ({'label', 'points'}) to PNG, headless."""
+    # Figure + Agg canvas directly: no pyplot global state, safe from Streamlit's script threads
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+
+    figure = Figure(figsize=(width, 2.6 * len(panels)), dpi=dpi)
+    FigureCanvasAgg(figure)
+    axes = figure.subplots(len(panels), 1, squeeze=False)[:, 0]
+    for ax, panel in zip(axes, panels):
+        # Ordinal days -> matplotlib date numbers (days since 1970-01-01)
+        xs = [x - 719163 for x, _ in panel["points"]]
+        ys = [y for _, y in panel["points"]]
+        ax.plot(xs, ys, marker="o" if len(xs) < 40 else None, linewidth=1.6, color=panel.get("color", "#2e86de"))
+        ax.set_ylabel(panel["label"])
+        ax.grid(alpha=0.3)
+        locator = AutoDateLocator()
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+    axes[0].set_title(title)
+    figure.tight_layout()
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def generate_progress_chart(context: UserSessionContext, activity_trend: Optional[Dict[str, int]] = None,
+                            max_points: int = 400, db_path: str = "health_wellness.db") -> dict:
+    """Render activity trend and goal progress for a user; repeat calls with the same data are cache hits."""
+    def _generate():
+        trend = activity_trend
+        if trend is None:
+            from utils.workout_history import ActivityAnalytics
+
+            trend = ActivityAnalytics(db_path).summary(context.uid).get("activity_trend", {})
+
+        activity = activity_series(trend)
+        title = f"Goal: {context.goal}" if context.goal else "Activity & progress"
+        # Checked before the progress history is read, so a hit skips the scan as well as drawing
+        key = _chart_key(context, db_path, title, activity, max_points)
+        entry = _chart_cache.get(key)
+        cached = entry is not None
+        if cached:
+            image, points = entry
+        else:
+            progress = progress_series(_progress_events(context, db_path))
+            if not activity and not progress:
+                return {"message": "No activity or progress data to chart yet"}
+            panels = []
+            if activity:
+                panels.append({"label": "Activities / day", "points": lttb(activity, max_points)})
+            if progress:
+                panels.append({"label": "Progress events (total)", "points": lttb(progress, max_points), "color": "#10ac84"})
+            image, points = render_chart(panels, title), len(activity) + len(progress)
+            _chart_cache.set(key, image, points)
+        return {
+            "message": "Chart generated successfully",
+            "image": image,
+            "cache_hit": cached,
+            "points": points,
+        }
+
+    return handle_operation(_generate, context=context)
@@ -1,2 +1,359 @@
-def schedule_reminder(context, time, recipient_email, smtp_server, smtp_port, sender_email, sender_password):
-    return {"message": "Reminder set"}
\ No newline at end of file
+"""Recurring reminders stored in SQLite and fired by an async worker.
+
+Every reminder keeps its next fire time (UTC epoch) in reminders.next_fire_at,
+covered by a partial index over active rows. The worker keeps only the next
+`horizon` seconds of that index in a heap and tops it up with range reads,
+so a restart costs one indexed read however many reminders exist. A fire
+re-checks and advances the row in the same transaction that queues the
+notification, so each occurrence fires once even with several workers.
+Email reminders land in the outbox and wake this process's outbox worker;
+in-app reminders become 'reminder' events, shown on the dashboard's Alerts
+page until dismissed. The dashboard starts a worker when the app starts;
+deployments without the dashboard run one standalone:
+
+    python -m utils.reminder_scheduler
+"""
+import os
+import json
+import math
+import time
+import heapq
+import asyncio
+import logging
+import threading
+from datetime import datetime, time as dtime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+from zoneinfo import ZoneInfo
+from context import UserSessionContext
+from utils.error_handler import handle_operation, handle_operation_async
+from utils.storage import get_storage
+from utils.db_worker import get_db_worker
+from utils.migrations import ensure_migrated
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+DEFAULT_TIMEZONE = "Asia/Karachi"
+REMINDER_COLUMNS = "id, uid, kind, local_time, weekdays, timezone, method, recipient, message, next_fire_at, last_fired_at, active"
+
+# (next_fire_at, reminder id)
+Entry = Tuple[float, int]
+
+
+def weekday_mask(days: Iterable[str]) -> int:
+    """Bitmask of weekday names, Monday = bit 0."""
+    mask = 0
+    for day in days:
+        mask |= 1 << WEEKDAYS.index(day[:3].capitalize())
+    return mask
+
+
+def next_fire(local_time: str, weekdays: int, timezone: str, after: float) -> Optional[float]:
+    """First moment strictly after `after` that falls on one of the weekdays at local_time in timezone."""
+    if not weekdays:
+        return None
+    zone = ZoneInfo(timezone)
+    at = dtime.fromisoformat(local_time)
+    today = datetime.fromtimestamp(after, zone).date()
+    for offset in range(8):
+        day = today + timedelta(days=offset)
+        if weekdays & (1 << day.weekday()):
+            # zoneinfo resolves DST gaps forward and picks the first of two ambiguous times
+            candidate = datetime.combine(day, at, tzinfo=zone).timestamp()
+            if candidate > after:
+                return candidate
+    return None
+
+
+def add_reminder(conn, uid: int, kind: str, local_time: str, weekdays: int, timezone: str, method: str,
+                 recipient: Optional[str] = None, message: Optional[str] = None) -> Entry:
+    now = time.time()
+    fire_at = next_fire(local_time, weekdays, timezone, now)
+    # Saving the same reminder twice replaces it instead of firing twice
+    conn.execute("""
+        UPDATE reminders SET active = 0, next_fire_at = NULL
+        WHERE uid = ? AND kind = ? AND local_time = ? AND weekdays = ? AND timezone = ? AND method = ? AND active = 1
+    """, (uid, kind, local_time, weekdays, timezone, method))
+    reminder_id = conn.execute("""
+        INSERT INTO reminders (uid, kind, local_time, weekdays, timezone, method, recipient, message, next_fire_at, active, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (uid, kind, local_time, weekdays, timezone, method, recipient, message, fire_at, int(fire_at is not None), now)).lastrowid
+    return fire_at, reminder_id
+
+
+def load_window(conn, after: float, until: float, overdue_before: float) -> List[Entry]:
+    """Active reminders due in (after, until], plus any at or before overdue_before; both are index range reads."""
+    return conn.execute("""
+        SELECT next_fire_at, id FROM reminders WHERE active = 1 AND next_fire_at > ? AND next_fire_at <= ?
+        UNION
+        SELECT next_fire_at, id FROM reminders WHERE active = 1 AND next_fire_at <= ?
+    """, (after, until, overdue_before)).fetchall()
+
+
+def fire_reminder(conn, reminder_id: int, expected_at: float, now: float, grace: float) -> Tuple[str, Optional[float]]:
+    """Deliver one occurrence and advance the row; returns (outcome, next fire time)."""
+    row = conn.execute(
+        "SELECT uid, kind, local_time, weekdays, timezone, method, recipient, message FROM reminders "
+        "WHERE id = ? AND active = 1 AND next_fire_at = ?", (reminder_id, expected_at)
+    ).fetchone()
+    if row is None:
+        return "stale", None  # cancelled, rescheduled or already fired by another worker
+    uid, kind, local_time, weekdays, timezone, method, recipient, message = row
+    following = next_fire(local_time, weekdays, timezone, max(now, expected_at))
+    conn.execute("UPDATE reminders SET next_fire_at = ?, last_fired_at = ?, active = ? WHERE id = ?",
+                 (following, now, int(following is not None), reminder_id))
+    if now - expected_at > grace:
+        return "skipped", following  # the worker was down; a long-stale reminder is not worth sending
+
+    local = datetime.fromtimestamp(expected_at, ZoneInfo(timezone)).strftime('%Y-%m-%d %H:%M')
+    text = message or f"Time for your {kind.lower()} ({local} {timezone})"
+    if method == "email" and recipient:
+        from utils.email_outbox import queue_email
+
+        queue_email(conn, recipient, f"⏰ {kind} reminder", text + "\n", uid=uid)
+        return "emailed", following
+    else:
+        conn.execute(
+            "INSERT INTO user_events (uid, kind, payload, created_at) VALUES (?, 'reminder', ?, ?)",
+            (uid, json.dumps({"event": text, "timestamp": local, "reminder_id": reminder_id}), now)
+        )
+    return "fired", following
+
+
+class ReminderWorker:
+    """Async loop that fires due reminders from a heap covering the next `horizon` seconds."""
+
+    def __init__(self, db_path: str = "health_wellness.db", horizon: float = 3600.0, refresh_interval: float = 15.0,
+                 grace: float = 3600.0, batch_size: int = 500):
+        self.db_path = db_path
+        self.horizon = horizon
+        self.refresh_interval = refresh_interval
+        self.grace = grace
+        self.batch_size = batch_size
+        self.storage = get_storage(db_path)
+        self.db = get_db_worker(db_path)
+        ensure_migrated(self.storage)
+        self._heap: List[Entry] = []
+        self._queued: Set[Entry] = set()
+        self._loaded_until = -math.inf
+        self._refreshed_at = -math.inf
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self.counters = {"fired": 0, "emailed": 0, "skipped": 0, "stale": 0, "errors": 0, "loaded": 0}
+
+    def _push(self, entry: Entry):
+        if entry[0] is not None and entry not in self._queued and entry[0] <= self._loaded_until:
+            heapq.heappush(self._heap, entry)
+            self._queued.add(entry)
+
+    async def _refill(self):
+        # Only the slice past what is already loaded, plus anything overdue (e.g. added by another process)
+        now = time.time()
+        after, until = self._loaded_until, now + self.horizon
+        entries = await self.db.read(lambda conn: load_window(conn, after, until, now))
+        self._loaded_until = until
+        self._refreshed_at = time.monotonic()
+        for entry in entries:
+            self._push(entry)
+        self.counters["loaded"] += len(entries)
+
+    def _fire_batch(self, conn, due: List[Entry], now: float) -> List[Tuple[str, Optional[float], int]]:
+        results = []
+        for fire_at, reminder_id in due:
+            try:
+                outcome, following = fire_reminder(conn, reminder_id, fire_at, now, self.grace)
+            except Exception as e:
+                logger.error(f"❌ Reminder {reminder_id} failed to fire: {e}")
+                outcome, following = "errors", None
+            results.append((outcome, following, reminder_id))
+        return results
+
+    async def _fire_due(self):
+        now = time.time()
+        due, emailed = [], False
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            self._queued.discard(entry)
+            due.append(entry)
+        # A popular time (09:00) fires thousands at once, so they share a few transactions
+        for start in range(0, len(due), self.batch_size):
+            chunk = due[start:start + self.batch_size]
+            for outcome, following, reminder_id in await self.db.write(lambda conn: self._fire_batch(conn, chunk, now)):
+                self.counters[outcome] += 1
+                emailed = emailed or outcome == "emailed"
+                if following is not None:
+                    self._push((following, reminder_id))
+        if emailed:
+            from utils.email_outbox import get_outbox_worker
+
+            # Started on first use, so a reminder-only process still delivers what it queued
+            get_outbox_worker(self.db_path).notify()
+        if due:
+            logger.info(f"⏰ Handled {len(due)} due reminders")
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        await self._refill()
+        logger.info(f"⏰ Reminder worker started with {len(self._heap)} reminders in the next {self.horizon:.0f}s")
+        while not self._stopping:
+            if time.monotonic() - self._refreshed_at >= self.refresh_interval:
+                await self._refill()
+            await self._fire_due()
+            until_next = self._heap[0][0] - time.time() if self._heap else math.inf
+            until_refresh = self.refresh_interval - (time.monotonic() - self._refreshed_at)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(0.0, min(until_next, until_refresh)))
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def notify(self, entry: Optional[Entry] = None):
+        """Tell the loop about a new or changed reminder; safe to call from any thread."""
+        if self._loop is None:
+            return
+        def _apply():
+            if entry is not None:
+                self._push(entry)
+            self._wake.set()
+        self._loop.call_soon_threadsafe(_apply)
+
+    def start(self):
+        """Run the loop on a daemon thread, for hosts without their own event loop (the dashboard)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=lambda: asyncio.run(self.run()), name="reminders", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping = True
+        self.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "queued": len(self._heap)}
+
+
+_workers: Dict[str, ReminderWorker] = {}
+_workers_lock = threading.Lock()
+
+
+def get_reminder_worker(db_path: str = "health_wellness.db") -> ReminderWorker:
+    """Process-wide reminder worker, started on a background thread on first use."""
+    key = os.path.abspath(db_path)
+    with _workers_lock:
+        worker = _workers.get(key)
+        if worker is None:
+            worker = _workers[key] = ReminderWorker(db_path)
+            worker.start()
+        return worker
+
+
+def _normalize(at: Union[str, dtime], days: Iterable[str], method: str, timezone: str) -> Tuple[str, int, str]:
+    local_time = at.strftime("%H:%M") if isinstance(at, dtime) else dtime.fromisoformat(at).strftime("%H:%M")
+    ZoneInfo(timezone)  # unknown zones fail here rather than in the worker
+    return local_time, weekday_mask(days), "email" if method.lower() == "email" else "in_app"
+
+
+def _scheduled(kind: str, fire_at: Optional[float], reminder_id: int, timezone: str) -> dict:
+    if fire_at is None:
+        return {"error": "Pick at least one day for the reminder"}
+    local = datetime.fromtimestamp(fire_at, ZoneInfo(timezone)).strftime('%a %Y-%m-%d %H:%M')
+    return {"message": f"{kind} reminder set; next on {local} ({timezone})", "id": reminder_id, "next_fire_at": fire_at}
+
+
+def schedule_reminder(context: UserSessionContext, kind: str, at: Union[str, dtime], days: Iterable[str],
+                      method: str = "Email", timezone: str = DEFAULT_TIMEZONE, recipient_email: Optional[str] = None,
+                      message: Optional[str] = None, db_path: str = "health_wellness.db") -> dict:
+    """Store a recurring reminder (e.g. Exercise at 07:30 on Mon/Wed/Fri) and wake the worker."""
+    def _schedule():
+        local_time, mask, delivery = _normalize(at, days, method, timezone)
+        recipient = recipient_email or context.email
+        if delivery == "email" and not recipient:
+            return {"error": "An email address is required for email reminders"}
+        worker = get_reminder_worker(db_path)
+        with worker.storage.transaction() as conn:
+            fire_at, reminder_id = add_reminder(conn, context.uid, kind, local_time, mask, timezone, delivery, recipient, message)
+        worker.notify((fire_at, reminder_id))
+        return _scheduled(kind, fire_at, reminder_id, timezone)
+
+    return handle_operation(_schedule, context=context)
+
+
+async def schedule_reminder_async(context: UserSessionContext, kind: str, at: Union[str, dtime], days: Iterable[str],
+                                  method: str = "In-App", timezone: str = DEFAULT_TIMEZONE,
+                                  message: Optional[str] = None, db_path: str = "health_wellness.db") -> dict:
+    """Same as schedule_reminder with the insert queued on the DB writer."""
+    async def _schedule():
+        local_time, mask, delivery = _normalize(at, days, method, timezone)
+        worker = get_reminder_worker(db_path)
+        fire_at, reminder_id = await worker.db.write(
+            lambda conn: add_reminder(conn, context.uid, kind, local_time, mask, timezone, delivery, context.email, message)
+        )
+        worker.notify((fire_at, reminder_id))
+        return _scheduled(kind, fire_at, reminder_id, timezone)
+
+    return await handle_operation_async(_schedule, context=context)
+
+
+def list_reminders(uid: int, db_path: str = "health_wellness.db") -> List[Dict]:
+    storage = get_storage(db_path)
+    ensure_migrated(storage)
+    names = [name.strip() for name in REMINDER_COLUMNS.split(",")]
+    rows = storage.query_all(f"SELECT {REMINDER_COLUMNS} FROM reminders WHERE uid = ? AND active = 1 ORDER BY next_fire_at", (uid,))
+    return [dict(zip(names, row)) for row in rows]
+
+
+async def has_account_async(uid: int, db_path: str = "health_wellness.db") -> bool:
+    """Whether uid belongs to a registered account, i.e. someone who can later see or cancel a reminder."""
+    ensure_migrated(get_storage(db_path))
+    row = await get_db_worker(db_path).read(lambda conn: conn.execute("SELECT 1 FROM accounts WHERE uid = ?", (uid,)).fetchone())
+    return row is not None
+
+
+def pending_notifications(uid: int, db_path: str = "health_wellness.db", limit: int = 20) -> List[Dict]:
+    """In-app reminders fired since the user last dismissed them, newest first."""
+    storage = get_storage(db_path)
+    ensure_migrated(storage)
+    seen = storage.query_one("SELECT last_seen_id FROM reminder_inbox WHERE uid = ?", (uid,))
+    rows = storage.query_all(
+        "SELECT id, payload FROM user_events WHERE uid = ? AND kind = 'reminder' AND id > ? ORDER BY id DESC LIMIT ?",
+        (uid, seen[0] if seen else 0, limit)
+    )
+    return [{"id": event_id, **json.loads(payload)} for event_id, payload in rows]
+
+
+def dismiss_notifications(uid: int, up_to_id: int, db_path: str = "health_wellness.db"):
+    storage = get_storage(db_path)
+    ensure_migrated(storage)
+    with storage.transaction() as conn:
+        conn.execute("""
+            INSERT INTO reminder_inbox (uid, last_seen_id) VALUES (?, ?)
+            ON CONFLICT (uid) DO UPDATE SET last_seen_id = MAX(last_seen_id, excluded.last_seen_id)
+        """, (uid, up_to_id))
+
+
+def cancel_reminder(uid: int, reminder_id: int, db_path: str = "health_wellness.db") -> bool:
+    storage = get_storage(db_path)
+    ensure_migrated(storage)
+    with storage.transaction() as conn:
+        # The worker sees the inactive row when the heap entry comes due and drops it
+        return conn.execute("UPDATE reminders SET active = 0, next_fire_at = NULL WHERE id = ? AND uid = ?",
+                            (reminder_id, uid)).rowcount > 0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the reminder worker")
+    parser.add_argument("--db", default="health_wellness.db")
+    parser.add_argument("--horizon", type=float, default=3600.0, help="seconds of upcoming reminders kept in memory")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(ReminderWorker(args.db, horizon=args.horizon).run())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,124 @@
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from utils.storage import get_storage
+from utils.migrations import ensure_migrated
+
+
+def _canonical(value: Any) -> Any:
+    """Normalize prompt inputs so cosmetic differences map to the same key."""
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value).strip().lower().rstrip("?!. ")
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return sorted((_canonical(v) for v in value), key=lambda v: json.dumps(v, sort_keys=True))
+    return value
+
+
+def make_cache_key(kind: str, **fields: Any) -> str:
+    """Build a cache key from the inputs that fully determine a prompt."""
+    payload = json.dumps({"kind": kind, "fields": _canonical(fields)}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier LLM response cache: in-memory LRU in front of a SQLite table."""
+
+    def __init__(self, db_path: str = "health_wellness.db", max_entries: int = 512, ttl: float = 24 * 3600):
+        self.db_path = db_path
+        self.storage = get_storage(db_path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._sets_since_purge = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+        self.init_db()
+
+    def init_db(self):
+        ensure_migrated(self.storage)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[1] > now:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return entry[0]
+            if entry:
+                del self._memory[key]
+
+        # Fall back to the shared SQLite tier (other workers / earlier runs)
+        row = self.storage.query_one(
+            "SELECT response, expires_at FROM llm_response_cache WHERE key = ? AND expires_at > ?",
+            (key, now)
+        )
+
+        with self._lock:
+            if row:
+                self.counters["disk_hits"] += 1
+                self._remember(key, row[0], row[1])
+                return row[0]
+            self.counters["misses"] += 1
+        return None
+
+    def set(self, key: str, response: str):
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._remember(key, response, expires_at)
+            self.counters["sets"] += 1
+            self._sets_since_purge += 1
+            purge = self._sets_since_purge >= 100
+
+        self.storage.execute(
+            "INSERT OR REPLACE INTO llm_response_cache (key, response, created_at, expires_at) VALUES (?, ?, ?, ?)",
+            (key, response, now, expires_at)
+        )
+
+        if purge:
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Drop expired entries from both tiers; returns rows removed from SQLite."""
+        now = time.time()
+        with self._lock:
+            self._sets_since_purge = 0
+            for key in [k for k, (_, expires_at) in self._memory.items() if expires_at <= now]:
+                del self._memory[key]
+        return self.storage.execute("DELETE FROM llm_response_cache WHERE expires_at <= ?", (now,)).rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, key: str, response: str, expires_at: float):
+        # Caller holds the lock
+        self._memory[key] = (response, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+
+_shared_cache: Optional[ResponseCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide cache shared by the agent and the dashboard."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache()
+        return _shared_cache
@@ -0,0 +1,151 @@
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+
+class _Broadcast:
+    """Chunks of one in-flight stream, replayed to every subscriber."""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.listeners: List[asyncio.Queue] = []
+        self.end: Optional[Tuple[str, Any]] = None  # ("ok", None) or ("error", exception)
+        self.task: Optional[asyncio.Task] = None
+
+    def publish(self, item: Tuple[str, Any]):
+        for queue in self.listeners:
+            queue.put_nowait(item)
+
+
+class AsyncSingleFlight:
+    """Coalesce identical concurrent async calls into one shared execution."""
+
+    def __init__(self):
+        self._calls: Dict[Tuple[int, str], asyncio.Task] = {}
+        self._streams: Dict[Tuple[int, str], _Broadcast] = {}
+        self.counters = {"calls": 0, "executions": 0, "deduplicated": 0}
+
+    async def do(self, key: str, factory: Callable[[], Any]) -> Any:
+        """Await factory() once per key; concurrent callers share its result."""
+        # Futures belong to one event loop, so flights are tracked per loop
+        slot = (id(asyncio.get_running_loop()), key)
+        self.counters["calls"] += 1
+        task = self._calls.get(slot)
+        if task is None:
+            self.counters["executions"] += 1
+            task = asyncio.ensure_future(factory())
+            self._calls[slot] = task
+            task.add_done_callback(lambda _: self._calls.pop(slot, None))
+        else:
+            self.counters["deduplicated"] += 1
+        # A cancelled caller must not cancel the call other callers wait on
+        return await asyncio.shield(task)
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """Iterate factory() once per key; late joiners get the chunks they missed."""
+        slot = (id(asyncio.get_running_loop()), key)
+        self.counters["calls"] += 1
+        flight = self._streams.get(slot)
+        if flight is None:
+            self.counters["executions"] += 1
+            flight = _Broadcast()
+            self._streams[slot] = flight
+            flight.task = asyncio.ensure_future(self._pump(slot, flight, factory))
+        else:
+            self.counters["deduplicated"] += 1
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for chunk in flight.chunks:
+            queue.put_nowait(("chunk", chunk))
+        if flight.end is not None:
+            queue.put_nowait(flight.end)
+        else:
+            flight.listeners.append(queue)
+
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == "chunk":
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    return
+        finally:
+            if queue in flight.listeners:
+                flight.listeners.remove(queue)
+
+    async def _pump(self, slot: Tuple[int, str], flight: _Broadcast, factory: Callable[[], AsyncIterator[Any]]):
+        end: Tuple[str, Any] = ("error", asyncio.CancelledError())
+        try:
+            async for chunk in factory():
+                flight.chunks.append(chunk)
+                flight.publish(("chunk", chunk))
+            end = ("ok", None)
+        except Exception as e:
+            end = ("error", e)
+        finally:
+            self._streams.pop(slot, None)
+            flight.end = end
+            flight.publish(end)
+
+    def stats(self) -> Dict[str, int]:
+        stats = dict(self.counters)
+        stats["inflight"] = len(self._calls) + len(self._streams)
+        return stats
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Thread-safe variant for synchronous callers such as the dashboard."""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "executions": 0, "deduplicated": 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.counters["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.counters["executions"] += 1
+            else:
+                self.counters["deduplicated"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats["inflight"] = len(self._calls)
+        return stats
+
+
+# Shared by every agent session / dashboard rerun in this process
+async_flight = AsyncSingleFlight()
+sync_flight = SingleFlight()
@@ -0,0 +1,141 @@
+import time
+import random
+import logging
+import threading
+import socketserver
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPSink:
+    """What the local stand-in records: counters, the latest messages and injected failures."""
+
+    def __init__(self, keep: int = 100, error_rate: float = 0.0, error_code: int = 451, latency: float = 0.0,
+                 seed: Optional[int] = None):
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.latency = latency
+        self.messages: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self.counters = {"connections": 0, "logins": 0, "messages": 0, "rejected": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def count(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def deliver(self, sender: str, recipients: list, data: bytes):
+        with self._lock:
+            self.counters["messages"] += 1
+            self.messages.append({"from": sender, "to": recipients, "data": data})
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+
+def make_smtp_handler(sink: SMTPSink):
+    class SMTPHandler(socketserver.StreamRequestHandler):
+        """Enough of RFC 5321 for smtplib: EHLO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+
+        def reply(self, line: str):
+            self.wfile.write(line.encode("ascii") + b"\r\n")
+
+        def handle(self):
+            sink.count("connections")
+            self.reply("220 smartcare-sink ESMTP ready")
+            sender, recipients = None, []
+            while True:
+                raw = self.rfile.readline()
+                if not raw:
+                    return
+                command, _, arg = raw.decode("utf-8", "replace").strip().partition(" ")
+                command = command.upper()
+                if command == "EHLO":
+                    self.wfile.write(b"250-smartcare-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+                elif command == "HELO":
+                    self.reply("250 smartcare-sink")
+                elif command == "AUTH":
+                    # Any credentials are accepted; LOGIN needs its two prompts answered
+                    if arg.upper().startswith("LOGIN"):
+                        for prompt in ([] if " " in arg else ["334 VXNlcm5hbWU6"]) + ["334 UGFzc3dvcmQ6"]:
+                            self.reply(prompt)
+                            self.rfile.readline()
+                    sink.count("logins")
+                    self.reply("235 Authentication successful")
+                elif command == "MAIL":
+                    sender, recipients = arg.partition(":")[2].strip().strip("<>"), []
+                    self.reply("250 OK")
+                elif command == "RCPT":
+                    recipients.append(arg.partition(":")[2].strip().strip("<>"))
+                    self.reply("250 OK")
+                elif command == "DATA":
+                    self.reply("354 End data with <CR><LF>.<CR><LF>")
+                    lines = []
+                    while True:
+                        line = self.rfile.readline()
+                        if not line or line in (b".\r\n", b".\n"):
+                            break
+                        lines.append(line[1:] if line.startswith(b"..") else line)
+                    if sink.latency:
+                        time.sleep(sink.latency)
+                    if sink.should_fail():
+                        sink.count("rejected")
+                        self.reply(f"{sink.error_code} Injected failure, try again later")
+                    else:
+                        sink.deliver(sender, recipients, b"".join(lines))
+                        self.reply("250 OK queued")
+                    sender, recipients = None, []
+                elif command == "RSET":
+                    sender, recipients = None, []
+                    self.reply("250 OK")
+                elif command == "NOOP":
+                    self.reply("250 OK")
+                elif command == "QUIT":
+                    self.reply("221 Bye")
+                    return
+                else:
+                    self.reply("502 Command not implemented")
+
+    return SMTPHandler
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve_smtp_sink(host: str = "127.0.0.1", port: int = 1025, sink: Optional[SMTPSink] = None,
+                    background: bool = False):
+    """Run a local SMTP endpoint that accepts (or, with error_rate, defers) every message."""
+    sink = sink or SMTPSink()
+    server = _Server((host, port), make_smtp_handler(sink))
+    server.sink = sink
+    logger.info(f"🧪 SMTP sink listening on {host}:{server.server_address[1]} (no TLS; set SMTP_STARTTLS=0)")
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    else:
+        server.serve_forever()
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve a local SMTP stand-in for the email outbox")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per message")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-code", type=int, default=451)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    serve_smtp_sink(args.host, args.port, SMTPSink(error_rate=args.error_rate, error_code=args.error_code,
+                                                   latency=args.latency, seed=args.seed))
@@ -0,0 +1,130 @@
+import os
+import sqlite3
+import logging
+import weakref
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "health_wellness.db"
+
+# Applied to every connection; WAL lets readers proceed while one writer commits
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA foreign_keys=ON",
+)
+
+
+class _ThreadConnection:
+    """Holder kept in the thread-local; when its thread exits, a finalizer closes the connection."""
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+class Storage:
+    """Shared access to one SQLite file: a persistent connection per thread.
+
+    Connections are opened once per thread with the PRAGMAS above and keep
+    sqlite3's prepared-statement cache warm, so repeated queries skip both
+    connection setup and SQL parsing. Schemas are initialized once per process.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, cached_statements: int = 256, timeout: float = 5.0):
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: Set[sqlite3.Connection] = set()
+        self._schemas: Set[str] = set()
+        self._schema_lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, cached_statements=self.cached_statements,
+                                   check_same_thread=False)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            # Streamlit runs every rerun on a new thread, so connections must not outlive their thread
+            holder = self._local.holder = _ThreadConnection(conn)
+            weakref.finalize(holder, self._discard, conn)
+            with self._lock:
+                self._connections.add(conn)
+        return holder.conn
+
+    def _discard(self, conn: sqlite3.Connection):
+        with self._lock:
+            self._connections.discard(conn)
+        try:
+            conn.close()
+        except sqlite3.ProgrammingError:
+            pass
+
+    @contextmanager
+    def transaction(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+        """Yield this thread's connection; commit on success, roll back on error.
+
+        immediate=True takes the write lock before the first statement, for
+        read-then-write work that must not interleave with another writer.
+        """
+        conn = self.connection()
+        with conn:
+            if immediate:
+                conn.execute("BEGIN IMMEDIATE")
+            yield conn
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> sqlite3.Cursor:
+        with self.transaction() as conn:
+            return conn.execute(sql, params)
+
+    def query_one(self, sql: str, params: Sequence[Any] = ()) -> Optional[tuple]:
+        return self.connection().execute(sql, params).fetchone()
+
+    def query_all(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        return self.connection().execute(sql, params).fetchall()
+
+    def ensure_schema(self, name: str, init: Callable[[sqlite3.Connection], None]):
+        """Run init(conn) once per process for this database, however many managers are built."""
+        if name in self._schemas:
+            return
+        with self._schema_lock:
+            if name in self._schemas:
+                return
+            with self.transaction() as conn:
+                init(conn)
+            self._schemas.add(name)
+            logger.debug(f"🗄️ Schema '{name}' ready in {self.db_path}")
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        # Outside the lock: dropping the old thread-local runs finalizers that take it
+        self._local = threading.local()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+
+
+_storages: Dict[str, Storage] = {}
+_storages_lock = threading.Lock()
+
+
+def get_storage(db_path: str = DEFAULT_DB_PATH) -> Storage:
+    """Process-wide Storage per database file."""
+    key = os.path.abspath(db_path)
+    with _storages_lock:
+        storage = _storages.get(key)
+        if storage is None:
+            storage = _storages[key] = Storage(db_path)
+        return storage
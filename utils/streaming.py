@@ -1,9 +1,28 @@
 from context import UserSessionContext
+from openai_agents import Runner
 
 async def stream_response(agent, input_text: str, context: UserSessionContext):
-    result = await agent.process_input(input_text, context)
+    result = {}
+    streamed = False
+    mid_line = False
 
-    if result.get("status") == "success" and "message" in result:
+    # Print advice tokens the moment they arrive; tools/handoffs get their own lines
+    async for step in Runner.stream(agent, input_text, context):
+        if step.type == "token":
+            if not streamed:
+                print("\n💡 Advice:\n", end="", flush=True)
+                streamed = True
+            print(step.data, end="", flush=True)
+            mid_line = True
+        elif step.type in ("tool", "handoff", "tool_error"):
+            print(("\n" if mid_line else "") + "🔧 " + step.pretty_output, flush=True)
+            mid_line = False
+        elif step.type == "final":
+            result = step.data
+
+    if streamed:
+        print("\n")
+    elif result.get("status") == "success" and "message" in result:
         print("\n💡 Advice:\n" + result["message"] + "\n")
     elif "message" in result:
         print("\n📢 " + result["message"] + "\n")
@@ -12,4 +31,6 @@ async def stream_response(agent, input_text: str, context: UserSessionContext):
         if "details" in result:
             print("Details:", result["details"])
     else:
-        print("❓ I didn’t understand. Please rephrase.")
\ No newline at end of file
+        print("❓ I didn’t understand. Please rephrase.")
+
+    return result
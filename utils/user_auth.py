@@ -1,87 +1,83 @@
-import sqlite3
+import time
 import uuid
+import sqlite3
 from context import UserSessionContext
-from utils.error_handler import handle_operation
+from utils.error_handler import handle_operation, handle_operation_async
+from utils.storage import get_storage
+from utils.db_worker import get_db_worker
+from utils.migrations import ensure_migrated
 
 class UserAuth:
     def __init__(self, db_path: str = "health_wellness.db"):
         self.db_path = db_path
+        self.storage = get_storage(db_path)
+        self.worker = get_db_worker(db_path)
         self.init_db()
 
     def init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    email TEXT PRIMARY KEY,
-                    username TEXT,
-                    password TEXT,
-                    uid INTEGER
-                )
-            """)
-            # Make sure all required columns are present
-            cursor.execute("PRAGMA table_info(users)")
-            columns = [col[1] for col in cursor.fetchall()]
+        ensure_migrated(self.storage)
 
-            if 'email' not in columns:
-                cursor.execute("ALTER TABLE users ADD COLUMN email TEXT")
-            if 'username' not in columns:
-                cursor.execute("ALTER TABLE users ADD COLUMN username TEXT")
-            if 'password' not in columns:
-                cursor.execute("ALTER TABLE users ADD COLUMN password TEXT")
-            if 'uid' not in columns:
-                cursor.execute("ALTER TABLE users ADD COLUMN uid INTEGER")
+    @staticmethod
+    def _authenticate(conn, email, password):
+        result = conn.execute(
+            "SELECT username, uid FROM accounts WHERE email = ? AND password = ?",
+            (email, password)
+        ).fetchone()
 
-            conn.commit()
+        if result:
+            return {
+                "uid": result[1],
+                "message": "Login successful",
+                "username": result[0]
+            }
 
-    def authenticate_user(self, email, password):
-        # Inner function to handle the login process
-        def _auth():
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT username, uid FROM users WHERE email = ? AND password = ?",
-                    (email, password)
-                )
-                result = cursor.fetchone()
+        return {"error": "Invalid email or password"}
 
-                if result:
-                    return {
-                        "uid": result[1],
-                        "message": "Login successful",
-                        "username": result[0]
-                    }
+    @staticmethod
+    def _register(conn, username, email, password):
+        cursor = conn.cursor()
 
-                return {"error": "Invalid email or password"}
+        # Check if email is already registered
+        cursor.execute("SELECT 1 FROM accounts WHERE email = ?", (email,))
+        if cursor.fetchone():
+            return {"error": "Email already registered"}
 
-        # Use error handler to execute login
-        return handle_operation(_auth)
-
-    def register_user(self, username, email, password):
-        # Inner function to handle registration logic
-        def _register():
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
+        # Generate a unique user ID
+        uid = uuid.uuid4().int & (1 << 31) - 1
 
-                # Check if email is already registered
-                cursor.execute("SELECT email FROM users WHERE email = ?", (email,))
-                if cursor.fetchone():
-                    return {"error": "Email already registered"}
+        # Insert new user into the database
+        try:
+            cursor.execute(
+                "INSERT INTO accounts (uid, email, username, password, created_at) VALUES (?, ?, ?, ?, ?)",
+                (uid, email, username, password, time.time())
+            )
+        except sqlite3.IntegrityError:
+            # Lost a race with a concurrent registration; the unique email index caught it
+            return {"error": "Email already registered"}
 
-                # Generate a unique user ID
-                uid = uuid.uuid4().int & (1 << 31) - 1
+        return {
+            "message": "User registered",
+            "uid": uid
+        }
 
-                # Insert new user into the database
-                cursor.execute(
-                    "INSERT INTO users (email, username, password, uid) VALUES (?, ?, ?, ?)",
-                    (email, username, password, uid)
-                )
+    def authenticate_user(self, email, password):
+        # Use error handler to execute login
+        return handle_operation(lambda: self._authenticate(self.storage.connection(), email, password))
 
-                conn.commit()
-                return {
-                    "message": "User registered",
-                    "uid": uid
-                }
+    def register_user(self, username, email, password):
+        def _register():
+            with self.storage.transaction() as conn:
+                return self._register(conn, username, email, password)
 
         # Use error handler to execute registration
         return handle_operation(_register)
+
+    async def authenticate_user_async(self, email, password):
+        return await handle_operation_async(
+            lambda: self.worker.read(lambda conn: self._authenticate(conn, email, password))
+        )
+
+    async def register_user_async(self, username, email, password):
+        return await handle_operation_async(
+            lambda: self.worker.write(lambda conn: self._register(conn, username, email, password))
+        )
@@ -1,49 +1,129 @@
-
-import sqlite3
-import pandas as pd
+from typing import Iterable, Optional, Tuple
 from context import UserSessionContext
-from utils.error_handler import handle_operation
+from utils.error_handler import handle_operation, handle_operation_async
+from utils.storage import get_storage
+from utils.db_worker import get_db_worker
+from utils.migrations import ensure_migrated
 from datetime import datetime
 
+ROLLUP_WATERMARK = "activity_daily_rollups"
+
+
+def refresh_daily_rollups(conn) -> int:
+    """Fold activities added since the watermark into activity_daily_rollups.
+
+    Must run inside a write transaction. Work is proportional to the new rows,
+    not to total history; returns how many activities were folded in.
+    """
+    row = conn.execute("SELECT last_id FROM rollup_watermarks WHERE name = ?", (ROLLUP_WATERMARK,)).fetchone()
+    last_id = row[0] if row else 0
+    high, pending = conn.execute("SELECT MAX(id), COUNT(*) FROM activities WHERE id > ?", (last_id,)).fetchone()
+    if not pending:
+        return 0
+    # The day is taken from the stored timestamp as written (local date), not converted to UTC
+    conn.execute("""
+        INSERT INTO activity_daily_rollups (uid, day, activity_type, count)
+        SELECT uid, substr(timestamp, 1, 10), activity_type, COUNT(*)
+        FROM activities WHERE id > ? AND id <= ?
+        GROUP BY uid, substr(timestamp, 1, 10), activity_type
+        ON CONFLICT (uid, day, activity_type) DO UPDATE SET count = count + excluded.count
+    """, (last_id, high))
+    conn.execute("INSERT OR REPLACE INTO rollup_watermarks (name, last_id) VALUES (?, ?)", (ROLLUP_WATERMARK, high))
+    return pending
+
+
+def insert_activities(conn, rows) -> int:
+    """Insert (uid, activity_type, activity_details, timestamp) rows inside the caller's transaction."""
+    conn.executemany("INSERT INTO activities (uid, activity_type, activity_details, timestamp) VALUES (?, ?, ?, ?)", rows)
+    return len(rows)
+
+
 class ActivityAnalytics:
     def __init__(self, db_path: str = "health_wellness.db"):
         self.db_path = db_path
+        self.storage = get_storage(db_path)
+        self.worker = get_db_worker(db_path)
+        ensure_migrated(self.storage)
 
-    def analyze_activities(self, context: UserSessionContext) -> dict:
-        """Analyze user activities to provide goal progress insights."""
-        def _analyze():
-            with sqlite3.connect(self.db_path) as conn:
-                df = pd.read_sql_query(
-                    "SELECT activity_type, activity_details, timestamp FROM activities WHERE uid = ?",
-                    conn,
-                    params=(context.uid,),
-                    parse_dates=['timestamp']
-                )
-            
-            if df.empty:
-                return {"message": "No activities found for analysis"}
-            
-            total_activities = len(df)
-            goal_count = len(df[df['activity_type'] == 'Goal Submission'])
-            feedback_count = len(df[df['activity_type'] == 'Feedback Submission'])
-            profile_updates = len(df[df['activity_type'] == 'Profile Update'])
-            
-            df['date'] = df['timestamp'].dt.date
-            activity_trend = df.groupby('date').size().to_dict()
-            
-            result = {
-                "total_activities": total_activities,
-                "goal_count": goal_count,
-                "feedback_count": feedback_count,
-                "profile_updates": profile_updates,
-                "activity_trend": {str(date): count for date, count in activity_trend.items()},
-                "message": "Analytics generated successfully"
-            }
-            
+    def record_activities(self, activities: Iterable[Tuple[int, str, str, Optional[str]]]) -> int:
+        """Insert (uid, activity_type, activity_details, timestamp) rows; rollups pick them up on next read."""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        rows = [(uid, activity_type, details, timestamp or now) for uid, activity_type, details, timestamp in activities]
+        with self.storage.transaction() as conn:
+            return insert_activities(conn, rows)
+
+    def record_activity(self, uid: int, activity_type: str, details: str = "", timestamp: Optional[str] = None) -> int:
+        return self.record_activities([(uid, activity_type, details, timestamp)])
+
+    def refresh(self) -> int:
+        with self.storage.transaction(immediate=True) as conn:
+            return refresh_daily_rollups(conn)
+
+    @staticmethod
+    def _summarize(conn, uid: int) -> dict:
+        # Rollups plus this user's activities not folded in yet, read from one snapshot so a concurrent
+        # refresh can't count a row twice; reads stay correct without taking the write lock
+        own_snapshot = not conn.in_transaction
+        if own_snapshot:
+            conn.execute("BEGIN")
+        try:
+            rows = conn.execute(
+                "SELECT day, activity_type, count FROM activity_daily_rollups WHERE uid = ? ORDER BY day",
+                (uid,)
+            ).fetchall()
+            watermark = conn.execute("SELECT last_id FROM rollup_watermarks WHERE name = ?", (ROLLUP_WATERMARK,)).fetchone()
+            rows += conn.execute(
+                "SELECT substr(timestamp, 1, 10), activity_type, COUNT(*) FROM activities WHERE uid = ? AND id > ? "
+                "GROUP BY substr(timestamp, 1, 10), activity_type", (uid, watermark[0] if watermark else 0)
+            ).fetchall()
+        finally:
+            if own_snapshot:
+                conn.execute("COMMIT")
+
+        if not rows:
+            return {"message": "No activities found for analysis"}
+
+        by_type = {}
+        activity_trend = {}
+        for day, activity_type, count in rows:
+            by_type[activity_type] = by_type.get(activity_type, 0) + count
+            activity_trend[day] = activity_trend.get(day, 0) + count
+
+        return {
+            "total_activities": sum(by_type.values()),
+            "goal_count": by_type.get('Goal Submission', 0),
+            "feedback_count": by_type.get('Feedback Submission', 0),
+            "profile_updates": by_type.get('Profile Update', 0),
+            "activity_trend": activity_trend,
+            "message": "Analytics generated successfully"
+        }
+
+    @staticmethod
+    def _log(context: UserSessionContext, result: dict) -> dict:
+        if "total_activities" in result:
             context.progress_logs.append({
                 "event": "Generated activity analytics",
                 "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             })
-            return result
-        
+        return result
+
+    def summary(self, uid: int) -> dict:
+        """Current per-type totals and daily trend for one user; read-only, so safe to call on every page view."""
+        return self._summarize(self.storage.connection(), uid)
+
+    def analyze_activities(self, context: UserSessionContext) -> dict:
+        """Analyze user activities to provide goal progress insights."""
+        def _analyze():
+            self.refresh()
+            return self._log(context, self.summary(context.uid))
+
         return handle_operation(_analyze, context=context)
+
+    async def analyze_activities_async(self, context: UserSessionContext) -> dict:
+        """Same analysis with the refresh queued on the DB writer and the read on the pool."""
+        async def _analyze():
+            await self.worker.write(refresh_daily_rollups)
+            result = await self.worker.read(lambda conn: self._summarize(conn, context.uid))
+            return self._log(context, result)
+
+        return await handle_operation_async(_analyze, context=context)